@@ -0,0 +1,260 @@
+"""
+Management command that checks the number of SQL queries of every API
+read endpoint against a fixed budget.
+
+Usage:
+    python manage.py check_query_budgets
+    python manage.py check_query_budgets --rows 50
+
+Every GET endpoint registered by the app routers is called twice: once
+after seeding a single row of every model, and again after seeding
+--rows more rows (with related users, attachments, comments, attendees,
+nested folders...). A ViewSet whose query plan is complete
+(select_related / prefetch_related on its queryset) needs the same
+number of queries in both runs. Either run going over the budget fails
+the command, as does an endpoint without a budget. Each endpoint is
+called once beforehand, so one-time lookups cached per process are not
+counted.
+
+All seeded data is created inside a transaction that is rolled back.
+Run it against a development database.
+"""
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+
+# Endpoint (URL name) -> maximum number of queries, whatever the row count.
+# Paginated lists: 1 COUNT + 1 SELECT + one query per prefetched relation.
+QUERY_BUDGETS = {
+    'lead-list': 2,
+    'lead-detail': 1,
+    'lead-statistics': 1,
+    'lead-search': 3,
+    'contact-list': 2,
+    'contact-detail': 1,
+    'deal-list': 2,
+    'deal-detail': 1,
+    'task-list': 2,
+    'task-detail': 1,
+    'note-list': 2,
+    'note-detail': 1,
+    'activity-list': 2,
+    'activity-detail': 1,
+    'client-list': 2,
+    'client-detail': 3,
+    'client-statistics': 8,
+    'client-high-value': 3,
+    'client-long-term': 3,
+    'client-projects': 3,
+    'client-interactions': 3,
+    'client-project-list': 2,
+    'client-project-detail': 1,
+    'client-interaction-list': 2,
+    'client-interaction-detail': 1,
+    'email-template-list': 2,
+    'email-template-detail': 1,
+    'email-list': 3,
+    'email-detail': 2,
+    'email-statistics': 3,
+    'email-campaign-list': 2,
+    'email-campaign-detail': 1,
+    'calendar-event-list': 4,
+    'calendar-event-detail': 3,
+    'calendar-event-today': 3,
+    'calendar-event-upcoming': 3,
+    'calendar-event-my-events': 3,
+    'availability-list': 2,
+    'availability-detail': 1,
+    'availability-my-availability': 1,
+    'document-list': 4,
+    'document-detail': 3,
+    'document-my-documents': 3,
+    'document-shared-with-me': 3,
+    'document-category-list': 2,
+    'document-category-detail': 1,
+    # Folders: plus one query per level of nesting beyond the first (full_path)
+    'folder-list': 5,
+    'folder-detail': 4,
+    'folder-my-folders': 3,
+}
+
+# Query string of endpoints that need one
+ENDPOINT_PARAMS = {
+    'lead-search': {'q': 'lead'},
+}
+
+# GET endpoints that are not checked
+SKIPPED_ENDPOINTS = {
+    'document-download': 'streams a file from storage',
+}
+
+
+def iter_get_endpoints(patterns=None):
+    """
+    Yield (url_name, viewset class, has_pk) for every router GET route.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_get_endpoints(pattern.url_patterns)
+            continue
+        
+        actions = getattr(pattern.callback, 'actions', None)
+        if not isinstance(pattern, URLPattern) or not actions or 'get' not in actions:
+            continue
+        if 'format' in pattern.pattern.regex.groupindex:
+            continue  # .json/.api suffix duplicate
+        yield pattern.name, pattern.callback.cls, 'pk' in pattern.pattern.regex.groupindex
+
+
+class Command(BaseCommand):
+    help = 'Check the number of queries of every API read endpoint against its budget'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=25,
+            help='Rows of every model seeded for the second run (default: 25)'
+        )
+    
+    def handle(self, *args, **options):
+        tables = set(connection.introspection.table_names())
+        endpoints = []
+        for name, viewset, has_pk in iter_get_endpoints():
+            if name in SKIPPED_ENDPOINTS:
+                continue
+            model = viewset.queryset.model
+            if model._meta.db_table not in tables:
+                self.stdout.write(self.style.WARNING(f'{name}: skipped, table {model._meta.db_table} does not exist'))
+                continue
+            endpoints.append((name, model, has_pk))
+        
+        failures = []
+        with transaction.atomic():
+            self.admin = get_user_model().objects.create_user(
+                email='query-budget@example.com', username='query-budget',
+                password=None, first_name='Query', last_name='Budget', role='admin',
+            )
+            self.client = APIClient(SERVER_NAME='localhost')
+            self.client.force_authenticate(self.admin)
+            self.tables = tables
+            
+            self._seed(0)
+            # Detail routes are checked on the rows seeded first
+            objects = {model: model.objects.order_by('pk').last() for _, model, _ in endpoints}
+            small = {name: self._count(name, objects[model], has_pk) for name, model, has_pk in endpoints}
+            
+            for index in range(1, options['rows'] + 1):
+                self._seed(index)
+            large = {name: self._count(name, objects[model], has_pk) for name, model, has_pk in endpoints}
+            
+            transaction.set_rollback(True)
+        
+        self.stdout.write(f'{"endpoint":<32} {"1 row":>6} {options["rows"] + 1:>4} rows {"budget":>7}')
+        for name, _, _ in endpoints:
+            budget = QUERY_BUDGETS.get(name)
+            ok = budget is not None and max(small[name], large[name]) <= budget
+            line = f'{name:<32} {small[name]:>6} {large[name]:>9} {budget if budget is not None else "-":>7}'
+            if ok:
+                self.stdout.write(line)
+            else:
+                self.stdout.write(self.style.ERROR(line))
+                failures.append(name)
+        
+        if failures:
+            raise CommandError(f'Over budget or without budget: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS(f'All {len(endpoints)} endpoints within budget'))
+    
+    def _count(self, name, obj, has_pk):
+        """Number of queries of one GET request"""
+        url = reverse(name, kwargs={'pk': obj.pk}) if has_pk else reverse(name)
+        self.client.get(url, ENDPOINT_PARAMS.get(name))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, ENDPOINT_PARAMS.get(name))
+        if response.status_code != 200:
+            raise CommandError(f'{name}: GET {url} returned {response.status_code}')
+        return len(queries)
+    
+    def _seed(self, index):
+        """
+        Create one row of every model, each with its own related user.
+        """
+        from activities.models import Activity
+        from calendar_events.models import Availability, CalendarEvent, EventReminder
+        from contacts.models import Contact
+        from deals.models import Deal
+        from documents.models import Document, DocumentCategory, DocumentComment, Folder
+        from emails.models import Email, EmailAttachment, EmailCampaign, EmailTemplate
+        from leads.models import Lead
+        from notes.models import Note
+        from tasks.models import Task
+        
+        now = timezone.now()
+        user = get_user_model().objects.create_user(
+            email=f'query-budget-{index}@example.com', username=f'query-budget-{index}',
+            password=None, first_name='User', last_name=str(index),
+        )
+        
+        lead = Lead.objects.create(name=f'Lead {index}', email=f'query-budget-lead-{index}@example.com',
+                                   assigned_to=user)
+        contact = Contact.objects.create(lead=lead, name=f'Contact {index}', email=f'contact-{index}@example.com')
+        Deal.objects.create(lead=lead, title=f'Deal {index}', value=1000, created_by=user)
+        Task.objects.create(title=f'Task {index}', assigned_to=user)
+        Note.objects.create(content='Budget check', lead=lead, contact=contact, created_by=user)
+        Activity.objects.create(activity_type='note', description='Budget check', created_by=user)
+        
+        template = EmailTemplate.objects.create(name=f'Template {index}', category='follow_up',
+                                                subject='Hi', body='Hello', created_by=user)
+        email = Email.objects.create(subject='Hi', body='Hello', from_email='crm@example.com',
+                                     to_email=lead.email, template=template, sent_by=user)
+        EmailAttachment.objects.bulk_create([
+            EmailAttachment(email=email, file='email_attachments/a.pdf', filename='a.pdf', file_size=1)
+            for _ in range(2)
+        ])
+        EmailCampaign.objects.create(name=f'Campaign {index}', subject='Hi', body='Hello',
+                                     template=template, created_by=user)
+        
+        event = CalendarEvent.objects.create(title=f'Event {index}', organizer=user,
+                                             start_time=now + datetime.timedelta(minutes=1),
+                                             end_time=now + datetime.timedelta(hours=1))
+        event.attendees.add(user, self.admin)
+        EventReminder.objects.create(event=event, user=user, remind_at=now)
+        Availability.objects.create(user=user, day_of_week=index % 7,
+                                    start_time=datetime.time(9), end_time=datetime.time(17))
+        Availability.objects.create(user=self.admin, day_of_week=index % 7,
+                                    start_time=datetime.time(9, index % 60), end_time=datetime.time(17))
+        
+        category = DocumentCategory.objects.create(name=f'Category {index}')
+        # bulk_create skips Document.save(), which reads the size of the stored file
+        document, = Document.objects.bulk_create([
+            Document(title=f'Document {index}', file='documents/budget.pdf', file_size=1, file_type='pdf',
+                     category=category, uploaded_by=self.admin)
+        ])
+        document.shared_with.add(user, self.admin)
+        DocumentComment.objects.bulk_create([
+            DocumentComment(document=document, user=user, comment='Looks good') for _ in range(2)
+        ])
+        
+        root = Folder.objects.create(name=f'Folder {index}', owner=self.admin)
+        child = Folder.objects.create(name='Child', parent=root, owner=user)
+        Folder.objects.create(name='Grandchild', parent=child, owner=user)
+        root.shared_with.add(user)
+        
+        from clients.models import Client, ClientInteraction, ClientProject
+        if Client._meta.db_table in self.tables:
+            client = Client.objects.create(company_name=f'Client {index}', contact_person='Jane',
+                                           email=f'client-{index}@example.com', contract_value=1000,
+                                           contract_start_date=now.date() - datetime.timedelta(days=400),
+                                           account_manager=user, created_by=user)
+            ClientProject.objects.create(client=client, project_name='Project', start_date=now.date(),
+                                         budget=100, project_manager=user)
+            ClientInteraction.objects.create(client=client, interaction_type='call', subject='Call',
+                                             notes='Budget check', interaction_date=now, user=user)
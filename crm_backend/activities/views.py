@@ -5,7 +5,7 @@ from .serializers import ActivitySerializer
 
 
 class ActivityViewSet(viewsets.ModelViewSet):
-    queryset = Activity.objects.all()
+    queryset = Activity.objects.select_related('created_by')
     serializer_class = ActivitySerializer
     permission_classes = [IsAuthenticated]
     
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AiFeaturesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_features'
+    
+    def ready(self):
+        # Count queries on every database connection for the AI metrics.
+        # Light: the AI modules themselves are still imported on first use.
+        from . import instrumentation  # noqa: F401
@@ -5,13 +5,58 @@ Categorizes leads based on various signals:
 - Lead Score (primary factor)
 - Urgency (based on status)
 - Engagement (interactions)
+- Sentiment of the notes about the lead (optional, from its sentiment
+  rollup - see notes/rollups.py)
 
 In production, this would use a Naive Bayes classifier or similar ML model.
 For simplicity, we use a rule-based scoring system that aggregates these signals.
 """
+from datetime import timedelta
 
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
 
-def categorize_lead(lead):
+from .features import FEATURE_COLUMNS, STATUS_CODES, code_table, get_lead_features
+from .instrumentation import instrument
+
+
+# Weights of each signal in the final categorization score
+SCORE_WEIGHT = 0.5
+URGENCY_WEIGHT = 0.3
+ENGAGEMENT_WEIGHT = 0.2
+
+# Final score thresholds
+HOT_THRESHOLD = 70
+WARM_THRESHOLD = 40
+
+# Status-based urgency (0-100)
+STATUS_URGENCY = {
+    'qualified': 100,
+    'contacted': 70,
+    'new': 40,
+    'lost': 0,
+    'converted': 0,
+}
+DEFAULT_URGENCY = 30
+# STATUS_URGENCY indexed by status code (see features.code_table)
+URGENCY_BY_CODE = code_table(STATUS_URGENCY, STATUS_CODES, DEFAULT_URGENCY)
+
+# Engagement points (0-100)
+POINTS_PER_CONTACT = 20
+MAX_CONTACT_POINTS = 40
+POINTS_PER_DEAL = 30
+MAX_DEAL_POINTS = 60
+
+# Sentiment adjustment, added to the final score: the mean note polarity
+# (-1 to 1) times settings.AI_CATEGORY_SENTIMENT_POINTS, minus
+# settings.AI_CATEGORY_RECENT_NEGATIVE_PENALTY when a negative note was
+# written in the last RECENT_NEGATIVE_DAYS days. Both weights default to 0.
+RECENT_NEGATIVE_DAYS = 14
+
+
+@instrument()
+def categorize_lead(lead, features=None, sentiment=None):
     """
     Categorize a lead as Hot, Warm, or Cold.
     
@@ -25,34 +70,46 @@ def categorize_lead(lead):
     - Base Lead Score (50% weight)
     - Urgency Score (30% weight)
     - Engagement Score (20% weight)
+    plus the sentiment adjustment when a sentiment rollup is given.
     
     Args:
         lead: Lead model instance
+        features: Optional LeadFeatureSnapshot shared with calculate_lead_score
+        sentiment: Optional LeadSentimentRollup of the lead
+            (notes.rollups.get_lead_sentiment), read without touching the notes
     
     Returns:
         str: 'hot', 'warm', or 'cold'
     """
+    if features is None:
+        features = get_lead_features(lead)
+    
     # Use the lead score we already calculated (or 0 if missing)
     score = lead.score if hasattr(lead, 'score') and lead.score else 0
     
     # Additional factors for categorization
-    urgency_score = _calculate_urgency(lead)
-    engagement_score = _calculate_engagement(lead)
+    urgency_score = _calculate_urgency(features)
+    engagement_score = _calculate_engagement(features)
     
     # Weighted final score calculation
     # We prioritize the base score but boost it with urgency and engagement
-    final_score = (score * 0.5) + (urgency_score * 0.3) + (engagement_score * 0.2)
+    final_score = (
+        (score * SCORE_WEIGHT)
+        + (urgency_score * URGENCY_WEIGHT)
+        + (engagement_score * ENGAGEMENT_WEIGHT)
+        + sentiment_adjustment(sentiment)
+    )
     
     # Categorize based on final weighted score thresholds
-    if final_score >= 70:
+    if final_score >= HOT_THRESHOLD:
         return 'hot'
-    elif final_score >= 40:
+    elif final_score >= WARM_THRESHOLD:
         return 'warm'
     else:
         return 'cold'
 
 
-def _calculate_urgency(lead):
+def _calculate_urgency(features):
     """
     Calculate urgency score based on lead status and recent activity.
     Returns score from 0-100.
@@ -60,38 +117,160 @@ def _calculate_urgency(lead):
     score = 0
     
     # Status-based urgency
-    status_urgency = {
-        'qualified': 100,
-        'contacted': 70,
-        'new': 40,
-        'lost': 0,
-        'converted': 0,
-    }
-    score += status_urgency.get(lead.status, 30)
+    score += STATUS_URGENCY.get(features.status, DEFAULT_URGENCY)
     
     return score
 
 
-def _calculate_engagement(lead):
+def _calculate_engagement(features):
     """
     Calculate engagement score based on interactions.
     Returns score from 0-100.
     """
     score = 0
     
-    # Check for contacts
-    if hasattr(lead, 'contacts'):
-        contact_count = lead.contacts.count()
-        score += min(contact_count * 20, 40)  # Up to 40 points
+    # Contacts at the company
+    score += min(features.contact_count * POINTS_PER_CONTACT, MAX_CONTACT_POINTS)
     
-    # Check for deals
-    if hasattr(lead, 'deals'):
-        deal_count = lead.deals.count()
-        score += min(deal_count * 30, 60)  # Up to 60 points
+    # Open deals
+    score += min(features.deal_count * POINTS_PER_DEAL, MAX_DEAL_POINTS)
     
     return min(score, 100)
 
 
+def sentiment_adjustment(rollup, now=None):
+    """
+    Points added to the final score for the tone of the notes about a lead.
+    
+    Args:
+        rollup: LeadSentimentRollup, or None
+        now: Optional reference time for "recent" (default: now)
+    
+    Returns:
+        float: from -(AI_CATEGORY_SENTIMENT_POINTS +
+        AI_CATEGORY_RECENT_NEGATIVE_PENALTY) to AI_CATEGORY_SENTIMENT_POINTS,
+        0 without analyzed notes or when sentiment is not weighted
+    """
+    if rollup is None or not rollup.note_count or not sentiment_affects_category():
+        return 0
+    
+    points = rollup.mean_polarity * settings.AI_CATEGORY_SENTIMENT_POINTS
+    if rollup.last_negative_at is not None:
+        now = now or timezone.now()
+        if rollup.last_negative_at >= now - timedelta(days=RECENT_NEGATIVE_DAYS):
+            points -= settings.AI_CATEGORY_RECENT_NEGATIVE_PENALTY
+    return points
+
+
+def sentiment_affects_category():
+    """Whether note sentiment is weighted in the categorization at all"""
+    return bool(settings.AI_CATEGORY_SENTIMENT_POINTS or settings.AI_CATEGORY_RECENT_NEGATIVE_PENALTY)
+
+
+@instrument()
+def categorize_leads_bulk(scores, statuses, contact_counts, deal_counts, sentiment_points=None):
+    """
+    Vectorized version of categorize_lead.
+    
+    Every argument is a sequence with one entry per lead. Applies the same
+    weights and thresholds as the per-lead function with NumPy.
+    sentiment_points holds the sentiment_adjustment of each lead.
+    
+    Returns:
+        numpy.ndarray: 'hot', 'warm' or 'cold' for each lead
+    """
+    final_score = final_scores_bulk(
+        np.asarray(scores, dtype=np.int64),
+        urgency_bulk(statuses),
+        engagement_bulk(contact_counts, deal_counts),
+        sentiment_points,
+    )
+    return np.array(CATEGORIES)[category_codes_bulk(final_score)]
+
+
+@instrument()
+def categorize_feature_matrix(scores, matrix, sentiment_points=None):
+    """
+    categorize_leads_bulk over encoded features.
+    
+    Args:
+        scores: Lead score of each lead
+        matrix: One row per lead, FEATURE_COLUMNS first - from
+            encode_features or feature_store.LeadFeatureMatrix
+        sentiment_points: Optional sentiment_adjustment of each lead
+    
+    Returns:
+        numpy.ndarray: 'hot', 'warm' or 'cold' for each lead
+    """
+    def column(name):
+        return matrix[:, FEATURE_COLUMNS.index(name)]
+    
+    final_score = final_scores_bulk(
+        np.asarray(scores, dtype=np.int64),
+        urgency_codes_bulk(column('status')),
+        engagement_bulk(column('contact_count'), column('deal_count')),
+        sentiment_points,
+    )
+    return np.array(CATEGORIES)[category_codes_bulk(final_score)]
+
+
+# Category codes used by category_codes_bulk
+CATEGORIES = ('cold', 'warm', 'hot')
+
+
+def urgency_bulk(statuses):
+    """Urgency score (0-100) of each status"""
+    return np.fromiter(
+        (STATUS_URGENCY.get(s, DEFAULT_URGENCY) for s in statuses), dtype=np.int64
+    )
+
+
+def urgency_codes_bulk(status_codes):
+    """Urgency score (0-100) of each encoded status (features.STATUS_CODES)"""
+    return URGENCY_BY_CODE[np.asarray(status_codes, dtype=np.int64)]
+
+
+def engagement_bulk(contact_counts, deal_counts):
+    """Engagement score (0-100) of each lead"""
+    contacts = np.asarray(contact_counts, dtype=np.int64)
+    deals = np.asarray(deal_counts, dtype=np.int64)
+    return np.minimum(
+        np.minimum(contacts * POINTS_PER_CONTACT, MAX_CONTACT_POINTS)
+        + np.minimum(deals * POINTS_PER_DEAL, MAX_DEAL_POINTS),
+        100
+    )
+
+
+def final_scores_bulk(scores, urgency, engagement, sentiment_points=None,
+                      score_weight=SCORE_WEIGHT, urgency_weight=URGENCY_WEIGHT,
+                      engagement_weight=ENGAGEMENT_WEIGHT):
+    """
+    Weighted categorization score of each lead.
+    
+    The weights default to the ones categorize_lead uses; other values
+    are for simulations (see simulation.py).
+    """
+    final_score = (
+        (scores * score_weight)
+        + (urgency * urgency_weight)
+        + (engagement * engagement_weight)
+    )
+    if sentiment_points is not None:
+        final_score = final_score + np.asarray(sentiment_points, dtype=np.float64)
+    return final_score
+
+
+def category_codes_bulk(final_scores, hot_threshold=HOT_THRESHOLD, warm_threshold=WARM_THRESHOLD):
+    """
+    Category of each final score, as an index into CATEGORIES
+    (0 cold, 1 warm, 2 hot).
+    """
+    return (
+        (final_scores >= warm_threshold).astype(np.int8)
+        + (final_scores >= hot_threshold).astype(np.int8)
+    )
+
+
 def get_category_details(category):
     """
     Get recommended actions for each category.
@@ -8,9 +8,19 @@ safe output without the unpredictability of raw LLM generation.
 Future Enhancement:
 In production, this could be connected to OpenAI/Anthropic APIs for more dynamic generation,
 but templates are often preferred in regulated industries for compliance.
+
+Templates are compiled once, at import, into TEMPLATE_REGISTRY: each one
+is split into literal text and placeholders and knows its required
+variables, so rendering never parses the template again.
+generate_emails_bulk renders one template for many leads or contacts.
 """
 
 
+from string import Formatter
+
+from .instrumentation import instrument
+
+
 # Email templates for different purposes
 # These serve as the base for generation
 EMAIL_TEMPLATES = {
@@ -76,6 +86,91 @@ Best regards,
 }
 
 
+class CompiledTemplate:
+    """
+    An email template parsed once into literal text and placeholders.
+    
+    The variables a template needs are known before rendering, so missing
+    ones are reported all at once instead of one KeyError at a time.
+    """
+    __slots__ = ('email_type', 'required_variables', '_subject', '_body')
+    
+    def __init__(self, email_type, subject, body):
+        self.email_type = email_type
+        self._subject = _compile(subject)
+        self._body = _compile(body)
+        self.required_variables = tuple(sorted(
+            {name for _, name, _ in self._subject + self._body if name is not None}
+        ))
+    
+    def missing_variables(self, context):
+        """Required variables absent from context, in alphabetical order"""
+        return [name for name in self.required_variables if name not in context]
+    
+    def render(self, context):
+        """
+        Render subject and body.
+        
+        Args:
+            context: Mapping with every variable in required_variables
+        
+        Returns:
+            tuple: (subject, body)
+        """
+        return _render(self._subject, context), _render(self._body, context)
+
+
+def _compile(template_string):
+    """
+    Split a str.format template into (literal, variable, format_spec) parts.
+    Doubled braces come out as literal braces, as with str.format.
+    """
+    parts = []
+    for literal, name, format_spec, conversion in Formatter().parse(template_string):
+        if conversion:
+            raise ValueError(f'Conversions are not supported in email templates: {{{name}!{conversion}}}')
+        if name is not None and not name.isidentifier():
+            raise ValueError(f'Invalid email template variable: {{{name}}}')
+        parts.append((literal, name, format_spec))
+    return tuple(parts)
+
+
+def _render(parts, context):
+    pieces = []
+    for literal, name, format_spec in parts:
+        pieces.append(literal)
+        if name is not None:
+            value = context[name]
+            pieces.append(format(value, format_spec) if format_spec else str(value))
+    return ''.join(pieces)
+
+
+# email type -> CompiledTemplate, built once at import
+TEMPLATE_REGISTRY = {
+    email_type: CompiledTemplate(email_type, template['subject'], template['body'])
+    for email_type, template in EMAIL_TEMPLATES.items()
+}
+
+
+def register_template(email_type, subject, body):
+    """
+    Add or replace an email type in the registry.
+    
+    Returns:
+        CompiledTemplate
+    """
+    compiled = CompiledTemplate(email_type, subject, body)
+    EMAIL_TEMPLATES[email_type] = {'subject': subject, 'body': body}
+    TEMPLATE_REGISTRY[email_type] = compiled
+    return compiled
+
+
+def get_template(email_type):
+    """The compiled template of an email type, or None if it doesn't exist"""
+    return TEMPLATE_REGISTRY.get(email_type)
+
+
+@instrument()
 def generate_email(email_type, context):
     """
     Generate a professional email based on type and context.
@@ -90,40 +185,114 @@ def generate_email(email_type, context):
         dict: {'subject': str, 'body': str, 'email_type': str}
               OR {'error': str, ...} if validation fails
     """
+    template = get_template(email_type)
+    
     # Validate email type
-    if email_type not in EMAIL_TEMPLATES:
+    if template is None:
         return {
             'error': f'Unknown email type: {email_type}',
-            'available_types': list(EMAIL_TEMPLATES.keys())
+            'available_types': list(TEMPLATE_REGISTRY)
         }
     
-    template = EMAIL_TEMPLATES[email_type]
-    
-    try:
-        # Perform variable substitution safely
-        subject = template['subject'].format(**context)
-        body = template['body'].format(**context)
-        
-        return {
-            'subject': subject,
-            'body': body,
-            'email_type': email_type
-        }
-    except KeyError as e:
-        # Handle missing variables gracefully
+    # Handle missing variables gracefully
+    missing = template.missing_variables(context)
+    if missing:
         return {
-            'error': f'Missing required context variable: {str(e)}',
-            'required_variables': _extract_variables(template['subject'] + template['body'])
+            'error': f'Missing required context variables: {", ".join(missing)}',
+            'missing_variables': missing,
+            'required_variables': list(template.required_variables)
         }
+    
+    subject, body = template.render(context)
+    return {
+        'subject': subject,
+        'body': body,
+        'email_type': email_type
+    }
+
+
+# Variables filled from each recipient by generate_emails_bulk
+RECIPIENT_VARIABLES = ('contact_name', 'company_name')
+
+
+def recipient_rows(recipient_type, ids, chunk_size=2000):
+    """
+    Stream (id, email, contact_name, company_name) of leads or contacts,
+    with one query.
+    
+    For a lead the contact is the lead itself; for a contact the company
+    is the company of its lead.
+    
+    Args:
+        recipient_type: 'lead' or 'contact'
+        ids: Primary keys of the recipients
+    """
+    if recipient_type == 'lead':
+        from leads.models import Lead
+        queryset = Lead.objects.filter(id__in=ids).values_list('id', 'email', 'name', 'company')
+    elif recipient_type == 'contact':
+        from contacts.models import Contact
+        queryset = Contact.objects.filter(id__in=ids).values_list('id', 'email', 'name', 'lead__company')
+    else:
+        raise ValueError(f'Unknown recipient type: {recipient_type}')
+    return queryset.order_by('id').iterator(chunk_size=chunk_size)
+
+
+@instrument()
+def generate_emails_bulk(email_type, recipients, context=None):
+    """
+    Render one email type for many recipients, one at a time.
+    
+    contact_name and company_name are filled from each recipient; context
+    holds the variables shared by every email (sender_name, topic, ...).
+    Check the shared variables with missing_shared_variables first: this
+    generator reports per recipient only what the recipient lacks (e.g. a
+    lead without a company).
+    
+    Args:
+        email_type: Type of email, see TEMPLATE_REGISTRY
+        recipients: Iterable of (id, email, contact_name, company_name),
+            e.g. recipient_rows('lead', ids)
+        context: Variables shared by every email
+    
+    Yields:
+        dict: {'id', 'email', 'subject', 'body'} or
+              {'id', 'email', 'error', 'missing_variables'}
+    """
+    template = TEMPLATE_REGISTRY[email_type]
+    context = dict(context or {})
+    
+    for recipient_id, email, contact_name, company_name in recipients:
+        context['contact_name'] = contact_name
+        context['company_name'] = company_name
+        
+        missing = [
+            name for name in template.required_variables
+            if name not in context or (name in RECIPIENT_VARIABLES and not context[name])
+        ]
+        if missing:
+            yield {
+                'id': recipient_id,
+                'email': email,
+                'error': f'Missing required context variables: {", ".join(missing)}',
+                'missing_variables': missing,
+            }
+            continue
+        
+        subject, body = template.render(context)
+        yield {'id': recipient_id, 'email': email, 'subject': subject, 'body': body}
 
 
-def _extract_variables(template_string):
+def missing_shared_variables(email_type, context):
     """
-    Helper to extract variable names from template string for error reporting.
-    Finds all {variable_name} patterns.
+    Variables of an email type that neither the recipients nor context
+    provide, for generate_emails_bulk.
     """
-    import re
-    return list(set(re.findall(r'\{(\w+)\}', template_string)))
+    template = TEMPLATE_REGISTRY[email_type]
+    return [
+        name for name in template.missing_variables(context)
+        if name not in RECIPIENT_VARIABLES
+    ]
 
 
 # Example of how to use with OpenAI GPT API (commented for reference):
@@ -0,0 +1,288 @@
+"""
+Precomputed lead features (the LeadFeatures table).
+
+Scoring, categorization and the categorization simulator all look at the
+same encoded features of a lead: source and status codes, data
+completeness, contact and deal counts, age. Rather than encoding them
+from the Lead columns on every call, they are stored once per lead,
+already encoded (features.FEATURE_COLUMNS codes), and rewritten only by
+the writes that change them (see leads/signals.py):
+    - a Lead saved through the ORM, unless update_fields names none of
+      SOURCE_FIELDS (e.g. saving score and category)
+    - a contact or deal added, removed or moved to another lead
+
+Readers get a dense NumPy matrix: LeadFeatureMatrix.load() streams the
+whole table in one query; iter_feature_chunks() reads one query per
+chunk, for callers that write between chunks.
+
+Writes that bypass signals (bulk_create, queryset.update, raw SQL) are
+not tracked, and leads without a row are left out of the matrix - run
+`manage.py rebuild_lead_features --check` to detect drift and
+`manage.py rebuild_lead_features` to repair it. Bulk scoring stores the
+missing rows of the leads it scores first (fill_missing_features).
+"""
+from datetime import date, timezone as dt_timezone
+
+import numpy as np
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .features import FEATURE_COLUMNS, get_lead_features
+from .instrumentation import instrument
+
+
+# Stored fields, in the order they are read
+STORED_FIELDS = FEATURE_COLUMNS + ('created_day',)
+
+# Columns of LeadFeatureMatrix.matrix: the lead scoring model inputs,
+# then the age of the lead in days
+MATRIX_COLUMNS = FEATURE_COLUMNS + ('days_since_created',)
+COLUMN_INDEX = {name: index for index, name in enumerate(MATRIX_COLUMNS)}
+
+# Lead fields the features are computed from
+SOURCE_FIELDS = ('source', 'status', 'company', 'phone', 'website', 'contact_count', 'deal_count', 'created_at')
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(moment):
+    """Days from 1970-01-01 to a datetime, in UTC"""
+    if timezone.is_aware(moment):
+        moment = moment.astimezone(dt_timezone.utc)
+    return (moment.date() - EPOCH).days
+
+
+def feature_values(lead):
+    """Stored field values of a saved Lead instance (no queries)"""
+    values = dict(zip(FEATURE_COLUMNS, get_lead_features(lead).as_row()))
+    values['created_day'] = day_number(lead.created_at)
+    return values
+
+
+def save_lead_features(leads):
+    """
+    Write the features of saved Lead instances, inserting or replacing
+    their rows in one query.
+    
+    Returns:
+        int: Number of rows written
+    """
+    from .models import LeadFeatures
+    
+    rows = [LeadFeatures(lead_id=lead.pk, **feature_values(lead)) for lead in leads]
+    if rows:
+        LeadFeatures.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['lead'],
+            update_fields=[*STORED_FIELDS, 'updated_at'],
+        )
+    return len(rows)
+
+
+def refresh_lead_features(lead_ids):
+    """Recompute the features of some leads from the leads table (two queries)"""
+    from leads.models import Lead
+    
+    leads = Lead.objects.filter(pk__in=list(lead_ids)).order_by().only(*SOURCE_FIELDS)
+    return save_lead_features(leads)
+
+
+def _iter_lead_chunks(chunk_size):
+    """Every lead with its SOURCE_FIELDS, by primary key, one query per chunk"""
+    from leads.models import Lead
+    
+    queryset = Lead.objects.order_by('pk').only(*SOURCE_FIELDS)
+    last_id = 0
+    while True:
+        leads = list(queryset.filter(pk__gt=last_id)[:chunk_size])
+        if not leads:
+            return
+        yield leads
+        last_id = leads[-1].pk
+
+
+def rebuild_lead_features(chunk_size=5000):
+    """
+    Recompute the features of every lead.
+    
+    Returns:
+        int: Number of rows written
+    """
+    written = 0
+    for leads in _iter_lead_chunks(chunk_size):
+        with transaction.atomic():
+            written += save_lead_features(leads)
+    return written
+
+
+def fill_missing_features(queryset=None, chunk_size=5000):
+    """
+    Store the features of the leads of a Lead queryset (default: every
+    lead) that have no row yet, e.g. leads added with bulk_create.
+    
+    Returns:
+        int: Number of rows written
+    """
+    from leads.models import Lead
+    
+    missing = Lead.objects.filter(features__isnull=True)
+    if queryset is not None:
+        missing = missing.filter(pk__in=queryset.values('pk'))
+    missing = missing.order_by('pk').only(*SOURCE_FIELDS)
+    
+    written = 0
+    last_id = 0
+    while True:
+        leads = list(missing.filter(pk__gt=last_id)[:chunk_size])
+        if not leads:
+            return written
+        with transaction.atomic():
+            written += save_lead_features(leads)
+        last_id = leads[-1].pk
+
+
+def iter_feature_drift(chunk_size=5000):
+    """
+    Compare the stored features with the leads, one chunk at a time.
+    
+    Yields:
+        tuple: (lead id, stored values, expected values) of every lead
+        whose row differs, values in STORED_FIELDS order; stored values
+        are None for a missing row
+    """
+    from .models import LeadFeatures
+    
+    for leads in _iter_lead_chunks(chunk_size):
+        rows = LeadFeatures.objects.filter(
+            pk__gte=leads[0].pk, pk__lte=leads[-1].pk
+        ).values_list('pk', *STORED_FIELDS)
+        stored = {row[0]: row[1:] for row in rows}
+        for lead in leads:
+            values = feature_values(lead)
+            expected = tuple(values[name] for name in STORED_FIELDS)
+            actual = stored.get(lead.pk)
+            if actual != expected:
+                yield lead.pk, actual, expected
+
+
+def _feature_rows(queryset, lead_fields):
+    """
+    (lead id, *STORED_FIELDS, *lead_fields) of the leads of a Lead
+    queryset that have stored features, by lead id. Without a queryset
+    and lead fields only ai_lead_features is read.
+    """
+    from .models import LeadFeatures
+    
+    if queryset is None:
+        rows = LeadFeatures.objects.values_list('pk', *STORED_FIELDS, *(f'lead__{name}' for name in lead_fields))
+    else:
+        # From the leads side, so their filters keep using the leads indexes
+        rows = queryset.filter(features__isnull=False).values_list(
+            'pk', *(f'features__{name}' for name in STORED_FIELDS), *lead_fields
+        )
+    return rows.order_by('pk')
+
+
+def _execute(rows):
+    """
+    Run a values_list() queryset on a plain cursor.
+    
+    Skips the per-row conversions of the ORM (about half the time of
+    reading every lead): every stored field is an integer, and booleans
+    come back as 0/1 or True/False, both fine for NumPy.
+    """
+    sql, params = rows.query.sql_with_params()
+    cursor = connections[rows.db].cursor()
+    cursor.execute(sql, params)
+    return cursor
+
+
+class LeadFeatureMatrix:
+    """
+    Stored features of many leads as one dense int32 matrix.
+    
+    Rows are ordered by lead id (ids) and columns are MATRIX_COLUMNS, so
+    matrix[:, :len(FEATURE_COLUMNS)] is the input of the lead scoring
+    model. Lead fields asked for with lead_fields (e.g. the stored score)
+    come along as arrays in fields, as the database returns them.
+    """
+    
+    def __init__(self, ids, matrix, fields=None):
+        self.ids = ids
+        self.matrix = matrix
+        self.fields = fields or {}
+        self.loaded_at = timezone.now()
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def column(self, name):
+        """One column of the matrix, by MATRIX_COLUMNS name"""
+        return self.matrix[:, COLUMN_INDEX[name]]
+    
+    @classmethod
+    def from_rows(cls, rows, lead_fields=(), today=None):
+        """Build from _feature_rows() tuples"""
+        if not rows:
+            return cls(
+                np.array([], dtype=np.int64),
+                np.empty((0, len(MATRIX_COLUMNS)), dtype=np.int32),
+                {name: np.array([]) for name in lead_fields},
+            )
+        if today is None:
+            today = day_number(timezone.now())
+        
+        width = 1 + len(STORED_FIELDS)
+        fields = {}
+        if lead_fields:
+            columns = list(zip(*rows))
+            data = np.array(columns[:width], dtype=np.int64).T
+            fields = {name: np.array(columns[width + index]) for index, name in enumerate(lead_fields)}
+        else:
+            data = np.array(rows, dtype=np.int64)
+        
+        matrix = data[:, 1:].astype(np.int32)
+        matrix[:, -1] = today - matrix[:, -1]
+        return cls(data[:, 0].copy(), matrix, fields)
+    
+    @classmethod
+    @instrument('feature_store.load')
+    def load(cls, queryset=None, lead_fields=(), chunk_size=20000):
+        """
+        Features of the leads of a Lead queryset (default: every lead),
+        read in one query and converted chunk by chunk.
+        """
+        today = day_number(timezone.now())
+        parts = []
+        with _execute(_feature_rows(queryset, lead_fields)) as cursor:
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                parts.append(cls.from_rows(chunk, lead_fields, today))
+        
+        if not parts:
+            return cls.from_rows([], lead_fields)
+        return cls(
+            np.concatenate([part.ids for part in parts]),
+            np.concatenate([part.matrix for part in parts]),
+            {name: np.concatenate([part.fields[name] for part in parts]) for name in lead_fields},
+        )
+
+
+def iter_feature_chunks(queryset=None, lead_fields=(), chunk_size=2000):
+    """
+    Features of the leads of a Lead queryset, one LeadFeatureMatrix per
+    chunk of chunk_size leads.
+    
+    Each chunk is its own query, walked by lead id (keyset pagination),
+    so the caller may write between chunks.
+    """
+    rows = _feature_rows(queryset, lead_fields)
+    last_id = 0
+    while True:
+        with _execute(rows.filter(pk__gt=last_id)[:chunk_size]) as cursor:
+            chunk = cursor.fetchall()
+        if not chunk:
+            return
+        yield LeadFeatureMatrix.from_rows(chunk, lead_fields)
+        last_id = chunk[-1][0]
@@ -0,0 +1,142 @@
+"""
+Lead feature snapshot shared by Lead Scoring and Lead Categorization.
+
+Both AI functions look at the same signals (source, status, data
+completeness, number of contacts and deals). The snapshot is built once
+per lead and handed to each AI function.
+
+The same features, encoded as numbers, are the input of the trained
+lead scoring model (see ml_scoring.py) and are stored for every lead in
+the LeadFeatures table (see feature_store.py).
+"""
+import numpy as np
+
+
+# Stable integer codes for categorical features.
+# Trained models depend on these values - only ever append new codes.
+SOURCE_CODES = {
+    'website': 0,
+    'referral': 1,
+    'social_media': 2,
+    'email_campaign': 3,
+    'cold_call': 4,
+    'other': 5,
+}
+STATUS_CODES = {
+    'new': 0,
+    'contacted': 1,
+    'qualified': 2,
+    'lost': 3,
+    'converted': 4,
+}
+UNKNOWN_CODE = -1
+
+# Column order of the encoded feature matrix
+FEATURE_COLUMNS = (
+    'source', 'status', 'has_company', 'has_phone', 'has_website',
+    'contact_count', 'deal_count',
+)
+
+# Columns the trained lead scoring model sees (see ml_scoring.py). The
+# model predicts conversion, which is itself a status, so status is left
+# out: with it the model would only learn to read the answer back.
+MODEL_COLUMNS = tuple(column for column in FEATURE_COLUMNS if column != 'status')
+MODEL_COLUMN_INDEXES = [FEATURE_COLUMNS.index(column) for column in MODEL_COLUMNS]
+
+
+def code_table(values, codes, default):
+    """
+    Lookup array turning encoded features back into points.
+    
+    table[codes[key]] is values.get(key, default). The extra last entry
+    holds the default, so UNKNOWN_CODE (-1) reads it.
+    """
+    table = np.full(max(codes.values()) + 2, default, dtype=np.int64)
+    for key, code in codes.items():
+        table[code] = values.get(key, default)
+    return table
+
+
+class LeadFeatureSnapshot:
+    """
+    The inputs of calculate_lead_score and categorize_lead for one lead.
+    """
+    __slots__ = (
+        'source', 'status', 'has_company', 'has_phone', 'has_website',
+        'contact_count', 'deal_count',
+    )
+    
+    def __init__(self, source, status, has_company, has_phone, has_website,
+                 contact_count, deal_count):
+        self.source = source
+        self.status = status
+        self.has_company = has_company
+        self.has_phone = has_phone
+        self.has_website = has_website
+        self.contact_count = contact_count
+        self.deal_count = deal_count
+    
+    @classmethod
+    def from_lead(cls, lead, contact_count, deal_count):
+        return cls(
+            source=lead.source,
+            status=lead.status,
+            has_company=bool(lead.company),
+            has_phone=bool(lead.phone),
+            has_website=bool(lead.website),
+            contact_count=contact_count,
+            deal_count=deal_count,
+        )
+    
+    def as_row(self):
+        """Encoded feature values, in FEATURE_COLUMNS order"""
+        return (
+            SOURCE_CODES.get(self.source, UNKNOWN_CODE),
+            STATUS_CODES.get(self.status, UNKNOWN_CODE),
+            int(self.has_company),
+            int(self.has_phone),
+            int(self.has_website),
+            self.contact_count,
+            self.deal_count,
+        )
+    
+    def __repr__(self):
+        return (
+            f'<LeadFeatureSnapshot {self.source}/{self.status} '
+            f'contacts={self.contact_count} deals={self.deal_count}>'
+        )
+
+
+def get_lead_features(lead):
+    """
+    Build the feature snapshot for a lead.
+    
+    No queries: contact and deal counts are read from the counters that
+    leads.signals keeps up to date on the Lead row.
+    
+    Args:
+        lead: Lead model instance
+    
+    Returns:
+        LeadFeatureSnapshot
+    """
+    return LeadFeatureSnapshot.from_lead(lead, lead.contact_count, lead.deal_count)
+
+
+def encode_features(sources, statuses, has_company, has_phone, has_website,
+                    contact_counts, deal_counts):
+    """
+    Encode per-lead feature sequences into a float matrix for ML models.
+    
+    Returns:
+        numpy.ndarray: shape (n_leads, len(FEATURE_COLUMNS))
+    """
+    return np.column_stack([
+        np.fromiter((SOURCE_CODES.get(s, UNKNOWN_CODE) for s in sources), dtype=np.float64),
+        np.fromiter((STATUS_CODES.get(s, UNKNOWN_CODE) for s in statuses), dtype=np.float64),
+        np.asarray(has_company, dtype=np.float64),
+        np.asarray(has_phone, dtype=np.float64),
+        np.asarray(has_website, dtype=np.float64),
+        np.asarray(contact_counts, dtype=np.float64),
+        np.asarray(deal_counts, dtype=np.float64),
+    ])
@@ -0,0 +1,200 @@
+"""
+Client of the AI inference server (see inference_server.py).
+
+Each web worker that scores leads with the ML model or analyzes text with
+TextBlob loads scikit-learn, SciPy, NLTK and TextBlob: with 8 workers that
+is 8 copies. When AI_INFERENCE_SOCKET is set, workers send the work to
+one `manage.py run_inference_server` process over that Unix socket
+instead, and never import those libraries.
+
+Protocol: every message is a 4-byte big-endian length followed by that
+many bytes of compact JSON. A request is a whole batch, e.g.
+
+    {"op":"sentiment","engine":"textblob","texts":["...","..."]}
+    -> {"ok":true,"result":[[0.5,0.6],[0.0,0.0]]}
+
+    {"op":"predict_scores","rows":[[1.0,0.0,...],...]}
+    -> {"ok":true,"result":[72,15]}
+
+Failed requests answer {"ok":false,"error":code,"message":...}. Each
+thread keeps its connection open between requests.
+
+If the server is not running (or fails, or times out), the call raises
+InferenceUnavailable and the caller does the work in process, as without
+a server. The server is then not tried again for
+AI_INFERENCE_RETRY_INTERVAL seconds, so a stopped server costs one failed
+connect per interval, not one per request.
+"""
+import json
+import logging
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct('!I')
+# Largest message accepted by either side
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+
+class InferenceUnavailable(Exception):
+    """No inference server configured, or it could not answer"""
+
+
+def send_message(sock, message):
+    data = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_message(sock):
+    """
+    Read one message.
+    
+    Returns:
+        The decoded message, or None if the peer closed the connection
+        between two messages
+    
+    Raises:
+        ConnectionError: connection closed in the middle of a message
+        ValueError: message too large or not JSON
+    """
+    header = _receive_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise ValueError(f'Message of {length} bytes exceeds {MAX_MESSAGE_BYTES}')
+    data = _receive_exactly(sock, length)
+    if data is None:
+        raise ConnectionError('Connection closed in the middle of a message')
+    return json.loads(data)
+
+
+def _receive_exactly(sock, size):
+    chunks = []
+    remaining = size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1024 * 1024))
+        if not chunk:
+            if remaining == size:
+                return None
+            raise ConnectionError('Connection closed in the middle of a message')
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+class InferenceClient:
+    """Connections of this process to the inference server, one per thread"""
+    
+    def __init__(self):
+        self._local = threading.local()
+        self._down_until = 0.0
+    
+    def request(self, message):
+        """
+        Send one request and wait for its answer.
+        
+        Returns:
+            The 'result' of the answer
+        
+        Raises:
+            InferenceUnavailable: no server configured, server down, or the
+                request failed on the server
+        """
+        path = settings.AI_INFERENCE_SOCKET
+        if not path:
+            raise InferenceUnavailable('AI_INFERENCE_SOCKET is not set')
+        if time.monotonic() < self._down_until:
+            raise InferenceUnavailable(f'Inference server at {path} is down')
+        
+        # A kept connection may have been closed by a server restart:
+        # retry once on a new one before giving up
+        for attempt in range(2):
+            reused = getattr(self._local, 'sock', None) is not None
+            try:
+                sock = self._connection(path)
+                send_message(sock, message)
+                response = receive_message(sock)
+                if response is None:
+                    raise ConnectionError('Connection closed by the inference server')
+                break
+            except (OSError, ValueError) as e:  # socket.timeout is an OSError
+                self.close()
+                if reused and attempt == 0 and not isinstance(e, socket.timeout):
+                    continue
+                self._down_until = time.monotonic() + settings.AI_INFERENCE_RETRY_INTERVAL
+                logger.warning('Inference server at %s unavailable (%s), running in process for %ss',
+                               path, e, settings.AI_INFERENCE_RETRY_INTERVAL)
+                raise InferenceUnavailable(str(e)) from e
+        
+        if not response.get('ok'):
+            if response.get('error') == 'model_unavailable':
+                from .ml_scoring import ModelUnavailable
+                raise ModelUnavailable(response.get('message'))
+            logger.error('Inference server could not run %s: %s', message.get('op'), response.get('message'))
+            raise InferenceUnavailable(response.get('message'))
+        return response['result']
+    
+    def _connection(self, path):
+        sock = getattr(self._local, 'sock', None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(settings.AI_INFERENCE_TIMEOUT)
+            try:
+                sock.connect(path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+    
+    def close(self):
+        """Close this thread's connection"""
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+    
+    def reset(self):
+        """Close this thread's connection and try the server again on the next request"""
+        self.close()
+        self._down_until = 0.0
+
+
+# One client per worker process
+client = InferenceClient()
+
+
+def server_sentiment_scores(texts, engine):
+    """
+    (polarity, subjectivity) of every text, computed by the server.
+    
+    Args:
+        texts: List of non-blank strings
+        engine: Sentiment engine name
+    """
+    result = client.request({'op': 'sentiment', 'engine': engine, 'texts': texts})
+    return [tuple(scores) for scores in result]
+
+
+def server_predict_scores(matrix):
+    """
+    ml_scoring.predict_scores on the server.
+    
+    Raises:
+        ModelUnavailable: the server has no usable model
+    """
+    rows = np.asarray(matrix, dtype=np.float64).tolist()
+    return np.array(client.request({'op': 'predict_scores', 'rows': rows}), dtype=np.int64)
+
+
+def server_status():
+    """pid, uptime, resident memory and request count of the server"""
+    return client.request({'op': 'ping'})
@@ -0,0 +1,160 @@
+"""
+AI inference server: one process holding the models for every worker.
+
+Started with `manage.py run_inference_server`. It loads the sentiment
+engine and the lead scoring model once and answers the requests of the
+web workers on a Unix socket (protocol in inference.py). Each connection
+is served by its own thread; large sentiment batches go to the server's
+own sentiment process pool (AI_SENTIMENT_WORKERS), as they would in a web
+worker.
+
+The model artifact is reloaded when it changes, as in the workers (see
+ml_scoring.ModelCache).
+"""
+import logging
+import os
+import resource
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .inference import receive_message, send_message
+from .instrumentation import instrument
+from .ml_scoring import ModelUnavailable, predict_scores_in_process
+
+
+logger = logging.getLogger(__name__)
+
+
+def rss_kb():
+    """Resident memory of this process in KiB (the peak, where /proc is missing)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    """Answers the requests of one connection until the worker closes it"""
+    
+    def handle(self):
+        while True:
+            try:
+                message = receive_message(self.request)
+            except (OSError, ValueError) as e:
+                logger.warning('Dropping inference connection: %s', e)
+                return
+            if message is None:
+                return
+            try:
+                send_message(self.request, self.server.dispatch(message))
+            except OSError:
+                return
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    
+    def __init__(self, path):
+        self.path = path
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self._requests_lock = threading.Lock()
+        self.operations = {
+            'ping': self.ping,
+            'sentiment': sentiment,
+            'predict_scores': predict_scores,
+        }
+        _remove_stale_socket(path)
+        super().__init__(path, InferenceHandler)
+        # Only processes of the same user (and group) may connect
+        os.chmod(path, 0o660)
+    
+    def dispatch(self, message):
+        with self._requests_lock:
+            self.requests += 1
+        name = message.get('op') if isinstance(message, dict) else None
+        operation = self.operations.get(name)
+        if operation is None:
+            return {'ok': False, 'error': 'unknown_operation', 'message': f'Unknown operation: {name}'}
+        try:
+            return {'ok': True, 'result': operation(message)}
+        except ModelUnavailable as e:
+            return {'ok': False, 'error': 'model_unavailable', 'message': str(e)}
+        except Exception as e:
+            logger.exception('Inference request %s failed', name)
+            return {'ok': False, 'error': 'failed', 'message': str(e)}
+    
+    def ping(self, message):
+        return {
+            'pid': os.getpid(),
+            'uptime': round(time.monotonic() - self.started_at, 1),
+            'rss_kb': rss_kb(),
+            'requests': self.requests,
+        }
+    
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_stale_socket(path):
+    """Delete a socket file left by a server that died, refuse to replace a live one"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+    else:
+        raise RuntimeError(f'An inference server is already listening on {path}')
+    finally:
+        probe.close()
+
+
+@instrument('inference_server.sentiment')
+def sentiment(message):
+    from .sentiment_pool import score_texts_pooled
+    return score_texts_pooled(message['texts'], message.get('engine'))
+
+
+@instrument('inference_server.predict_scores')
+def predict_scores(message):
+    return predict_scores_in_process(np.array(message['rows'], dtype=np.float64)).tolist()
+
+
+def load_models():
+    """
+    Load the sentiment engine and the lead scoring model.
+    
+    Returns:
+        dict: seconds spent per step
+    """
+    from .ml_scoring import model_cache
+    from .sentiment_engines import get_engine
+    
+    timings = {}
+    started = time.perf_counter()
+    get_engine().load()
+    timings['sentiment'] = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    try:
+        model_cache.get()
+    except ModelUnavailable:
+        pass  # Already logged, workers get 'model_unavailable' and use rules
+    timings['model'] = time.perf_counter() - started
+    return timings
@@ -0,0 +1,377 @@
+"""
+Latency, query and error metrics for the AI functions.
+
+Every AI entry point is wrapped with @instrument. Each call records, per
+function and in process memory:
+    - calls and errors (calls that raised)
+    - total and maximum latency, and a latency histogram
+    - database queries run by the calling thread during the call
+
+Nested instrumented calls are each counted in full (score_lead includes
+the time and queries of calculate_lead_score). For generator functions,
+only the time spent producing items counts, not the time the consumer
+spends between them.
+
+Aggregation across workers: each process writes its totals to its own
+JSON file in AI_METRICS_DIR, at most every AI_METRICS_FLUSH_INTERVAL
+seconds and when it exits. /api/ai/metrics/ adds up all the files. The
+files of processes that have exited (recycled web workers, finished
+management commands) are first merged into one RETIRED_FILE and deleted,
+so the directory holds one file per running process plus that one, and
+the totals still include workers that have stopped. Only the files
+written on the collecting host are merged, since the others' processes
+cannot be checked from here. Delete the directory to start from zero.
+"""
+import atexit
+import fcntl
+import functools
+import inspect
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# File this process writes its metrics to
+PROCESS_ID = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+HOSTNAME = socket.gethostname()
+
+# Totals of the processes that have exited, and the lock guarding merges
+RETIRED_FILE = 'retired.json'
+LOCK_FILE = 'metrics.lock'
+
+
+class FunctionMetrics:
+    """Totals for one instrumented function"""
+    __slots__ = ('calls', 'errors', 'total_ms', 'max_ms', 'queries', 'histogram')
+    
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        # One counter per bucket, plus one for slower calls
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    
+    def record(self, elapsed_ms, queries, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.queries += queries
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                break
+        else:
+            index = len(LATENCY_BUCKETS_MS)
+        self.histogram[index] += 1
+    
+    def add(self, values):
+        """Add the totals of another FunctionMetrics, in as_dict() form"""
+        self.calls += values['calls']
+        self.errors += values['errors']
+        self.total_ms += values['total_ms']
+        self.max_ms = max(self.max_ms, values['max_ms'])
+        self.queries += values['queries']
+        for index, count in enumerate(values['histogram'][:len(self.histogram)]):
+            self.histogram[index] += count
+        return self
+    
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': self.total_ms,
+            'max_ms': self.max_ms,
+            'queries': self.queries,
+            'histogram': list(self.histogram),
+        }
+
+
+class MetricsRegistry:
+    """The metrics of this process, written to AI_METRICS_DIR now and then"""
+    
+    def __init__(self):
+        self._functions = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+    
+    def record(self, name, elapsed_ms, queries, failed):
+        with self._lock:
+            metrics = self._functions.get(name)
+            if metrics is None:
+                metrics = self._functions[name] = FunctionMetrics()
+            metrics.record(elapsed_ms, queries, failed)
+            due = time.monotonic() - self._last_flush >= settings.AI_METRICS_FLUSH_INTERVAL
+        if due:
+            self.flush()
+    
+    def snapshot(self):
+        """This process's metrics, by function name"""
+        with self._lock:
+            return {name: metrics.as_dict() for name, metrics in self._functions.items()}
+    
+    def flush(self):
+        """Write this process's metrics to its file (replaced atomically)"""
+        self._last_flush = time.monotonic()
+        functions = self.snapshot()
+        if not functions:
+            return
+        directory = Path(settings.AI_METRICS_DIR)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f'{PROCESS_ID}.json'
+            temporary = path.with_suffix('.tmp')
+            temporary.write_text(json.dumps({
+                'pid': os.getpid(), 'host': HOSTNAME, 'written_at': time.time(), 'functions': functions,
+            }))
+            temporary.replace(path)
+        except OSError:
+            logger.exception('Could not write AI metrics to %s', directory)
+    
+    def clear(self):
+        with self._lock:
+            self._functions.clear()
+
+
+registry = MetricsRegistry()
+
+
+def _flush_at_exit():
+    try:
+        registry.flush()
+    except Exception:  # Settings may be gone at interpreter exit
+        pass
+
+
+atexit.register(_flush_at_exit)
+
+
+# Queries run by each thread. Counted by a wrapper installed once on every
+# database connection: entering connection.execute_wrapper() around each
+# call would cost more than most of the AI functions themselves.
+_queries = threading.local()
+
+
+def _count_query(execute, sql, params, many, context):
+    _queries.count = getattr(_queries, 'count', 0) + 1
+    return execute(sql, params, many, context)
+
+
+@receiver(connection_created)
+def _install_query_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def _query_count():
+    return getattr(_queries, 'count', 0)
+
+
+def instrument(name=None):
+    """
+    Decorator recording the calls of an AI function (see module docstring).
+    
+    Args:
+        name: metric name (default: "<module>.<function>", without the
+            ai_features package)
+    """
+    def decorator(function):
+        metric = name or f'{function.__module__.rsplit(".", 1)[-1]}.{function.__qualname__}'
+        
+        if inspect.isgeneratorfunction(function):
+            @functools.wraps(function)
+            def generator_wrapper(*args, **kwargs):
+                if not settings.AI_METRICS_ENABLED:
+                    yield from function(*args, **kwargs)
+                    return
+                
+                iterator = function(*args, **kwargs)
+                elapsed, queries, failed = 0.0, 0, False
+                try:
+                    while True:
+                        started, queries_before = time.perf_counter(), _query_count()
+                        try:
+                            item = next(iterator)
+                        except StopIteration:
+                            break
+                        except Exception:
+                            failed = True
+                            raise
+                        finally:
+                            elapsed += time.perf_counter() - started
+                            queries += _query_count() - queries_before
+                        yield item
+                finally:
+                    iterator.close()
+                    registry.record(metric, elapsed * 1000, queries, failed)
+            return generator_wrapper
+        
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not settings.AI_METRICS_ENABLED:
+                return function(*args, **kwargs)
+            
+            failed = False
+            started, queries_before = time.perf_counter(), _query_count()
+            try:
+                return function(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                registry.record(
+                    metric, (time.perf_counter() - started) * 1000, _query_count() - queries_before, failed
+                )
+        return wrapper
+    return decorator
+
+
+def collect_metrics():
+    """
+    Metrics of all workers, added up.
+    
+    This process's file is written first, so its latest calls count, and
+    the files of exited processes are merged into RETIRED_FILE.
+    
+    Returns:
+        dict: 'workers' (running processes with a metrics file),
+        'retired_workers' (exited ones) and 'functions': per function
+        calls, errors, error_rate, total/mean/max latency, queries and
+        queries_per_call, p50/p95/p99 (upper bound of the histogram
+        bucket) and the histogram itself
+    """
+    registry.flush()
+    
+    directory = Path(settings.AI_METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / LOCK_FILE, 'a') as lock:
+        # One collector at a time, so no exited worker is merged twice
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = _merge_exited_workers(directory)
+        workers = _read_worker_files(directory)
+    
+    totals = {}
+    for functions in [retired['functions']] + [data.get('functions', {}) for _, data in workers]:
+        for name, values in functions.items():
+            totals.setdefault(name, FunctionMetrics()).add(values)
+    
+    return {
+        'workers': len(workers),
+        'retired_workers': retired['workers'],
+        'functions': {name: _summary(metrics) for name, metrics in sorted(totals.items())},
+    }
+
+
+def _read_worker_files(directory):
+    """(path, contents) of every per-process metrics file"""
+    workers = []
+    for path in directory.glob('*.json'):
+        if path.name == RETIRED_FILE:
+            continue
+        try:
+            workers.append((path, json.loads(path.read_text())))
+        except (OSError, ValueError):
+            continue  # Being replaced, or not ours
+    return workers
+
+
+def _is_running(pid):
+    if not isinstance(pid, int):
+        return True  # Can't tell, leave the file alone
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Running, as another user
+    return True
+
+
+def _merge_exited_workers(directory):
+    """
+    Add the files of this host's exited processes to RETIRED_FILE and
+    delete them. Called with the lock held.
+    
+    RETIRED_FILE lists the files merged last ('merged'), so a file left
+    behind by an interrupted merge is deleted, not counted again.
+    
+    Returns:
+        dict: the retired totals, 'workers' and 'functions'
+    """
+    retired_path = directory / RETIRED_FILE
+    try:
+        retired = json.loads(retired_path.read_text())
+    except FileNotFoundError:
+        retired = {'workers': 0, 'functions': {}, 'merged': []}
+    
+    already_merged = set(retired.get('merged', []))
+    exited, leftovers = [], []
+    for path, data in _read_worker_files(directory):
+        if path.stem in already_merged:
+            leftovers.append(path)
+        elif data.get('host', HOSTNAME) == HOSTNAME and not _is_running(data.get('pid')):
+            exited.append((path, data))
+    
+    if exited:
+        totals = {name: FunctionMetrics().add(values) for name, values in retired['functions'].items()}
+        for _, data in exited:
+            for name, values in data.get('functions', {}).items():
+                totals.setdefault(name, FunctionMetrics()).add(values)
+        retired = {
+            'workers': retired['workers'] + len(exited),
+            'functions': {name: metrics.as_dict() for name, metrics in totals.items()},
+            'merged': [path.stem for path, _ in exited] + [path.stem for path in leftovers],
+        }
+        temporary = retired_path.with_suffix('.tmp')
+        temporary.write_text(json.dumps(retired))
+        temporary.replace(retired_path)
+    
+    for path in leftovers + [path for path, _ in exited]:
+        path.unlink(missing_ok=True)
+    return retired
+
+
+def _summary(metrics):
+    calls = metrics.calls or 1
+    labels = [f'<={bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'>{LATENCY_BUCKETS_MS[-1]}ms']
+    return {
+        'calls': metrics.calls,
+        'errors': metrics.errors,
+        'error_rate': round(metrics.errors / calls, 4),
+        'total_ms': round(metrics.total_ms, 2),
+        'mean_ms': round(metrics.total_ms / calls, 3),
+        'max_ms': round(metrics.max_ms, 2),
+        'queries': metrics.queries,
+        'queries_per_call': round(metrics.queries / calls, 2),
+        'p50_ms': _percentile(metrics, 0.50),
+        'p95_ms': _percentile(metrics, 0.95),
+        'p99_ms': _percentile(metrics, 0.99),
+        'histogram': dict(zip(labels, metrics.histogram)),
+    }
+
+
+def _percentile(metrics, fraction):
+    """Upper bound of the bucket holding the given fraction of calls"""
+    if not metrics.calls:
+        return None
+    seen = 0
+    for index, count in enumerate(metrics.histogram):
+        seen += count
+        if seen >= fraction * metrics.calls:
+            return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else round(metrics.max_ms, 2)
+    return round(metrics.max_ms, 2)
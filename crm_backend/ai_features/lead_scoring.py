@@ -11,9 +11,53 @@ This module calculates a lead score (0-100) based on various factors:
 In a real application, this would use a trained ML model (Random Forest/Logistic Regression).
 For simplicity, we use a weighted scoring system that's easy to understand and modify.
 """
+import numpy as np
+from django.conf import settings
 
+from .feature_store import iter_feature_chunks
+from .features import FEATURE_COLUMNS, SOURCE_CODES, STATUS_CODES, code_table, encode_features, get_lead_features
+from .instrumentation import instrument
 
-def calculate_lead_score(lead):
+
+# Source quality (0-25 points)
+# Higher quality sources get more points
+SOURCE_SCORES = {
+    'referral': 25,       # High trust
+    'website': 20,        # Inbound interest
+    'social_media': 15,   # Moderate interest
+    'email_campaign': 15, # Outbound response
+    'cold_call': 10,      # Low initial trust
+    'other': 5,
+}
+
+# Status progression (0-30 points)
+# Further down the funnel = higher score
+STATUS_SCORES = {
+    'converted': 30,
+    'qualified': 25,
+    'contacted': 15,
+    'new': 5,
+    'lost': 0,
+}
+
+# Information completeness (0-25 points)
+COMPANY_POINTS = 10
+PHONE_POINTS = 8
+WEBSITE_POINTS = 7
+
+# Engagement (0-10 points each, 5 per related object)
+POINTS_PER_CONTACT = 5
+MAX_CONTACT_POINTS = 10
+POINTS_PER_DEAL = 5
+MAX_DEAL_POINTS = 10
+
+# The points above, indexed by feature code (see features.code_table)
+SOURCE_POINTS_BY_CODE = code_table(SOURCE_SCORES, SOURCE_CODES, 0)
+STATUS_POINTS_BY_CODE = code_table(STATUS_SCORES, STATUS_CODES, 0)
+
+
+@instrument()
+def calculate_lead_score(lead, features=None):
     """
     Calculate lead score based on lead attributes.
     Returns a score from 0-100.
@@ -26,59 +70,176 @@ def calculate_lead_score(lead):
     
     Args:
         lead: Lead model instance
+        features: Optional LeadFeatureSnapshot, pass it in when the same
+                  lead is also being categorized to avoid counting twice
     
     Returns:
         int: Score from 0 to 100
     """
+    if features is None:
+        features = get_lead_features(lead)
+    
     score = 0
     
     # 1. Source quality (0-25 points)
-    # Higher quality sources get more points
-    source_scores = {
-        'referral': 25,       # High trust
-        'website': 20,        # Inbound interest
-        'social_media': 15,   # Moderate interest
-        'email_campaign': 15, # Outbound response
-        'cold_call': 10,      # Low initial trust
-        'other': 5,
-    }
-    score += source_scores.get(lead.source, 0)
+    score += SOURCE_SCORES.get(features.source, 0)
     
     # 2. Status progression (0-30 points)
-    # Further down the funnel = higher score
-    status_scores = {
-        'converted': 30,
-        'qualified': 25,
-        'contacted': 15,
-        'new': 5,
-        'lost': 0,
-    }
-    score += status_scores.get(lead.status, 0)
+    score += STATUS_SCORES.get(features.status, 0)
     
     # 3. Information completeness (0-25 points)
     # More info = better lead quality
-    if lead.company:
-        score += 10
-    if lead.phone:
-        score += 8
-    if lead.website:
-        score += 7
+    if features.has_company:
+        score += COMPANY_POINTS
+    if features.has_phone:
+        score += PHONE_POINTS
+    if features.has_website:
+        score += WEBSITE_POINTS
     
     # 4. Has contacts (0-10 points)
     # Indicates active engagement with people at the company
-    contact_count = lead.contacts.count() if hasattr(lead, 'contacts') else 0
-    score += min(contact_count * 5, 10) # Cap at 10 points (2 contacts)
+    score += min(features.contact_count * POINTS_PER_CONTACT, MAX_CONTACT_POINTS)
     
     # 5. Activity engagement (0-10 points)
     # Check if lead has associated deals
-    deal_count = lead.deals.count() if hasattr(lead, 'deals') else 0
-    score += min(deal_count * 5, 10) # Cap at 10 points (2 deals)
+    score += min(features.deal_count * POINTS_PER_DEAL, MAX_DEAL_POINTS)
     
     # Ensure score is strictly between 0 and 100
     return min(max(score, 0), 100)
 
 
-# Example of how a trained ML model would work (commented out for simplicity):
+
+@instrument()
+def score_lead(lead, features=None):
+    """
+    Score a lead with the backend selected by AI_LEAD_SCORING_BACKEND.
+    
+    'ml' uses the trained model from ml_scoring and falls back to the
+    rule-based calculate_lead_score when no model is available.
+    
+    Returns:
+        int: Score from 0 to 100
+    """
+    if features is None:
+        features = get_lead_features(lead)
+    
+    if settings.AI_LEAD_SCORING_BACKEND == 'ml':
+        from .ml_scoring import ModelUnavailable, predict_scores
+        try:
+            return int(predict_scores(np.array([features.as_row()], dtype=np.float64))[0])
+        except ModelUnavailable:
+            pass
+    
+    return calculate_lead_score(lead, features)
+
+
+def calculate_lead_scores_bulk(sources, statuses, has_company, has_phone, has_website,
+                               contact_counts, deal_counts):
+    """
+    Vectorized version of calculate_lead_score.
+    
+    Every argument is a sequence with one entry per lead. The same weights
+    as the per-lead function are applied with NumPy, so the result is
+    identical to calling calculate_lead_score on each lead.
+    
+    Returns:
+        numpy.ndarray: int64 scores from 0 to 100
+    """
+    return calculate_lead_scores_matrix(encode_features(
+        sources, statuses, has_company, has_phone, has_website, contact_counts, deal_counts
+    ))
+
+
+def calculate_lead_scores_matrix(matrix):
+    """
+    calculate_lead_scores_bulk over encoded features.
+    
+    Args:
+        matrix: One row per lead, FEATURE_COLUMNS first - from
+            encode_features or feature_store.LeadFeatureMatrix
+    
+    Returns:
+        numpy.ndarray: int64 scores from 0 to 100
+    """
+    def column(name):
+        return np.asarray(matrix[:, FEATURE_COLUMNS.index(name)], dtype=np.int64)
+    
+    score = SOURCE_POINTS_BY_CODE[column('source')]
+    score += STATUS_POINTS_BY_CODE[column('status')]
+    
+    score += (column('has_company') != 0) * COMPANY_POINTS
+    score += (column('has_phone') != 0) * PHONE_POINTS
+    score += (column('has_website') != 0) * WEBSITE_POINTS
+    
+    score += np.minimum(column('contact_count') * POINTS_PER_CONTACT, MAX_CONTACT_POINTS)
+    score += np.minimum(column('deal_count') * POINTS_PER_DEAL, MAX_DEAL_POINTS)
+    
+    return np.clip(score, 0, 100)
+
+
+@instrument()
+def score_leads_bulk(sources, statuses, has_company, has_phone, has_website,
+                     contact_counts, deal_counts):
+    """
+    Score many leads with the backend selected by AI_LEAD_SCORING_BACKEND.
+    
+    Takes the same arguments as calculate_lead_scores_bulk. With the 'ml'
+    backend the whole batch is scored with one predict_proba call.
+    
+    Returns:
+        numpy.ndarray: int64 scores from 0 to 100
+    """
+    return score_feature_matrix(encode_features(
+        sources, statuses, has_company, has_phone, has_website, contact_counts, deal_counts
+    ))
+
+
+@instrument()
+def score_feature_matrix(matrix):
+    """
+    Score encoded features (rows as in calculate_lead_scores_matrix) with
+    the backend selected by AI_LEAD_SCORING_BACKEND.
+    
+    Returns:
+        numpy.ndarray: int64 scores from 0 to 100
+    """
+    if settings.AI_LEAD_SCORING_BACKEND == 'ml':
+        from .ml_scoring import ModelUnavailable, predict_scores
+        try:
+            return predict_scores(np.asarray(matrix[:, :len(FEATURE_COLUMNS)], dtype=np.float64))
+        except ModelUnavailable:
+            pass
+    
+    return calculate_lead_scores_matrix(matrix)
+
+
+@instrument()
+def iter_lead_score_chunks(queryset, chunk_size=2000):
+    """
+    Score every lead in a queryset, one chunk at a time.
+    
+    Each chunk costs a single query on the precomputed features
+    (feature_store.iter_feature_chunks), walked in lead id order (keyset
+    pagination, no OFFSET), with the stored score joined in. Leads
+    without stored features are skipped: store them first with
+    feature_store.fill_missing_features.
+    
+    Yields:
+        dict: NumPy arrays for the chunk - 'ids', 'old_scores', 'scores',
+              plus 'features', the chunk's LeadFeatureMatrix, so callers
+              can categorize the same chunk without another query
+    """
+    for features in iter_feature_chunks(queryset, lead_fields=('score',), chunk_size=chunk_size):
+        yield {
+            'ids': features.ids,
+            'old_scores': features.fields['score'],
+            'scores': score_feature_matrix(features.matrix),
+            'features': features,
+        }
+
+# Scoring with a trained ML model lives in ml_scoring.py and is enabled
+# with AI_LEAD_SCORING_BACKEND = 'ml' (see score_lead above).
+# Example of how the model could be trained (commented out for simplicity):
 """
 import pickle
 from sklearn.ensemble import RandomForestClassifier
@@ -99,18 +260,4 @@ def train_lead_scoring_model(training_data):
         pickle.dump(model, f)
     
     return model
-
-def calculate_lead_score_with_ml(lead):
-    # Load trained model
-    with open('lead_score_model.pkl', 'rb') as f:
-        model = pickle.load(f)
-    
-    # Prepare features
-    features = prepare_lead_features(lead)
-    
-    # Predict probability of conversion (0-1)
-    probability = model.predict_proba([features])[0][1]
-    
-    # Convert to 0-100 score
-    return int(probability * 100)
 """
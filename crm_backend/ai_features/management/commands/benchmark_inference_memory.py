@@ -0,0 +1,155 @@
+"""
+Management command measuring the memory saved by the inference server.
+
+Usage:
+    python manage.py benchmark_inference_memory
+    python manage.py benchmark_inference_memory --workers 4
+
+Starts --workers fresh processes, as web workers would be, and has each
+of them analyze sentiment (one text and a batch) and score leads with
+the 'ml' backend, then report its resident memory (RSS). This is done
+twice: in process, and with an inference server started for the run
+(ai_features/inference_server.py). The totals compare N workers loading
+TextBlob and scikit-learn with N workers plus the one server holding
+them. Without a model at AI_LEAD_MODEL_PATH (`manage.py
+train_lead_model`), leads are scored with the rules in both runs.
+
+The workers also print their results, which must be identical.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from ai_features.inference import InferenceUnavailable, client, server_status
+
+
+HEAVY_MODULES = ['sklearn', 'scipy', 'nltk', 'textblob']
+
+# Runs in the worker processes
+SCRIPT = '''
+import json, sys
+
+import django
+django.setup()
+
+from ai_features.inference_server import rss_kb
+from ai_features.lead_scoring import score_leads_bulk
+from ai_features.management.commands.benchmark_sentiment import generate_texts
+from ai_features.sentiment_analysis import analyze_sentiment
+from ai_features.sentiment_pool import score_texts_parallel
+
+sentiment = [analyze_sentiment('The client was very happy with the demo.')]
+sentiment += score_texts_parallel(generate_texts(200))
+scores = score_leads_bulk(
+    ['website', 'referral', 'cold_call'], ['new', 'qualified', 'contacted'],
+    [True, False, True], [True, True, False], [False, True, True], [1, 0, 3], [0, 2, 1],
+)
+print(json.dumps({
+    'rss_mb': rss_kb() / 1024,
+    'heavy': [module for module in %r if module in sys.modules],
+    'results': [sentiment, scores.tolist()],
+}))
+''' % (HEAVY_MODULES,)
+
+
+class Command(BaseCommand):
+    help = 'Compare the memory of web workers with and without the AI inference server'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Worker processes (default: 8)'
+        )
+    
+    def handle(self, *args, **options):
+        count = options['workers']
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE,
+            AI_LEAD_SCORING_BACKEND='ml',
+            AI_SENTIMENT_WORKERS='1',
+            AI_METRICS_ENABLED='0',
+            AI_INFERENCE_SOCKET='',
+        )
+        if not Path(settings.AI_LEAD_MODEL_PATH).exists():
+            self.stdout.write(f'No model at {settings.AI_LEAD_MODEL_PATH}: leads are scored with the rules')
+        
+        in_process = self._run_workers(count, env)
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'inference.sock')
+            log_path = os.path.join(directory, 'inference.log')
+            with open(log_path, 'w') as log:
+                server = subprocess.Popen(
+                    [sys.executable, 'manage.py', 'run_inference_server', '--socket', path],
+                    cwd=settings.BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                )
+            try:
+                self._wait_for_server(path, server, log_path)
+                with_server = self._run_workers(count, dict(env, AI_INFERENCE_SOCKET=path))
+                server_rss = self._server_rss(path)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+        
+        if [worker['results'] for worker in with_server] != [worker['results'] for worker in in_process]:
+            raise CommandError('Workers using the inference server returned different results')
+        
+        alone = sum(worker['rss_mb'] for worker in in_process)
+        shared = sum(worker['rss_mb'] for worker in with_server) + server_rss
+        self.stdout.write(f'{f"{count} workers":<30} {"per worker":>12} {"total":>10}  heavy modules in workers')
+        self._line('in process', in_process, alone)
+        self._line('with inference server', with_server, shared - server_rss)
+        self.stdout.write(f'{"  + inference server":<30} {server_rss:>9.1f} MB {server_rss:>7.0f} MB')
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved {alone - shared:.0f} MB of {alone:.0f} MB ({(alone - shared) / alone:.0%})'
+        ))
+    
+    def _run_workers(self, count, env):
+        processes = [
+            subprocess.Popen(
+                [sys.executable, '-c', SCRIPT],
+                cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+            )
+            for _ in range(count)
+        ]
+        workers = []
+        for process in processes:
+            stdout, stderr = process.communicate()
+            if process.returncode != 0:
+                raise CommandError(f'Worker process failed:\n{stderr}')
+            workers.append(json.loads(stdout.strip().splitlines()[-1]))
+        return workers
+    
+    def _wait_for_server(self, path, server, log_path, timeout=60):
+        deadline = time.monotonic() + timeout
+        while not os.path.exists(path):
+            if server.poll() is not None:
+                raise CommandError(f'Inference server failed:\n{Path(log_path).read_text()}')
+            if time.monotonic() > deadline:
+                raise CommandError('Inference server did not start')
+            time.sleep(0.1)
+    
+    def _server_rss(self, path):
+        with override_settings(AI_INFERENCE_SOCKET=path):
+            client.reset()
+            try:
+                return server_status()['rss_kb'] / 1024
+            except InferenceUnavailable as e:
+                raise CommandError(f'Inference server does not answer: {e}')
+            finally:
+                client.reset()
+    
+    def _line(self, label, workers, total):
+        rss = statistics.median(worker['rss_mb'] for worker in workers)
+        heavy = ', '.join(workers[-1]['heavy']) or '-'
+        self.stdout.write(f'{"  " + label:<30} {rss:>9.1f} MB {total:>7.0f} MB  {heavy}')
@@ -0,0 +1,125 @@
+"""
+Management command comparing single-text and batch sentiment analysis.
+
+Usage:
+    python manage.py benchmark_sentiment
+    python manage.py benchmark_sentiment --texts 5000 --workers 1 2 4 8
+
+Posts the same generated notes to /api/ai/analyze-sentiment/ (one request
+per text) and to /api/ai/analyze-sentiment/batch/ (one request) with
+different pool sizes, and prints texts/sec for each. The pool is started
+and warmed up before it is timed, as it would be in a running server.
+
+Every measurement starts with an empty sentiment cache and runs in a
+transaction that is rolled back; the last line posts the batch again,
+answered from the cache.
+"""
+import os
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from ai_features import sentiment_pool
+from ai_features.sentiment_cache import sentiment_cache
+
+
+SENTENCES = [
+    'The client was very happy with the demo and wants a proposal.',
+    'Pricing is too high, they are disappointed with our offer.',
+    'Called to follow up, left a voicemail.',
+    'Great meeting, the team loved the new dashboard features!',
+    'They complained about slow support and missed deadlines.',
+    'Contract renewal is scheduled for next quarter.',
+    'Excellent feedback on the onboarding, very smooth experience.',
+    'Not interested at the moment, maybe later this year.',
+    'The integration failed twice, the customer is frustrated.',
+    'Sent the updated quote with the requested discount.',
+]
+
+
+def generate_texts(count, seed=0):
+    """Distinct notes of one to four sentences"""
+    rng = random.Random(seed)
+    return [
+        f'Visit {index}: ' + ' '.join(rng.sample(SENTENCES, rng.randint(1, 4)))
+        for index in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Measure sentiment analysis throughput of the single-text and batch endpoints'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--texts', type=int, default=2000,
+            help='Texts per batch (default: 2000)'
+        )
+        parser.add_argument(
+            '--single', type=int, default=200,
+            help='Texts posted one by one to the single-text endpoint (default: 200)'
+        )
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=None,
+            help='Pool sizes to measure (default: 1 and the number of CPUs)'
+        )
+    
+    def handle(self, *args, **options):
+        texts = generate_texts(options['texts'])
+        workers = options['workers'] or sorted({1, os.cpu_count() or 1})
+        
+        user = get_user_model()(email='benchmark@example.com', username='benchmark')
+        client = APIClient(SERVER_NAME='localhost')
+        client.force_authenticate(user)
+        
+        self.stdout.write(f'{os.cpu_count()} CPUs, {len(texts)} texts')
+        
+        with transaction.atomic():
+            self._measure(client, texts, options['single'], workers)
+            transaction.set_rollback(True)
+        sentiment_cache.clear()
+    
+    def _measure(self, client, texts, single_count, workers):
+        single = texts[:single_count]
+        url = reverse('analyze_sentiment')
+        client.post(url, {'text': 'Load the lexicon'}, format='json')
+        started = time.perf_counter()
+        for text in single:
+            client.post(url, {'text': text}, format='json')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{"single-text view":<24} {len(single) / elapsed:>10.0f} texts/sec')
+        
+        url = reverse('analyze_sentiment_batch')
+        for count in workers:
+            with override_settings(AI_SENTIMENT_WORKERS=count, AI_SENTIMENT_BATCH_MAX_TEXTS=len(texts)):
+                sentiment_pool.shutdown_executor()
+                # Start and warm up the pool outside the timing
+                sentiment_pool.score_texts_parallel(texts[:count * 100])
+                
+                with transaction.atomic():
+                    sentiment_cache.clear()
+                    started = time.perf_counter()
+                    response = client.post(url, {'texts': texts}, format='json')
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                sentiment_pool.shutdown_executor()
+            
+            if response.status_code != 200:
+                self.stderr.write(f'batch endpoint returned {response.status_code}: {response.data}')
+                return
+            label = f'batch, {count} worker{"s" if count > 1 else ""}'
+            self.stdout.write(f'{label:<24} {len(texts) / elapsed:>10.0f} texts/sec')
+        
+        with override_settings(AI_SENTIMENT_BATCH_MAX_TEXTS=len(texts)):
+            sentiment_cache.clear()
+            url = reverse('analyze_sentiment_batch')
+            client.post(url, {'texts': texts}, format='json')
+            started = time.perf_counter()
+            client.post(url, {'texts': texts}, format='json')
+            elapsed = time.perf_counter() - started
+        self.stdout.write(f'{"batch, cached":<24} {len(texts) / elapsed:>10.0f} texts/sec')
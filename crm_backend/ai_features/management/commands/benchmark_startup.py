@@ -0,0 +1,101 @@
+"""
+Management command measuring worker startup time and memory.
+
+Usage:
+    python manage.py benchmark_startup
+    python manage.py benchmark_startup --runs 10
+
+Starts fresh Python processes, as a new web worker would, and measures
+each startup step:
+    setup    django.setup() (settings, apps, models)
+    urls     loading the URL conf and every view module (the first request)
+    warm_up  ai_features.warmup.warm_up() (NumPy, TextBlob, model)
+
+and the resident memory (RSS) after each step. The median of all runs
+is printed, with the heavy AI modules that were loaded by then. Before
+the AI imports were made lazy, "urls" loaded all of them.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+HEAVY_MODULES = ['numpy', 'pandas', 'sklearn', 'scipy', 'nltk', 'textblob']
+
+# Runs in the child process. RSS is read from /proc (Linux) or, elsewhere,
+# approximated by the peak RSS.
+SCRIPT = '''
+import json, sys, time
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def step(name, function):
+    started = time.perf_counter()
+    function()
+    result[name] = {
+        'seconds': time.perf_counter() - started,
+        'rss_mb': rss_mb(),
+        'heavy': [module for module in HEAVY if module in sys.modules],
+    }
+
+HEAVY = %r
+result = {}
+
+import django
+step('setup', django.setup)
+
+from django.urls import get_resolver
+step('urls', lambda: get_resolver().url_patterns)
+
+from ai_features.warmup import warm_up
+step('warm_up', warm_up)
+
+print(json.dumps(result))
+''' % (HEAVY_MODULES,)
+
+STEPS = ['setup', 'urls', 'warm_up']
+
+
+class Command(BaseCommand):
+    help = 'Measure django.setup() time and memory of a new worker process'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--runs', type=int, default=5,
+            help='Processes started (default: 5)'
+        )
+    
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        runs = []
+        for _ in range(options['runs']):
+            completed = subprocess.run(
+                [sys.executable, '-c', SCRIPT],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode != 0:
+                raise CommandError(f'Benchmark process failed:\n{completed.stderr}')
+            runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        
+        self.stdout.write(f'Median of {len(runs)} runs')
+        self.stdout.write(f'{"step":<10} {"time":>10} {"RSS after":>11}  heavy modules loaded')
+        for name in STEPS:
+            seconds = statistics.median(run[name]['seconds'] for run in runs)
+            rss = statistics.median(run[name]['rss_mb'] for run in runs)
+            heavy = ', '.join(runs[-1][name]['heavy']) or '-'
+            self.stdout.write(f'{name:<10} {seconds * 1000:>7.0f} ms {rss:>8.1f} MB  {heavy}')
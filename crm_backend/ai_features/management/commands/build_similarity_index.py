@@ -0,0 +1,56 @@
+"""
+Management command maintaining the similar leads/notes indexes.
+
+Usage:
+    python manage.py build_similarity_index              # append, rebuild when due
+    python manage.py build_similarity_index --rebuild    # full build
+    python manage.py build_similarity_index --append --kind note
+
+Without options, new leads and notes are appended to the existing
+indexes, and an index is built in full when it is missing, older than
+AI_SIMILARITY_REBUILD_INTERVAL or grown by more than
+AI_SIMILARITY_REBUILD_FRACTION since its build (see
+ai_features/similarity.py). Run it from cron, e.g. every 5 minutes.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_features.similarity import KINDS, IndexUnavailable, append_to_index, update_index
+
+
+class Command(BaseCommand):
+    help = 'Build or update the TF-IDF indexes behind /api/ai/similar/'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind', choices=KINDS, action='append',
+            help='Index to update (default: all)'
+        )
+        mode = parser.add_mutually_exclusive_group()
+        mode.add_argument(
+            '--rebuild', action='store_true',
+            help='Build the indexes in full'
+        )
+        mode.add_argument(
+            '--append', action='store_true',
+            help='Only append new rows, even when a full build is due'
+        )
+    
+    def handle(self, *args, **options):
+        for kind in options['kind'] or KINDS:
+            if options['append']:
+                try:
+                    action, result = 'appended', append_to_index(kind)
+                except IndexUnavailable as e:
+                    raise CommandError(str(e))
+            else:
+                action, result = update_index(kind, force_rebuild=options['rebuild'])
+            
+            if action == 'built':
+                self.stdout.write(self.style.SUCCESS(
+                    f'{kind}: built {result["rows"]} rows, {result["features"]} terms, '
+                    f'{result["nnz"]} nonzeros in {result["build_seconds"]}s'
+                ))
+            elif result is None:
+                self.stdout.write(f'{kind}: index is being written by another process, skipped')
+            else:
+                self.stdout.write(f'{kind}: appended {result} rows')
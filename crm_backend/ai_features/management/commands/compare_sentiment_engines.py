@@ -0,0 +1,173 @@
+"""
+Management command comparing the sentiment engines.
+
+Usage:
+    python manage.py compare_sentiment_engines
+    python manage.py compare_sentiment_engines --texts 20000 --notes 5000
+    python manage.py compare_sentiment_engines --sample labelled.csv
+
+For every engine of ai_features.sentiment_engines it prints:
+    - load time and throughput (texts/sec) on generated notes, in this
+      process and without the sentiment cache
+    - accuracy on a labelled sample: LABELLED_SAMPLE below, or a CSV file
+      of text,label rows (label: positive, neutral or negative)
+    - agreement with TextBlob on the labelled sample, the generated notes
+      and, with --notes, the latest notes in the database: share of texts
+      given the same label, mean polarity difference and the label
+      confusion matrix
+"""
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_features.sentiment_analysis import classify_polarity
+from ai_features.sentiment_engines import ENGINES, get_engine
+from ai_features.management.commands.benchmark_sentiment import generate_texts
+
+
+LABELS = ('positive', 'neutral', 'negative')
+
+# CRM notes labelled by hand
+LABELLED_SAMPLE = [
+    ('The client was very happy with the demo and wants a proposal.', 'positive'),
+    ('Great call, they loved the reporting module.', 'positive'),
+    ('Excellent feedback on the onboarding, very smooth experience.', 'positive'),
+    ('They are excited about the integration and want to start next week.', 'positive'),
+    ('Signed the contract today, the whole team is thrilled!', 'positive'),
+    ('Very positive meeting with the CFO, budget is approved.', 'positive'),
+    ('The trial went well and the users find the app easy to use.', 'positive'),
+    ('Fantastic response to the webinar, three new demos booked.', 'positive'),
+    ('She said our support team is the best they have worked with.', 'positive'),
+    ('Good progress on the pilot, they are satisfied with the results.', 'positive'),
+    ('Happy customer, renewed for two more years.', 'positive'),
+    ('The new pricing is a perfect fit for their team.', 'positive'),
+    ('Impressed by the speed of the dashboard.', 'positive'),
+    ('Wonderful meeting, they want to expand to the sales team.', 'positive'),
+    ('They appreciated the quick fix, really helpful.', 'positive'),
+    ('Called to follow up, left a voicemail.', 'neutral'),
+    ('Contract renewal is scheduled for next quarter.', 'neutral'),
+    ('Sent the updated quote with the requested discount.', 'neutral'),
+    ('Meeting moved to Thursday at 10am.', 'neutral'),
+    ('Asked for the security questionnaire, will send it tomorrow.', 'neutral'),
+    ('They use a spreadsheet for their pipeline today.', 'neutral'),
+    ('Forwarded the invoice to the accounting department.', 'neutral'),
+    ('Discussed the implementation timeline and the data migration.', 'neutral'),
+    ('The decision maker is the head of operations.', 'neutral'),
+    ('Requested a copy of the master services agreement.', 'neutral'),
+    ('Company has 200 employees across three offices.', 'neutral'),
+    ('Will review the proposal with their legal team.', 'neutral'),
+    ('Updated the phone number and the billing address.', 'neutral'),
+    ('Demo booked for Monday with two users.', 'neutral'),
+    ('They are comparing us with two other vendors.', 'neutral'),
+    ('Pricing is too high, they are disappointed with our offer.', 'negative'),
+    ('They complained about slow support and missed deadlines.', 'negative'),
+    ('The integration failed twice, the customer is frustrated.', 'negative'),
+    ('Terrible experience with the last release, they want a refund.', 'negative'),
+    ('Not happy with the response times of the support team.', 'negative'),
+    ('The demo was a disaster, the app crashed twice.', 'negative'),
+    ('They are angry about the billing error.', 'negative'),
+    ('Bad news: the budget was cut and the project is cancelled.', 'negative'),
+    ('The customer is unhappy with the missing features.', 'negative'),
+    ('Awful onboarding, nobody answered their questions.', 'negative'),
+    ('They find the interface confusing and hard to use.', 'negative'),
+    ('Poor adoption, most users stopped logging in.', 'negative'),
+    ('Not good at all, they are considering a competitor.', 'negative'),
+    ('The sync is broken again and they lost data.', 'negative'),
+    ('Worst quarter so far, usage dropped sharply.', 'negative'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare the speed of the sentiment engines and their agreement with TextBlob'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--texts', type=int, default=5000,
+            help='Generated notes scored by every engine (default: 5000)'
+        )
+        parser.add_argument(
+            '--notes', type=int, default=0,
+            help='Also compare on the latest N notes of the database (default: 0)'
+        )
+        parser.add_argument(
+            '--sample', default=None,
+            help='CSV file of text,label rows to use instead of the built-in labelled sample'
+        )
+    
+    def handle(self, *args, **options):
+        sample = self._read_sample(options['sample']) if options['sample'] else LABELLED_SAMPLE
+        generated = generate_texts(options['texts'], seed=1)
+        datasets = [('labelled sample', [text for text, _ in sample]), ('generated notes', generated)]
+        if options['notes']:
+            from notes.models import Note
+            notes = list(Note.objects.order_by('-id').values_list('content', flat=True)[:options['notes']])
+            datasets.append(('database notes', [text for text in notes if text and text.strip()]))
+        
+        self.stdout.write('Throughput (in process, no cache)')
+        scores = {}
+        for name in ENGINES:
+            engine = get_engine(name)
+            started = time.perf_counter()
+            engine.load()
+            load_seconds = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            scores[name, 'generated notes'] = engine.score_many(generated)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'  {name:<10} load {load_seconds * 1000:>7.0f} ms  '
+                f'{len(generated) / elapsed:>10.0f} texts/sec  {elapsed / len(generated) * 1e6:>7.0f} µs/text'
+            )
+            for label, texts in datasets:
+                if (name, label) not in scores:
+                    scores[name, label] = engine.score_many(texts)
+        
+        self.stdout.write(f'\nAccuracy on the labelled sample ({len(sample)} texts)')
+        expected = [label for _, label in sample]
+        for name in ENGINES:
+            predicted = [classify_polarity(polarity) for polarity, _ in scores[name, 'labelled sample']]
+            correct = sum(p == e for p, e in zip(predicted, expected))
+            self.stdout.write(f'  {name:<10} {correct / len(sample):>7.1%}')
+            self._confusion(expected, predicted, 'expected')
+        
+        for name in ENGINES:
+            if name == 'textblob':
+                continue
+            for label, texts in datasets:
+                if not texts:
+                    continue
+                self._agreement(name, label, scores['textblob', label], scores[name, label])
+    
+    def _agreement(self, name, dataset, reference, compared):
+        reference_labels = [classify_polarity(polarity) for polarity, _ in reference]
+        compared_labels = [classify_polarity(polarity) for polarity, _ in compared]
+        same = sum(a == b for a, b in zip(reference_labels, compared_labels))
+        polarity_difference = sum(abs(a[0] - b[0]) for a, b in zip(reference, compared)) / len(reference)
+        identical = sum(abs(a[0] - b[0]) < 1e-9 for a, b in zip(reference, compared))
+        self.stdout.write(
+            f'\n{name} vs textblob, {dataset} ({len(reference)} texts): '
+            f'same label {same / len(reference):.1%}, identical polarity {identical / len(reference):.1%}, '
+            f'mean |polarity difference| {polarity_difference:.3f}'
+        )
+        self._confusion(reference_labels, compared_labels, 'textblob')
+    
+    def _confusion(self, rows, columns, rows_name):
+        counts = {(row, column): 0 for row in LABELS for column in LABELS}
+        for row, column in zip(rows, columns):
+            counts[row, column] += 1
+        header = f'{rows_name} \\ got'
+        self.stdout.write(f'    {header:<18}' + ''.join(f'{label:>10}' for label in LABELS))
+        for row in LABELS:
+            self.stdout.write(f'    {row:<18}' + ''.join(f'{counts[row, column]:>10}' for column in LABELS))
+    
+    def _read_sample(self, path):
+        try:
+            with open(path, newline='', encoding='utf-8') as sample_file:
+                rows = [(row[0], row[1].strip().lower()) for row in csv.reader(sample_file) if len(row) >= 2]
+        except OSError as error:
+            raise CommandError(f'Cannot read {path}: {error}')
+        rows = [row for row in rows if row[1] in LABELS]
+        if not rows:
+            raise CommandError(f'No text,label rows with a label in {", ".join(LABELS)} in {path}')
+        return rows
@@ -0,0 +1,71 @@
+"""
+Management command to check or rebuild the precomputed lead features.
+
+Usage:
+    python manage.py rebuild_lead_features
+    python manage.py rebuild_lead_features --check --limit 50
+
+The LeadFeatures rows (ai_features/feature_store.py) are kept in sync
+lead by lead. Writes that bypass signals (queryset.update, bulk_create,
+raw SQL) leave them behind; this command recomputes every row from the
+leads. With --check it only reports the leads whose row differs or is
+missing and exits with an error if there are any, so it can run from
+cron or CI.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_features.feature_store import STORED_FIELDS, iter_feature_drift, rebuild_lead_features
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed lead features from the leads'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report leads whose stored features disagree with the lead'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Maximum number of drifted leads to print with --check (default: 20)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Number of leads read per query (default: 5000)'
+        )
+    
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+        
+        if not options['check']:
+            started = time.monotonic()
+            written = rebuild_lead_features(chunk_size)
+            self.stdout.write(self.style.SUCCESS(
+                f'Lead features rebuilt: {written} rows in {time.monotonic() - started:.2f}s'
+            ))
+            return
+        
+        drifted = 0
+        for lead_id, actual, expected in iter_feature_drift(chunk_size):
+            drifted += 1
+            if drifted <= options['limit']:
+                if actual is None:
+                    self.stdout.write(f'Lead {lead_id}: no stored features')
+                    continue
+                changes = ', '.join(
+                    f'{name} {stored} (expected {value})'
+                    for name, stored, value in zip(STORED_FIELDS, actual, expected)
+                    if stored != value
+                )
+                self.stdout.write(f'Lead {lead_id}: {changes}')
+        
+        if drifted:
+            raise CommandError(
+                f'{drifted} leads have drifted features. '
+                f'Run "manage.py rebuild_lead_features" to repair them.'
+            )
+        self.stdout.write(self.style.SUCCESS('All lead features are consistent'))
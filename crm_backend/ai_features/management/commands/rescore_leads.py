@@ -0,0 +1,88 @@
+"""
+Management command to recalculate lead scores in bulk.
+
+Usage:
+    python manage.py rescore_leads
+    python manage.py rescore_leads --filter status=new --filter source=website
+    python manage.py rescore_leads --chunk-size 5000 --dry-run
+
+Scores are computed chunk by chunk with NumPy (see
+ai_features.lead_scoring.iter_lead_score_chunks) and only leads whose
+score actually changed are written back, with bulk_update. Leads without
+stored features (e.g. created with bulk_create) get them first, even with
+--dry-run.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.exceptions import FieldError, ValidationError
+from django.db import transaction
+
+from ai_features.feature_store import fill_missing_features
+from ai_features.lead_scoring import iter_lead_score_chunks
+from leads.models import Lead
+
+
+class Command(BaseCommand):
+    help = 'Recalculate AI lead scores for many leads at once'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of leads scored per query (default: 2000)'
+        )
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='FIELD=VALUE',
+            help='Only rescore leads matching this lookup, e.g. status=new (repeatable)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Compute scores and report changes without saving them'
+        )
+    
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+        
+        queryset = Lead.objects.all()
+        for expression in options['filter']:
+            field, sep, value = expression.partition('=')
+            if not sep or not field:
+                raise CommandError(f'Invalid filter "{expression}", expected FIELD=VALUE')
+            try:
+                queryset = queryset.filter(**{field: value})
+            except (FieldError, ValidationError, TypeError, ValueError) as e:
+                raise CommandError(f'Invalid filter "{expression}": {e}')
+        
+        dry_run = options['dry_run']
+        processed = 0
+        changed = 0
+        started = time.monotonic()
+        
+        filled = fill_missing_features(queryset)
+        if filled:
+            self.stdout.write(f'Stored features of {filled} leads that had none')
+        
+        for chunk in iter_lead_score_chunks(queryset, chunk_size):
+            ids, new_scores = chunk['ids'], chunk['scores']
+            mask = chunk['old_scores'] != new_scores
+            processed += len(ids)
+            changed += int(mask.sum())
+            
+            if not dry_run and mask.any():
+                # Only write the rows whose score moved
+                leads = [
+                    Lead(pk=int(pk), score=int(score))
+                    for pk, score in zip(ids[mask], new_scores[mask])
+                ]
+                with transaction.atomic():
+                    Lead.objects.bulk_update(leads, ['score'], batch_size=chunk_size)
+            
+            self.stdout.write(f'Scored {processed} leads ({changed} changed)')
+        
+        elapsed = time.monotonic() - started
+        verb = 'would change' if dry_run else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {processed} leads scored, {changed} {verb} in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,62 @@
+"""
+Management command running the AI inference server.
+
+Usage:
+    AI_INFERENCE_SOCKET=/run/crm/inference.sock python manage.py run_inference_server
+    python manage.py run_inference_server --socket /tmp/inference.sock
+
+Loads the sentiment engine and the lead scoring model, then answers the
+web workers on the Unix socket until SIGTERM or Ctrl+C (see
+ai_features/inference_server.py). Start it before the web server, with
+the same AI_INFERENCE_SOCKET in both environments; workers that find it
+down work in process.
+"""
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_features.inference_server import InferenceServer, load_models, rss_kb
+from ai_features.sentiment_pool import shutdown_executor
+
+
+class Command(BaseCommand):
+    help = 'Serve sentiment analysis and lead scoring to the web workers over a Unix socket'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--socket', default=None,
+            help='Socket path (default: AI_INFERENCE_SOCKET)'
+        )
+    
+    def handle(self, *args, **options):
+        path = options['socket'] or settings.AI_INFERENCE_SOCKET
+        if not path:
+            raise CommandError('Give --socket or set AI_INFERENCE_SOCKET')
+        
+        timings = load_models()
+        try:
+            server = InferenceServer(path)
+        except (OSError, RuntimeError) as e:
+            raise CommandError(f'Cannot listen on {path}: {e}')
+        
+        stopped = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stopped.set())
+        
+        # serve_forever() runs in a thread: shutdown() must be called from another one
+        thread = threading.Thread(target=server.serve_forever, name='inference-server', daemon=True)
+        thread.start()
+        self.stdout.write(
+            f'Inference server listening on {path} '
+            f'(models loaded in {sum(timings.values()):.2f}s, {rss_kb() / 1024:.0f} MB)'
+        )
+        try:
+            while not stopped.wait(1):
+                pass
+        finally:
+            server.shutdown()
+            server.server_close()
+            shutdown_executor()
+        self.stdout.write(self.style.SUCCESS(f'Inference server stopped after {server.requests} requests'))
@@ -0,0 +1,204 @@
+"""
+Management command to train the ML lead scoring model.
+
+Usage:
+    python manage.py train_lead_model
+    python manage.py train_lead_model --n-estimators 200 --cv 5
+    python manage.py train_lead_model --no-activate
+
+Leads are streamed from the database as plain tuples
+(values_list(...).iterator()) and encoded chunk by chunk into a compact
+float32 matrix, so no Lead instances are ever created. A RandomForest is
+cross-validated, fitted on all rows, and written next to
+AI_LEAD_MODEL_PATH as a versioned artifact plus a metrics JSON file:
+
+    ml_models/lead_score_model-20261017T091200.pkl
+    ml_models/lead_score_model-20261017T091200.metrics.json
+
+Unless --no-activate is given, the artifact is then copied over
+AI_LEAD_MODEL_PATH, where running workers pick it up (see ml_scoring.py).
+
+Target: whether the lead was converted (status == 'converted'). The
+status itself is therefore not a model input (features.MODEL_COLUMNS).
+"""
+import json
+import os
+import pickle
+import resource
+import shutil
+import time
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, cross_validate
+
+from ai_features.features import MODEL_COLUMN_INDEXES, MODEL_COLUMNS, encode_features
+from leads.models import Lead
+
+
+# Columns read from the database, in this order
+LEAD_FIELDS = ('source', 'status', 'company', 'phone', 'website', 'contact_count', 'deal_count')
+
+
+def _has_text(series):
+    """Vectorized bool(value) for a column of optional strings"""
+    return series.str.len().fillna(0).to_numpy() > 0
+
+
+class Command(BaseCommand):
+    help = 'Train the ML lead scoring model from the leads in the database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=20000,
+            help='Number of leads fetched from the database at a time (default: 20000)'
+        )
+        parser.add_argument(
+            '--n-estimators', type=int, default=100,
+            help='Number of trees in the random forest (default: 100)'
+        )
+        parser.add_argument(
+            '--cv', type=int, default=3,
+            help='Number of cross-validation folds (default: 3)'
+        )
+        parser.add_argument(
+            '--output-dir',
+            help='Where to write the versioned artifact (default: folder of AI_LEAD_MODEL_PATH)'
+        )
+        parser.add_argument(
+            '--no-activate', action='store_true',
+            help='Do not replace AI_LEAD_MODEL_PATH with the new model'
+        )
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        
+        frame = self._load_frame(options['chunk_size'])
+        loaded = time.monotonic()
+        
+        y = frame.pop('converted').to_numpy()
+        positives = int(y.sum())
+        if positives == 0 or positives == len(y):
+            raise CommandError('Training needs both converted and non-converted leads')
+        if min(positives, len(y) - positives) < options['cv']:
+            raise CommandError(f'Not enough leads of each class for {options["cv"]}-fold cross-validation')
+        
+        self.stdout.write(f'Loaded {len(frame)} leads ({positives} converted) in {loaded - started:.1f}s')
+        
+        model = RandomForestClassifier(
+            n_estimators=options['n_estimators'],
+            n_jobs=-1,
+            random_state=42,
+        )
+        
+        # Cross-validate first, then fit the final model on every row. Fitted
+        # on the bare matrix, like the rows ml_scoring predicts on, so the
+        # model stores no column names to check them against
+        X = frame.to_numpy()
+        folds = StratifiedKFold(n_splits=options['cv'], shuffle=True, random_state=42)
+        cv = cross_validate(model, X, y, cv=folds, scoring=['roc_auc', 'accuracy', 'f1'])
+        model.fit(X, y)
+        trained = time.monotonic()
+        
+        version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+        metrics = {
+            'version': version,
+            'rows': len(frame),
+            'converted': positives,
+            'feature_columns': list(MODEL_COLUMNS),
+            'n_estimators': options['n_estimators'],
+            'cv_folds': options['cv'],
+            'roc_auc': round(float(np.mean(cv['test_roc_auc'])), 4),
+            'accuracy': round(float(np.mean(cv['test_accuracy'])), 4),
+            'f1': round(float(np.mean(cv['test_f1'])), 4),
+            'feature_importances': {
+                column: round(float(importance), 4)
+                for column, importance in zip(MODEL_COLUMNS, model.feature_importances_)
+            },
+            'load_seconds': round(loaded - started, 2),
+            'train_seconds': round(trained - loaded, 2),
+            # ru_maxrss is reported in kilobytes on Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+        
+        artifact_path = self._write_artifact(model, metrics, options)
+        
+        self.stdout.write(
+            f"CV ROC AUC {metrics['roc_auc']}, accuracy {metrics['accuracy']}, F1 {metrics['f1']}"
+        )
+        self.stdout.write(
+            f"Wall time {time.monotonic() - started:.1f}s, peak RSS {metrics['peak_rss_mb']} MB"
+        )
+        self.stdout.write(self.style.SUCCESS(f'Model {version} written to {artifact_path}'))
+    
+    def _load_frame(self, chunk_size):
+        """
+        Stream leads into an encoded DataFrame, one chunk at a time.
+        Raw strings only live for the duration of one chunk.
+        """
+        rows = Lead.objects.order_by().values_list(*LEAD_FIELDS).iterator(chunk_size=chunk_size)
+        matrices = []
+        targets = []
+        
+        while True:
+            chunk = pd.DataFrame.from_records(list(islice(rows, chunk_size)), columns=LEAD_FIELDS)
+            if chunk.empty:
+                break
+            
+            matrices.append(encode_features(
+                chunk['source'], chunk['status'],
+                _has_text(chunk['company']),
+                _has_text(chunk['phone']),
+                _has_text(chunk['website']),
+                chunk['contact_count'], chunk['deal_count'],
+            )[:, MODEL_COLUMN_INDEXES].astype(np.float32))
+            targets.append((chunk['status'] == 'converted').to_numpy())
+        
+        if not matrices:
+            raise CommandError('There are no leads to train on')
+        
+        frame = pd.DataFrame(np.vstack(matrices), columns=MODEL_COLUMNS)
+        frame['converted'] = np.concatenate(targets).astype(np.int8)
+        return frame
+    
+    def _write_artifact(self, model, metrics, options):
+        """
+        Write the versioned artifact and metrics, then activate the model.
+        Files are written under a temporary name and renamed, so workers
+        never read a half-written pickle.
+        """
+        active_path = Path(settings.AI_LEAD_MODEL_PATH)
+        output_dir = Path(options['output_dir']) if options['output_dir'] else active_path.parent
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        base = output_dir / f"{active_path.stem}-{metrics['version']}"
+        artifact_path = base.with_suffix('.pkl')
+        
+        artifact = {
+            'model': model,
+            'version': metrics['version'],
+            'feature_columns': list(MODEL_COLUMNS),
+            'metrics': metrics,
+        }
+        tmp_path = artifact_path.with_suffix('.pkl.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, artifact_path)
+        
+        with open(base.with_suffix('.metrics.json'), 'w') as f:
+            json.dump(metrics, f, indent=2)
+        
+        if not options['no_activate']:
+            active_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = active_path.with_suffix('.pkl.tmp')
+            shutil.copyfile(artifact_path, tmp_path)
+            os.replace(tmp_path, active_path)
+            self.stdout.write(f'Activated as {active_path}')
+        
+        return artifact_path
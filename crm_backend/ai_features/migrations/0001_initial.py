@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="SentimentCacheEntry",
+            fields=[
+                (
+                    "text_hash",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("polarity", models.FloatField()),
+                ("subjectivity", models.FloatField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name_plural": "sentiment cache entries",
+                "db_table": "ai_sentiment_cache",
+            },
+        ),
+    ]
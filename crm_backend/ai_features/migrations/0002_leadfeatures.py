@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-17 17:40
+
+from datetime import date, timezone
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from ai_features.features import SOURCE_CODES, STATUS_CODES, UNKNOWN_CODE
+
+
+def build_lead_features(apps, schema_editor):
+    """Store the features of the existing leads"""
+    Lead = apps.get_model("leads", "Lead")
+    LeadFeatures = apps.get_model("ai_features", "LeadFeatures")
+    epoch = date(1970, 1, 1)
+
+    rows = (
+        Lead.objects.order_by()
+        .values_list(
+            "id", "source", "status", "company", "phone", "website",
+            "contact_count", "deal_count", "created_at",
+        )
+        .iterator(chunk_size=5000)
+    )
+    LeadFeatures.objects.bulk_create(
+        (
+            LeadFeatures(
+                lead_id=lead_id,
+                source=SOURCE_CODES.get(source, UNKNOWN_CODE),
+                status=STATUS_CODES.get(status, UNKNOWN_CODE),
+                has_company=bool(company),
+                has_phone=bool(phone),
+                has_website=bool(website),
+                contact_count=contact_count,
+                deal_count=deal_count,
+                created_day=(created_at.astimezone(timezone.utc).date() - epoch).days,
+            )
+            for lead_id, source, status, company, phone, website, contact_count, deal_count, created_at in rows
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0005_lead_search_index"),
+        ("ai_features", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeadFeatures",
+            fields=[
+                (
+                    "lead",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="features",
+                        serialize=False,
+                        to="leads.lead",
+                    ),
+                ),
+                (
+                    "source",
+                    models.SmallIntegerField(help_text="features.SOURCE_CODES code"),
+                ),
+                (
+                    "status",
+                    models.SmallIntegerField(help_text="features.STATUS_CODES code"),
+                ),
+                ("has_company", models.BooleanField()),
+                ("has_phone", models.BooleanField()),
+                ("has_website", models.BooleanField()),
+                ("contact_count", models.PositiveIntegerField()),
+                ("deal_count", models.PositiveIntegerField()),
+                (
+                    "created_day",
+                    models.IntegerField(
+                        help_text="Day the lead was created, in days since 1970-01-01 (UTC)"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "lead features",
+                "db_table": "ai_lead_features",
+            },
+        ),
+        migrations.RunPython(build_lead_features, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:10
+
+from django.db import migrations
+
+
+def clear_sentiment_cache(apps, schema_editor):
+    """
+    Drop the entries keyed by lowercased text: their scores come from
+    whichever casing was analyzed first. They are recomputed on demand.
+    """
+    SentimentCacheEntry = apps.get_model("ai_features", "SentimentCacheEntry")
+    SentimentCacheEntry.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ai_features", "0002_leadfeatures"),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_sentiment_cache, migrations.RunPython.noop),
+    ]
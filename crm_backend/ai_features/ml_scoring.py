@@ -0,0 +1,177 @@
+"""
+AI Feature 1b: Lead Scoring with a trained scikit-learn model.
+
+Enabled with AI_LEAD_SCORING_BACKEND = 'ml'. The model artifact at
+AI_LEAD_MODEL_PATH is a pickled dict:
+    {
+        'model': <fitted classifier with predict_proba>,
+        'version': '20261017T091200',
+        'feature_columns': [...],  # must match features.MODEL_COLUMNS
+    }
+
+The artifact is loaded once per worker process and kept in memory.
+At most every AI_LEAD_MODEL_RELOAD_INTERVAL seconds the file is stat()-ed,
+and a new version is loaded when its modification time or size changed,
+so a retrained model goes live without restarting workers.
+
+When no usable artifact exists, ModelUnavailable is raised and callers
+fall back to the rule-based calculate_lead_score.
+
+With AI_INFERENCE_SOCKET set, predictions are made by the inference
+server (see inference.py), which holds the only copy of the model, and
+the worker loads it only while the server is unavailable.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .features import MODEL_COLUMN_INDEXES, MODEL_COLUMNS
+from .instrumentation import instrument
+
+
+logger = logging.getLogger(__name__)
+
+
+class ModelUnavailable(Exception):
+    """No usable model artifact could be loaded"""
+
+
+def _load_artifact(path):
+    """
+    Unpickle and validate a model artifact.
+    """
+    with open(path, 'rb') as f:
+        artifact = pickle.load(f)
+    
+    if not isinstance(artifact, dict) or not hasattr(artifact.get('model'), 'predict_proba'):
+        raise ModelUnavailable(f'{path} is not a lead scoring model artifact')
+    
+    if tuple(artifact.get('feature_columns', ())) != MODEL_COLUMNS:
+        raise ModelUnavailable(
+            f'{path} was trained on {artifact.get("feature_columns")}, '
+            f'expected {list(MODEL_COLUMNS)}'
+        )
+    
+    classes = list(artifact['model'].classes_)
+    if 1 not in classes:
+        raise ModelUnavailable(f'{path} was not trained with a positive (converted) class')
+    
+    # Column of predict_proba holding the probability of conversion
+    artifact['positive_index'] = classes.index(1)
+    return artifact
+
+
+class ModelCache:
+    """
+    Process-wide cache of the lead scoring model with hot reload.
+    
+    If a new artifact fails to load, the previously loaded model keeps
+    serving requests and the error is logged. Missing or broken artifacts
+    are also only re-checked once per reload interval.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._artifact = None
+        self._key = None  # (path, mtime_ns, size) of the loaded artifact
+        self._failed_key = None  # Same for the last artifact that failed to load
+        self._path = None  # Path checked last
+        self._error = None  # Why no model is available
+        self._checked_at = 0.0
+    
+    def get(self):
+        """
+        Return the current artifact, reloading it if the file changed.
+        
+        Raises:
+            ModelUnavailable: if no model could be loaded from the path
+        """
+        path = str(settings.AI_LEAD_MODEL_PATH)
+        
+        # Fast path: no filesystem access between checks
+        if self._path == path and time.monotonic() - self._checked_at < settings.AI_LEAD_MODEL_RELOAD_INTERVAL:
+            if self._artifact is None:
+                raise ModelUnavailable(self._error)
+            return self._artifact
+        
+        with self._lock:
+            if self._path != path:
+                self._artifact = None
+                self._key = None
+            self._path = path
+            self._checked_at = time.monotonic()
+            
+            try:
+                stat = os.stat(path)
+                key = (path, stat.st_mtime_ns, stat.st_size)
+                if key != self._key and key != self._failed_key:
+                    self._failed_key = key
+                    self._artifact = _load_artifact(path)
+                    self._failed_key = None
+                    self._key = key
+                    logger.info('Loaded lead scoring model %s from %s',
+                                self._artifact.get('version'), path)
+            except Exception as e:
+                if self._artifact is None:
+                    self._error = f'Cannot load lead scoring model from {path}: {e}'
+                    logger.warning('%s - using rule-based scoring', self._error)
+                    raise ModelUnavailable(self._error) from e
+                logger.error('Keeping lead scoring model %s, reload failed: %s',
+                             self._artifact.get('version'), e)
+            
+            return self._artifact
+    
+    def clear(self):
+        """Forget the loaded model (the next call reloads it)"""
+        with self._lock:
+            self._artifact = None
+            self._key = None
+            self._path = None
+            self._checked_at = 0.0
+
+
+# One cache per worker process
+model_cache = ModelCache()
+
+
+@instrument()
+def predict_scores(matrix):
+    """
+    Score many leads with a single predict_proba call, on the inference
+    server when one is configured and running.
+    
+    Args:
+        matrix: Encoded features, shape (n_leads, len(FEATURE_COLUMNS)),
+                see features.encode_features; only the MODEL_COLUMNS
+                are passed to the model
+    
+    Returns:
+        numpy.ndarray: int64 scores from 0 to 100
+    
+    Raises:
+        ModelUnavailable: if no model is loaded
+    """
+    if settings.AI_INFERENCE_SOCKET:
+        from .inference import InferenceUnavailable, server_predict_scores
+        try:
+            return server_predict_scores(matrix)
+        except InferenceUnavailable:
+            pass
+    return predict_scores_in_process(matrix)
+
+
+def predict_scores_in_process(matrix):
+    """predict_scores with the model of this process"""
+    artifact = model_cache.get()
+    probabilities = artifact['model'].predict_proba(
+        matrix[:, MODEL_COLUMN_INDEXES]
+    )[:, artifact['positive_index']]
+    
+    # Convert conversion probability (0-1) to a 0-100 score
+    return (probabilities * 100).astype(np.int64)
+
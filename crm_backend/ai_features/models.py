@@ -1,4 +1,61 @@
+"""
+Models for AI features.
+
+Most AI features are utility functions used by other apps. Two tables
+live here: computed sentiment, so the same text is never analyzed twice
+(see sentiment_cache.py), and the encoded features of every lead shared
+by scoring, categorization and simulations (see feature_store.py).
+"""
 from django.db import models
 
-# AI features doesn't need its own models.
-# It provides utility functions used by other apps.
+
+class SentimentCacheEntry(models.Model):
+    """
+    Sentiment scores of one normalized text, keyed by its SHA-256 hash.
+    
+    Only the raw scores are stored: the label and interpretation are
+    derived from them, so changing the thresholds needs no cache flush.
+    """
+    text_hash = models.CharField(max_length=64, primary_key=True)
+    polarity = models.FloatField()
+    subjectivity = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'ai_sentiment_cache'
+        verbose_name_plural = 'sentiment cache entries'
+    
+    def __str__(self):
+        return f"{self.text_hash[:12]} ({self.polarity:+.3f})"
+
+
+class LeadFeatures(models.Model):
+    """
+    Encoded scoring/categorization features of one lead.
+    
+    The columns are features.FEATURE_COLUMNS with the same integer codes,
+    plus the day the lead was created, so a whole table reads straight
+    into a NumPy matrix. Kept up to date by leads.signals.
+    """
+    lead = models.OneToOneField(
+        'leads.Lead',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='features'
+    )
+    source = models.SmallIntegerField(help_text='features.SOURCE_CODES code')
+    status = models.SmallIntegerField(help_text='features.STATUS_CODES code')
+    has_company = models.BooleanField()
+    has_phone = models.BooleanField()
+    has_website = models.BooleanField()
+    contact_count = models.PositiveIntegerField()
+    deal_count = models.PositiveIntegerField()
+    created_day = models.IntegerField(help_text='Day the lead was created, in days since 1970-01-01 (UTC)')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ai_lead_features'
+        verbose_name_plural = 'lead features'
+    
+    def __str__(self):
+        return f"Lead {self.lead_id} features"
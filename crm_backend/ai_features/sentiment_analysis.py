@@ -1,18 +1,83 @@
 """
 AI Feature 3: Sentiment Analysis for notes and communications.
 
-Uses TextBlob for Natural Language Processing (NLP).
-TextBlob provides:
+Scores come from the sentiment engine selected by AI_SENTIMENT_ENGINE
+(TextBlob by default, see sentiment_engines.py). Every engine provides:
 - Polarity: -1.0 (Negative) to +1.0 (Positive)
 - Subjectivity: 0.0 (Objective/Factual) to 1.0 (Subjective/Opinion)
+
+Scores are cached by text (see sentiment_cache.py), so a note pasted
+again is not analyzed again.
+
+With the TextBlob engine, TextBlob (with NLTK and SciPy, about 100 MB
+and most of a second) is imported on the first analysis, not with this
+module.
 """
+from django.conf import settings
+
+from .instrumentation import instrument
+from .sentiment_engines import get_engine
+
+
+def compute_sentiment_scores(text, engine=None):
+    """
+    Run the sentiment engine on a text, without the cache.
+    
+    Args:
+        text: Text to analyze
+        engine: Engine name (default: AI_SENTIMENT_ENGINE)
+    
+    Returns:
+        tuple: (polarity, subjectivity), unrounded
+    """
+    if not text or not text.strip():
+        return 0.0, 0.0
+    
+    return get_engine(engine).score(text)
+
+
+def get_sentiment_scores(text):
+    """
+    (polarity, subjectivity) of a text, from the cache when it was seen before.
+    """
+    if not text or not text.strip():
+        return 0.0, 0.0
+    
+    from .sentiment_cache import sentiment_cache
+    return sentiment_cache.get_scores(text, _score_text)
+
+
+def _score_text(text):
+    """compute_sentiment_scores, on the inference server if it should and can be used"""
+    engine = get_engine()
+    if engine.heavy and settings.AI_INFERENCE_SOCKET:
+        from .inference import InferenceUnavailable, server_sentiment_scores
+        try:
+            return server_sentiment_scores([text], engine.name)[0]
+        except InferenceUnavailable:
+            pass
+    return engine.score(text)
 
-from textblob import TextBlob
+
+def classify_polarity(polarity):
+    """
+    Sentiment label of a polarity score.
+    
+    Returns:
+        str: 'positive', 'neutral', or 'negative'
+    """
+    # We use a small buffer around 0 (-0.1 to 0.1) for neutral to avoid noise
+    if polarity > 0.1:
+        return 'positive'
+    elif polarity < -0.1:
+        return 'negative'
+    return 'neutral'
 
 
+@instrument()
 def analyze_sentiment(text):
     """
-    Analyze sentiment of text using TextBlob.
+    Analyze sentiment of text with the AI_SENTIMENT_ENGINE engine.
     
     Args:
         text: String to analyze
@@ -26,20 +91,10 @@ def analyze_sentiment(text):
     if not text or not text.strip():
         return 'neutral', 0.0
     
-    # Create TextBlob object for NLP processing
-    blob = TextBlob(text)
-    
     # Get polarity score (-1 to 1)
-    polarity = blob.sentiment.polarity
+    polarity, _ = get_sentiment_scores(text)
     
-    # Classify sentiment based on polarity thresholds
-    # We use a small buffer around 0 (-0.1 to 0.1) for neutral to avoid noise
-    if polarity > 0.1:
-        sentiment = 'positive'
-    elif polarity < -0.1:
-        sentiment = 'negative'
-    else:
-        sentiment = 'neutral'
+    sentiment = classify_polarity(polarity)
     
     # Round score to 3 decimal places for clean storage
     score = round(polarity, 3)
@@ -47,6 +102,7 @@ def analyze_sentiment(text):
     return sentiment, score
 
 
+@instrument()
 def analyze_sentiment_detailed(text):
     """
     Get detailed sentiment analysis including subjectivity.
@@ -65,17 +121,18 @@ def analyze_sentiment_detailed(text):
             'classification': 'neutral'
         }
     
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity
-    subjectivity = blob.sentiment.subjectivity
+    polarity, subjectivity = get_sentiment_scores(text)
+    return sentiment_details(polarity, subjectivity)
+
+
+def sentiment_details(polarity, subjectivity):
+    """
+    Detailed sentiment information from already computed scores.
     
-    # Classify sentiment
-    if polarity > 0.1:
-        classification = 'positive'
-    elif polarity < -0.1:
-        classification = 'negative'
-    else:
-        classification = 'neutral'
+    Returns:
+        dict: Same keys as analyze_sentiment_detailed
+    """
+    classification = classify_polarity(polarity)
     
     return {
         'sentiment': classification,
@@ -0,0 +1,175 @@
+"""
+Two-level cache of sentiment scores, keyed by a hash of the note text.
+
+Reps paste the same templated notes over and over, and the default
+TextBlob engine takes a millisecond or more per note. Before analyzing a text we look for its
+(polarity, subjectivity) in:
+
+1. an in-process LRU dict of AI_SENTIMENT_CACHE_SIZE entries,
+2. the ai_sentiment_cache table (SentimentCacheEntry), shared by all
+   workers and kept across restarts.
+
+Texts are normalized first (runs of whitespace collapsed), which does
+not change the engines' results: their tokenizers ignore spacing. Case
+is kept, since TextBlob reads it in emoticons ('Great job :D' scores
+0.9, 'great job :d' 0.8). The key also contains the version of the
+sentiment engine, so switching engines, or bumping an engine's version
+when its scoring changes, leaves the old entries unused.
+
+Single texts shorter than AI_SENTIMENT_CACHE_DB_MIN_LENGTH skip the
+table: a SELECT plus an INSERT costs more than TextBlob on a short note
+(~0.75 ms against ~0.4 ms for 200 characters). Batches always use it,
+with one SELECT per DB_LOOKUP_CHUNK_SIZE texts and one bulk INSERT.
+
+Hit and miss counters are per process, see SentimentCache.stats().
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .sentiment_engines import get_engine
+
+# Hashes per SELECT ... WHERE text_hash IN (...)
+DB_LOOKUP_CHUNK_SIZE = 500
+
+
+def normalize_text(text):
+    """Text with runs of whitespace collapsed to one space"""
+    return ' '.join(text.split())
+
+
+def text_hash(text, version=None):
+    """
+    Cache key of a text: SHA-256 of the engine version and normalized text.
+    
+    Args:
+        version: SentimentEngine.version (default: the AI_SENTIMENT_ENGINE one)
+    """
+    normalized = normalize_text(text)
+    version = version or get_engine().version
+    return hashlib.sha256(f'{version}\n{normalized}'.encode('utf-8')).hexdigest()
+
+
+class SentimentCache:
+    """
+    Process-wide LRU of sentiment scores in front of the database table.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # hash -> (polarity, subjectivity)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+    
+    def get_scores(self, text, compute):
+        """
+        (polarity, subjectivity) of one text.
+        
+        Args:
+            text: Text to analyze
+            compute: Function text -> (polarity, subjectivity), called on a miss
+        """
+        use_db = len(text) >= settings.AI_SENTIMENT_CACHE_DB_MIN_LENGTH
+        return self.get_many([text], lambda texts: [compute(texts[0])], use_db=use_db)[0]
+    
+    def get_many(self, texts, compute_many, use_db=True):
+        """
+        (polarity, subjectivity) of every text, in input order.
+        
+        Memory misses are looked up in the database with one query per
+        DB_LOOKUP_CHUNK_SIZE texts, the remaining texts are scored by a
+        single compute_many call and written back with one bulk INSERT.
+        Duplicate texts inside the batch are scored once.
+        
+        Args:
+            texts: List of strings
+            compute_many: Function list of texts -> list of (polarity, subjectivity)
+            use_db: Also look up and store the scores in the table
+        """
+        from .models import SentimentCacheEntry
+        
+        version = get_engine().version
+        keys = [text_hash(text, version) for text in texts]
+        found = {}
+        
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        in_memory = set(found)
+        
+        # dict keeps the first text of every missing hash, in order
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys) if use_db else 0, DB_LOOKUP_CHUNK_SIZE):
+            rows = SentimentCacheEntry.objects.filter(
+                text_hash__in=missing_keys[start:start + DB_LOOKUP_CHUNK_SIZE]
+            ).values_list('text_hash', 'polarity', 'subjectivity')
+            for key, polarity, subjectivity in rows:
+                found[key] = (polarity, subjectivity)
+        in_db = set(found) - in_memory
+        
+        unknown = [key for key in missing_keys if key not in found]
+        if unknown:
+            scores = compute_many([missing[key] for key in unknown])
+            new_entries = []
+            for key, (polarity, subjectivity) in zip(unknown, scores):
+                found[key] = (polarity, subjectivity)
+                new_entries.append(SentimentCacheEntry(
+                    text_hash=key, polarity=polarity, subjectivity=subjectivity
+                ))
+            if use_db:
+                # Another worker may have stored the same text meanwhile
+                SentimentCacheEntry.objects.bulk_create(new_entries, ignore_conflicts=True)
+        
+        # Counted per text: a text repeated inside the batch is a memory hit
+        # after its first occurrence, as it would be in separate requests
+        db_hits = sum(1 for key in keys if key in in_db)
+        misses = len(unknown)
+        with self._lock:
+            self.db_hits += db_hits
+            self.misses += misses
+            self.memory_hits += len(keys) - db_hits - misses
+            for key in missing_keys:
+                self._store(key, found[key])
+        
+        return [found[key] for key in keys]
+    
+    def _store(self, key, scores):
+        self._entries[key] = scores
+        self._entries.move_to_end(key)
+        while len(self._entries) > settings.AI_SENTIMENT_CACHE_SIZE:
+            self._entries.popitem(last=False)
+    
+    def stats(self):
+        """
+        Counters of this process since it started (or since clear()).
+        
+        Returns:
+            dict: memory_hits, db_hits, misses, hit_rate (0-1), memory_entries
+                  and memory_capacity
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else None,
+                'memory_entries': len(self._entries),
+                'memory_capacity': settings.AI_SENTIMENT_CACHE_SIZE,
+            }
+    
+    def clear(self):
+        """Empty the in-process level and reset the counters (the table is kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+
+
+# One cache per worker process
+sentiment_cache = SentimentCache()
@@ -0,0 +1,267 @@
+"""
+Sentiment engines behind compute_sentiment_scores.
+
+An engine turns a text into (polarity, subjectivity), with polarity from
+-1.0 to +1.0 and subjectivity from 0.0 to 1.0. The engine of a deployment
+is chosen with AI_SENTIMENT_ENGINE:
+
+    'textblob'  TextBlob's PatternAnalyzer (the default). Imports TextBlob,
+                NLTK and SciPy on first use and builds a Sentence object
+                per text.
+    'lexicon'   LexiconEngine below: the same word lexicon, compiled once
+                per process into a plain dict and applied by a handful of
+                VADER-style rules. No import beyond the standard library,
+                nothing allocated per call but the token list, roughly ten
+                times faster than TextBlob.
+
+The engines agree on most texts but not all of them (see
+`manage.py compare_sentiment_engines`), so every engine has its own
+version in the sentiment cache key, and notes analyzed by the previous
+engine keep their scores until `manage.py reanalyze_notes` is run.
+
+Engines are looked up by name with get_engine(); the pool processes of
+sentiment_pool.py have no Django settings and always pass the name.
+"""
+import importlib.util
+import re
+import threading
+import xml.etree.ElementTree as ElementTree
+from pathlib import Path
+
+
+class SentimentEngine:
+    """
+    Base class of the sentiment engines.
+    
+    Attributes:
+        name: value of AI_SENTIMENT_ENGINE selecting the engine
+        version: part of the sentiment cache key; change it when the
+            scores of the engine change
+        heavy: worth running on the inference server when one is
+            configured (see inference.py), rather than in every worker
+    """
+    name = None
+    version = None
+    heavy = False
+    
+    def load(self):
+        """Import and load everything the engine needs (called on first use otherwise)"""
+    
+    def score(self, text):
+        """
+        Score one non-blank text.
+        
+        Returns:
+            tuple: (polarity, subjectivity), unrounded
+        """
+        raise NotImplementedError
+    
+    def score_many(self, texts):
+        """(polarity, subjectivity) of every text, in input order"""
+        return [self.score(text) for text in texts]
+
+
+class TextBlobEngine(SentimentEngine):
+    """TextBlob's default analyzer"""
+    name = 'textblob'
+    version = 'textblob-1'
+    heavy = True
+    
+    def load(self):
+        self.score('Warm up the sentiment lexicon.')
+    
+    def score(self, text):
+        from textblob import TextBlob
+        sentiment = TextBlob(text).sentiment
+        return sentiment.polarity, sentiment.subjectivity
+
+
+# Words turning the sentiment of the next scored word ("not good")
+NEGATIONS = frozenset({
+    'no', 'not', "n't", 'never', 'nothing', 'nobody', 'none', 'neither', 'nor', 'cannot', 'without',
+})
+# A negation reaches this many tokens ahead ("not at all good")
+NEGATION_WINDOW = 3
+# "not good" = slightly bad, "not bad" = slightly good (as TextBlob)
+NEGATION_FACTOR = -0.5
+# Weight of the words before and after "but" ("good, but expensive")
+BEFORE_BUT_WEIGHT = 0.5
+AFTER_BUT_WEIGHT = 1.5
+# Each "!" strengthens the word before it
+EXCLAMATION_FACTOR = 1.25
+
+EMOTICONS = {
+    ':)': 0.5, ':-)': 0.5, ':d': 1.0, ':-d': 1.0, ';)': 0.5, '<3': 1.0,
+    ':(': -0.75, ':-(': -0.75, ":'(": -0.75, ':/': -0.25, ':-/': -0.25,
+}
+
+# Words (with hyphens), "n't" split off as TextBlob does ("don't" -> "do", "n't"),
+# emoticons and exclamation marks. Texts are lowercased first.
+TOKEN = re.compile(
+    r"[a-z0-9]+(?=n't\b)|n't|[a-z0-9]+(?:-[a-z0-9]+)*|"
+    + '|'.join(re.escape(emoticon) for emoticon in sorted(EMOTICONS, key=len, reverse=True))
+    + r'|!'
+)
+
+
+def lexicon_path():
+    """TextBlob's English sentiment lexicon (found without importing TextBlob)"""
+    spec = importlib.util.find_spec('textblob')
+    if spec is None or spec.origin is None:
+        raise ImportError('The lexicon sentiment engine reads its words from the textblob package')
+    return Path(spec.origin).parent / 'en' / 'en-sentiment.xml'
+
+
+def compile_lexicon(path=None):
+    """
+    Read the lexicon XML into a plain dict.
+    
+    Scores of a word's senses are averaged per part of speech, then over
+    the parts of speech, as TextBlob does for untagged text. Multi-word
+    entries are left out: they never match a single token.
+    
+    Returns:
+        dict: word -> (polarity, subjectivity, intensity, is_modifier),
+        is_modifier being true for adverbs, which scale the next word
+        ("very good")
+    """
+    senses = {}
+    for element in ElementTree.parse(path or lexicon_path()).getroot().iterfind('word'):
+        word = element.get('form')
+        if not word or ' ' in word:
+            continue
+        senses.setdefault(word, {}).setdefault(element.get('pos'), []).append((
+            float(element.get('polarity', 0.0)),
+            float(element.get('subjectivity', 0.0)),
+            float(element.get('intensity', 1.0)),
+        ))
+    
+    lexicon = {}
+    for word, by_pos in senses.items():
+        averages = [[sum(values) / len(values) for values in zip(*scores)] for scores in by_pos.values()]
+        polarity, subjectivity, intensity = (sum(values) / len(values) for values in zip(*averages))
+        lexicon[word] = (polarity, subjectivity, intensity, 'RB' in by_pos)
+    return lexicon
+
+
+def _clamp(value):
+    return -1.0 if value < -1.0 else 1.0 if value > 1.0 else value
+
+
+class LexiconEngine(SentimentEngine):
+    """
+    Rule-based scoring over a precompiled word lexicon.
+    
+    The text is split by one regex and every token costs a dict lookup.
+    Like TextBlob, the result is the mean polarity and subjectivity of the
+    words found in the lexicon, after these rules:
+        - an adverb multiplies the next word by its intensity ("very good")
+        - a negation within NEGATION_WINDOW tokens turns the next word
+          ("not good" = -0.5 x good)
+        - words before "but" weigh BEFORE_BUT_WEIGHT, words after it
+          AFTER_BUT_WEIGHT ("nice demo but too expensive" leans negative)
+        - "!" strengthens the word before it
+        - emoticons count as words
+    The text is lowercased, so capitals never change the score. This is
+    one of the differences from TextBlob, which keeps the case of
+    emoticons and scores ':d' lower than ':D'.
+    """
+    name = 'lexicon'
+    version = 'lexicon-1'
+    
+    def __init__(self):
+        self._lexicon = None
+        self._lock = threading.Lock()
+    
+    def load(self):
+        if self._lexicon is None:
+            with self._lock:
+                if self._lexicon is None:
+                    lexicon = compile_lexicon()
+                    lexicon.update((emoticon, (polarity, 1.0, 1.0, False)) for emoticon, polarity in EMOTICONS.items())
+                    self._lexicon = lexicon
+        return self._lexicon
+    
+    def score(self, text):
+        lexicon = self._lexicon or self.load()
+        
+        # Scored words as [polarity, subjectivity, weight, negated]
+        scored = []
+        weight = 1.0
+        negation_until = -1  # Index of the last token a negation reaches
+        modifier = None  # Intensity of the adverb just scored, if any
+        
+        for index, token in enumerate(TOKEN.findall(text.lower())):
+            entry = lexicon.get(token)
+            if entry is not None:
+                polarity, subjectivity, intensity, is_modifier = entry
+                if modifier is not None:
+                    # "very good" is one word: good, scaled by very
+                    polarity = _clamp(polarity * modifier)
+                    subjectivity = _clamp(subjectivity * modifier)
+                    negated = scored.pop()[3]
+                else:
+                    negated = False
+                if index <= negation_until:
+                    negated = True
+                    negation_until = -1
+                scored.append([polarity, subjectivity, weight, negated])
+                modifier = intensity if is_modifier else None
+                if token in NEGATIONS:
+                    negation_until = index + NEGATION_WINDOW
+            elif token in NEGATIONS:
+                negation_until = index + NEGATION_WINDOW
+            elif token == '!':
+                if scored:
+                    scored[-1][0] = _clamp(scored[-1][0] * EXCLAMATION_FACTOR)
+            elif token == 'but':
+                for word in scored:
+                    word[2] = BEFORE_BUT_WEIGHT
+                weight = AFTER_BUT_WEIGHT
+                modifier = None
+            elif len(token) > 2:
+                # An adverb reaches over short words only ("really is a good")
+                modifier = None
+        
+        if not scored:
+            return 0.0, 0.0
+        total_weight = polarity_sum = subjectivity_sum = 0.0
+        for polarity, subjectivity, weight, negated in scored:
+            if negated:
+                polarity *= NEGATION_FACTOR
+            total_weight += weight
+            polarity_sum += polarity * weight
+            subjectivity_sum += subjectivity * weight
+        return polarity_sum / total_weight, subjectivity_sum / total_weight
+
+
+ENGINES = {engine.name: engine for engine in (TextBlobEngine, LexiconEngine)}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def get_engine(name=None):
+    """
+    The engine of that name, one instance per process.
+    
+    Args:
+        name: key of ENGINES (default: AI_SENTIMENT_ENGINE)
+    
+    Raises:
+        ImproperlyConfigured: for an unknown name
+    """
+    if name is None:
+        from django.conf import settings
+        name = settings.AI_SENTIMENT_ENGINE
+    
+    engine = _instances.get(name)
+    if engine is None:
+        if name not in ENGINES:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured(
+                f'Unknown sentiment engine {name!r}, expected one of: {", ".join(ENGINES)}'
+            )
+        with _instances_lock:
+            engine = _instances.setdefault(name, ENGINES[name]())
+    return engine
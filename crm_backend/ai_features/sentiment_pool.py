@@ -0,0 +1,173 @@
+"""
+Batch sentiment analysis on a pool of worker processes.
+
+The sentiment engines are pure Python and hold the GIL, so threads do
+not help: a batch of texts is split into chunks which are analyzed in
+parallel by a persistent ProcessPoolExecutor (one per web worker,
+created on first use). Each pool process loads the sentiment engine (TextBlob and its
+lexicon by default) once, when it starts, instead of on its first
+request. The pool processes have no Django settings: the engine name is
+sent along with every chunk.
+
+Texts already in the sentiment cache are answered from it, only the
+misses are analyzed. Small batches of misses, and machines configured
+with a single worker, are analyzed in the calling process: sending a few
+texts to another process costs more than analyzing them.
+
+With AI_INFERENCE_SOCKET set and a heavy engine (TextBlob), the misses
+are sent to the inference server instead, which runs this same pool
+(see inference.py); the pool of the web worker is only used while the
+server is unavailable.
+
+Settings:
+    AI_SENTIMENT_WORKERS: pool processes (default: number of CPUs)
+    AI_SENTIMENT_POOL_MIN_TEXTS: smallest batch sent to the pool
+"""
+import atexit
+import logging
+import multiprocessing
+import threading
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from .sentiment_analysis import classify_polarity, compute_sentiment_scores, sentiment_details
+from .sentiment_engines import get_engine
+from .sentiment_cache import sentiment_cache
+from .instrumentation import instrument
+
+
+logger = logging.getLogger(__name__)
+
+# Chunks per pool process, so a slow chunk does not leave the others idle
+CHUNKS_PER_WORKER = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker(engine):
+    """Runs once in every pool process: load the sentiment engine"""
+    get_engine(engine).load()
+
+
+def score_texts(texts, engine=None):
+    """
+    (polarity, subjectivity) of every text, computed in the current
+    process without the cache. Runs in the pool processes, which have
+    no Django setup, so they are given the engine name.
+    """
+    return [compute_sentiment_scores(text, engine) for text in texts]
+
+
+def get_executor():
+    """
+    The process pool of this web worker, started on first use.
+    
+    The 'spawn' start method is used because forking a threaded server
+    process can copy locks held by other threads.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.AI_SENTIMENT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(settings.AI_SENTIMENT_ENGINE,),
+            )
+        return _executor
+
+
+def shutdown_executor():
+    """Stop the pool processes (a new pool starts on the next batch)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(shutdown_executor)
+
+
+@instrument()
+def analyze_sentiment_batch(texts, detailed=False):
+    """
+    Analyze many texts, in parallel when enough of them are not cached.
+    
+    Args:
+        texts: List of strings
+        detailed: Return analyze_sentiment_detailed results
+    
+    Returns:
+        list: one result per text, in input order. A dict shaped like
+              analyze_sentiment_detailed when detailed is true, otherwise
+              {'sentiment': label, 'score': polarity}.
+    """
+    # Empty texts are neutral and not worth a cache entry
+    blank = (0.0, 0.0)
+    filled = [text for text in texts if text.strip()]
+    scores = iter(sentiment_cache.get_many(filled, score_texts_parallel) if filled else [])
+    
+    results = []
+    for text in texts:
+        polarity, subjectivity = next(scores) if text.strip() else blank
+        if detailed:
+            results.append(sentiment_details(polarity, subjectivity))
+        else:
+            results.append({'sentiment': classify_polarity(polarity), 'score': round(polarity, 3)})
+    return results
+
+
+def score_texts_parallel(texts):
+    """
+    (polarity, subjectivity) of every text, without the cache: on the
+    inference server when it should and can be used, otherwise with
+    score_texts_pooled.
+    
+    Returns:
+        list: (polarity, subjectivity) per text, in input order
+    """
+    engine = get_engine()
+    if engine.heavy and settings.AI_INFERENCE_SOCKET:
+        from .inference import InferenceUnavailable, server_sentiment_scores
+        try:
+            return server_sentiment_scores(texts, engine.name)
+        except InferenceUnavailable:
+            pass
+    return score_texts_pooled(texts, engine.name)
+
+
+def score_texts_pooled(texts, engine=None):
+    """
+    score_texts spread over the process pool of this process.
+    
+    Args:
+        engine: Engine name (default: AI_SENTIMENT_ENGINE)
+    
+    Returns:
+        list: (polarity, subjectivity) per text, in input order
+    """
+    engine = engine or settings.AI_SENTIMENT_ENGINE
+    workers = settings.AI_SENTIMENT_WORKERS
+    if workers <= 1 or len(texts) < settings.AI_SENTIMENT_POOL_MIN_TEXTS:
+        return score_texts(texts, engine)
+    
+    size = -(-len(texts) // (workers * CHUNKS_PER_WORKER))
+    chunks = [texts[start:start + size] for start in range(0, len(texts), size)]
+    
+    try:
+        scores = []
+        # map() yields chunk results in submission order
+        for chunk_scores in get_executor().map(score_texts, chunks, repeat(engine)):
+            scores.extend(chunk_scores)
+        return scores
+    except BrokenProcessPool:
+        # A pool process died (killed, out of memory): start a new pool for
+        # the next batch and answer this one without it
+        logger.exception('Sentiment process pool broke, analyzing %d texts in process', len(texts))
+        shutdown_executor()
+        return score_texts(texts, engine)
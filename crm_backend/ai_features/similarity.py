@@ -0,0 +1,408 @@
+"""
+"Find leads like this one" and "notes like this one".
+
+Every lead (company and description) and every note (content) is turned
+into a TF-IDF vector by a scikit-learn TfidfVectorizer. The vectors are
+L2-normalized, so the cosine similarity of two rows is their dot
+product, and the nearest neighbours of a row are the rows with the
+largest dot products: one sparse matrix-vector product over the whole
+matrix, a few milliseconds for 100,000 rows.
+
+Index files, per kind ('lead' or 'note'), under AI_SIMILARITY_INDEX_DIR:
+
+    <kind>/current.json       version, row and nonzero counts, last id...
+    <kind>/<version>/         one directory per full build
+        data.bin indices.bin indptr.bin   the CSR matrix, raw arrays
+        ids.bin                           object id of every row
+        vectorizer.pkl                    the fitted TfidfVectorizer
+
+The arrays are memory-mapped (np.memmap), not read, so every worker of
+the machine shares one copy in the page cache, and opening an index
+costs nothing but reading current.json.
+
+Built offline by `manage.py build_similarity_index`:
+    - a full build fits the vocabulary and IDF weights on all rows and
+      writes a new version directory, then switches current.json to it
+    - an append transforms the rows created since (id above the last
+      indexed id) with the fitted vectorizer and appends them to the
+      array files; words unknown to the vocabulary are ignored until the
+      next full build. Only current.json's counts make appended rows
+      visible, so readers never see half-written rows.
+    - by default the command appends, and builds in full once the index
+      is older than AI_SIMILARITY_REBUILD_INTERVAL or the appended rows
+      exceed AI_SIMILARITY_REBUILD_FRACTION of it
+
+Edited rows keep their old vector and deleted rows stay in the index
+until the next full build; deleted rows are left out of the results.
+"""
+import fcntl
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .instrumentation import instrument
+
+
+KINDS = ('lead', 'note')
+
+# Fields whose text is indexed, per kind
+TEXT_FIELDS = {
+    'lead': ('company', 'description'),
+    'note': ('content',),
+}
+
+# Rows streamed from the database at a time
+CHUNK_SIZE = 5000
+
+
+class IndexUnavailable(Exception):
+    """No index of this kind has been built"""
+
+
+def index_dir(kind):
+    return Path(settings.AI_SIMILARITY_INDEX_DIR) / kind
+
+
+def _model(kind):
+    if kind == 'lead':
+        from leads.models import Lead
+        return Lead
+    from notes.models import Note
+    return Note
+
+
+def row_text(kind, values):
+    """Indexed text of a row, from its TEXT_FIELDS values in order"""
+    return ' '.join(value for value in values if value)
+
+
+def _rows(kind, after_id=0, up_to_id=None):
+    """(id, text) of the rows of a kind, by id"""
+    queryset = _model(kind).objects.filter(id__gt=after_id).order_by('id')
+    if up_to_id is not None:
+        queryset = queryset.filter(id__lte=up_to_id)
+    for row in queryset.values_list('id', *TEXT_FIELDS[kind]).iterator(chunk_size=CHUNK_SIZE):
+        yield row[0], row_text(kind, row[1:])
+
+
+def _new_vectorizer(row_count):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    return TfidfVectorizer(
+        stop_words='english',
+        sublinear_tf=True,
+        # Words of a single row can't relate two rows, but tiny corpora
+        # would be left without vocabulary
+        min_df=2 if row_count >= 1000 else 1,
+        max_df=0.5 if row_count >= 1000 else 1.0,
+        max_features=settings.AI_SIMILARITY_MAX_FEATURES,
+        dtype=np.float32,
+    )
+
+
+@contextmanager
+def _write_lock(kind, blocking=True):
+    """
+    Lock held while an index is written (one writer per kind).
+    
+    Yields:
+        bool: whether the lock was acquired (always true when blocking)
+    """
+    directory = index_dir(kind)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / 'write.lock', 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _read_meta(kind):
+    try:
+        return json.loads((index_dir(kind) / 'current.json').read_text())
+    except FileNotFoundError:
+        return None
+
+
+def _write_meta(kind, meta):
+    path = index_dir(kind) / 'current.json'
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(meta))
+    temporary.replace(path)
+
+
+@instrument('similarity.build_index')
+def build_index(kind):
+    """
+    Fit a vectorizer on every row and write a new version of the index.
+    
+    Returns:
+        dict: the new index's metadata
+    """
+    with _write_lock(kind):
+        started = time.perf_counter()
+        # Rows created during the build are left to the next append
+        model = _model(kind)
+        last_id = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        ids = []
+        
+        def texts():
+            for pk, text in _rows(kind, up_to_id=last_id):
+                ids.append(pk)
+                yield text
+        
+        vectorizer = _new_vectorizer(model.objects.filter(id__lte=last_id).count())
+        try:
+            matrix = vectorizer.fit_transform(texts())
+        except ValueError:
+            # Empty vocabulary: no rows, or only stop words
+            from scipy import sparse
+            vectorizer = None
+            matrix = sparse.csr_matrix((len(ids), 0), dtype=np.float32)
+        
+        now = timezone.now()
+        version = now.strftime('%Y%m%dT%H%M%S%f')
+        directory = index_dir(kind) / version
+        directory.mkdir(parents=True)
+        index_dtype = np.int32 if matrix.nnz < np.iinfo(np.int32).max else np.int64
+        arrays = {
+            'data': matrix.data.astype(np.float32),
+            'indices': matrix.indices.astype(index_dtype),
+            'indptr': matrix.indptr.astype(index_dtype),
+            'ids': np.array(ids, dtype=np.int64),
+        }
+        for name, array in arrays.items():
+            array.tofile(directory / f'{name}.bin')
+        with open(directory / 'vectorizer.pkl', 'wb') as f:
+            pickle.dump(vectorizer, f)
+        
+        meta = {
+            'kind': kind,
+            'version': version,
+            'built_at': now.isoformat(),
+            'rows': len(ids),
+            'built_rows': len(ids),
+            'nnz': int(matrix.nnz),
+            'features': int(matrix.shape[1]),
+            'index_dtype': np.dtype(index_dtype).name,
+            'last_id': last_id,
+            'build_seconds': round(time.perf_counter() - started, 2),
+        }
+        _write_meta(kind, meta)
+        
+        # Workers still mapping an old version keep their mapping until
+        # they reopen the index (unlinked files stay readable on Unix)
+        for old in index_dir(kind).iterdir():
+            if old.is_dir() and old.name != version:
+                shutil.rmtree(old, ignore_errors=True)
+        return meta
+
+
+@instrument('similarity.append_to_index')
+def append_to_index(kind):
+    """
+    Add the rows created since the last build or append.
+    
+    Returns:
+        int: rows appended (None when another process is writing the index)
+    
+    Raises:
+        IndexUnavailable: no full build yet
+    """
+    with _write_lock(kind, blocking=False) as locked:
+        if not locked:
+            return None
+        meta = _read_meta(kind)
+        if meta is None:
+            raise IndexUnavailable(f'No {kind} index has been built')
+        
+        directory = index_dir(kind) / meta['version']
+        rows = list(_rows(kind, after_id=meta['last_id']))
+        if not rows:
+            return 0
+        with open(directory / 'vectorizer.pkl', 'rb') as f:
+            vectorizer = pickle.load(f)
+        if vectorizer is None:
+            return 0  # Nothing can be vectorized before a build finds words
+        
+        index_dtype = np.dtype(meta['index_dtype'])
+        matrix = vectorizer.transform([text for _, text in rows])
+        if meta['nnz'] + matrix.nnz >= np.iinfo(index_dtype).max:
+            raise IndexUnavailable(f'The {kind} index is full, build it again')
+        
+        # Only the part beyond the counts in current.json is rewritten, so a
+        # previously interrupted append is overwritten rather than kept
+        arrays = {
+            'data': (matrix.data.astype(np.float32), meta['nnz'], np.float32),
+            'indices': (matrix.indices.astype(index_dtype), meta['nnz'], index_dtype),
+            'indptr': ((matrix.indptr[1:] + meta['nnz']).astype(index_dtype), meta['rows'] + 1, index_dtype),
+            'ids': (np.array([pk for pk, _ in rows], dtype=np.int64), meta['rows'], np.int64),
+        }
+        for name, (array, offset, dtype) in arrays.items():
+            with open(directory / f'{name}.bin', 'r+b') as f:
+                f.truncate(offset * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                array.tofile(f)
+        
+        meta.update(
+            rows=meta['rows'] + len(rows),
+            nnz=meta['nnz'] + int(matrix.nnz),
+            last_id=rows[-1][0],
+        )
+        _write_meta(kind, meta)
+        return len(rows)
+
+
+def update_index(kind, force_rebuild=False):
+    """
+    Append new rows, or build the index in full when it is missing, older
+    than AI_SIMILARITY_REBUILD_INTERVAL seconds or grown by more than
+    AI_SIMILARITY_REBUILD_FRACTION through appends.
+    
+    Returns:
+        tuple: ('built', meta) or ('appended', row count or None)
+    """
+    meta = _read_meta(kind)
+    stale = meta is None or force_rebuild or (
+        (timezone.now() - datetime.fromisoformat(meta['built_at'])).total_seconds()
+        > settings.AI_SIMILARITY_REBUILD_INTERVAL
+        or meta['rows'] - meta['built_rows'] > settings.AI_SIMILARITY_REBUILD_FRACTION * max(meta['built_rows'], 1)
+    )
+    if stale:
+        return 'built', build_index(kind)
+    return 'appended', append_to_index(kind)
+
+
+class SimilarityIndex:
+    """A memory-mapped index version, with its appended rows as of opening"""
+    
+    def __init__(self, kind, meta):
+        from scipy import sparse
+        
+        self.kind = kind
+        self.meta = meta
+        directory = index_dir(kind) / meta['version']
+        index_dtype = np.dtype(meta['index_dtype'])
+        
+        def mapped(name, dtype, length):
+            if not length:
+                return np.zeros(0, dtype=dtype)
+            return np.memmap(directory / f'{name}.bin', dtype=dtype, mode='r', shape=(length,))
+        
+        self.ids = mapped('ids', np.int64, meta['rows'])
+        self.matrix = sparse.csr_matrix(
+            (
+                mapped('data', np.float32, meta['nnz']),
+                mapped('indices', index_dtype, meta['nnz']),
+                mapped('indptr', index_dtype, meta['rows'] + 1) if meta['rows'] else np.zeros(1, dtype=index_dtype),
+            ),
+            shape=(meta['rows'], meta['features']),
+            copy=False,
+        )
+        self._directory = directory
+        self._vectorizer = None
+        self._lock = threading.Lock()
+    
+    def row_vector(self, pk):
+        """Dense query vector of an indexed row, or None if it is not in the index"""
+        position = int(np.searchsorted(self.ids, pk))
+        if position >= len(self.ids) or self.ids[position] != pk:
+            return None
+        row = self.matrix[position]
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        vector[row.indices] = row.data
+        return vector
+    
+    def text_vector(self, text):
+        """Dense query vector of any text (loads the vectorizer)"""
+        with self._lock:
+            if self._vectorizer is None:
+                with open(self._directory / 'vectorizer.pkl', 'rb') as f:
+                    self._vectorizer = pickle.load(f) or False
+        vector = np.zeros(self.matrix.shape[1], dtype=np.float32)
+        if self._vectorizer:
+            row = self._vectorizer.transform([text])
+            vector[row.indices] = row.data
+        return vector
+    
+    def nearest(self, vector, limit, exclude=None):
+        """
+        Rows most similar to a query vector.
+        
+        Returns:
+            list: (id, cosine similarity) pairs, most similar first; rows
+            with nothing in common with the query are left out
+        """
+        if not self.matrix.shape[0] or not limit:
+            return []
+        scores = self.matrix @ vector
+        if exclude is not None:
+            scores[self.ids == exclude] = 0
+        count = min(limit, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(kind):
+    """
+    The index of a kind, opened again when current.json changed.
+    
+    Raises:
+        IndexUnavailable: no index built yet
+    """
+    path = index_dir(kind) / 'current.json'
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        raise IndexUnavailable(f'No {kind} index has been built, run manage.py build_similarity_index')
+    key = (stat.st_mtime_ns, stat.st_size)
+    
+    with _indexes_lock:
+        cached = _indexes.get(kind)
+        if cached is None or cached[0] != key:
+            meta = _read_meta(kind)
+            if meta is None:
+                raise IndexUnavailable(f'No {kind} index has been built, run manage.py build_similarity_index')
+            cached = _indexes[kind] = (key, SimilarityIndex(kind, meta))
+        return cached[1]
+
+
+@instrument()
+def find_similar(kind, pk, text, limit=10):
+    """
+    Leads or notes most similar to one of them.
+    
+    Args:
+        kind: 'lead' or 'note'
+        pk: id of the row to compare with (excluded from the results)
+        text: its text, used when the row is not indexed yet
+        limit: most results
+    
+    Returns:
+        tuple: (index metadata, list of (id, similarity)); the ids may
+        include rows deleted since the index was built
+    """
+    index = get_index(kind)
+    vector = index.row_vector(pk)
+    if vector is None:
+        vector = index.text_vector(text)
+    return index.meta, index.nearest(vector, limit, exclude=pk)
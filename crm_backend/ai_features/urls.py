@@ -7,7 +7,14 @@ from . import views
 urlpatterns = [
     path('score-lead/', views.score_lead_view, name='score_lead'),
     path('generate-email/', views.generate_email_view, name='generate_email'),
+    path('generate-email/bulk/', views.generate_email_bulk_view, name='generate_email_bulk'),
     path('analyze-sentiment/', views.analyze_sentiment_view, name='analyze_sentiment'),
+    path('analyze-sentiment/batch/', views.analyze_sentiment_batch_view, name='analyze_sentiment_batch'),
+    path('sentiment-cache/', views.sentiment_cache_stats_view, name='sentiment_cache_stats'),
     path('categorize-lead/', views.categorize_lead_view, name='categorize_lead'),
+    path('categorize-lead/simulate/', views.simulate_categorization_view, name='simulate_categorization'),
     path('update-all/', views.update_all_ai_fields, name='update_all_ai_fields'),
+    path('batch-update/', views.batch_update_ai_fields, name='batch_update_ai_fields'),
+    path('metrics/', views.ai_metrics_view, name='ai_metrics'),
+    path('similar/', views.similar_view, name='similar'),
 ]
@@ -5,16 +5,38 @@ Exposes endpoints for all 4 AI capabilities:
 2. Email Generation
 3. Sentiment Analysis
 4. Lead Categorization
+
+Lead scoring and categorization (NumPy) are imported inside the views
+that use them, and TextBlob on the first analysis, so workers that never
+serve an AI request do not load them (see ai_features/warmup.py).
 """
+import json
+from collections import defaultdict
+
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.conf import settings
+from django.core.exceptions import FieldError, ValidationError
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 
-from .lead_scoring import calculate_lead_score
-from .email_generator import generate_email
+from .email_generator import (
+    generate_email, generate_emails_bulk, get_template, missing_shared_variables, recipient_rows,
+)
 from .sentiment_analysis import analyze_sentiment, analyze_sentiment_detailed
-from .categorization import categorize_lead, get_category_details
+from .sentiment_cache import sentiment_cache
+from .sentiment_pool import analyze_sentiment_batch
+
+
+# Lead fields that may be used to select leads for a batch update
+BATCH_FILTER_FIELDS = ['status', 'source', 'category', 'assigned_to']
+BATCH_CHUNK_SIZE = 2000
+
+# Largest number of recipients for one bulk email generation
+BULK_EMAIL_MAX_RECIPIENTS = 10000
 
 
 @api_view(['POST'])
@@ -27,6 +49,7 @@ def score_lead_view(request):
     Payload: { "lead_id": 123 }
     """
     from leads.models import Lead
+    from .lead_scoring import score_lead
     
     lead_id = request.data.get('lead_id')
     if not lead_id:
@@ -38,11 +61,11 @@ def score_lead_view(request):
         return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
     
     # Calculate score
-    score = calculate_lead_score(lead)
+    score = score_lead(lead)
     
     # Update lead
     lead.score = score
-    lead.save()
+    lead.save(update_fields=['score', 'updated_at'])
     
     return Response({
         'lead_id': lead.id,
@@ -83,6 +106,67 @@ def generate_email_view(request):
     return Response(result)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def generate_email_bulk_view(request):
+    """
+    Generate one email type for many leads or contacts.
+    
+    contact_name and company_name are filled from each recipient (one
+    query for all of them); "context" holds the other variables, shared by
+    every email. The emails are streamed as they are rendered, one JSON
+    object per line:
+        {"id": 1, "email": "...", "subject": "...", "body": "..."}
+    or, for a recipient missing data (e.g. a lead without a company):
+        {"id": 2, "email": "...", "error": "...", "missing_variables": ["company_name"]}
+    
+    Endpoint: POST /api/ai/generate-email/bulk/
+    Payload: {
+        "email_type": "cold_outreach",
+        "lead_ids": [1, 2, 3],        (or "contact_ids")
+        "context": { "sender_name": "Jane", ... }
+    }
+    """
+    email_type = request.data.get('email_type')
+    context = request.data.get('context', {})
+    
+    if not email_type:
+        return Response({'error': 'email_type is required'}, status=status.HTTP_400_BAD_REQUEST)
+    template = get_template(email_type)
+    if template is None:
+        return Response({'error': f'Unknown email type: {email_type}'}, status=status.HTTP_400_BAD_REQUEST)
+    if not isinstance(context, dict):
+        return Response({'error': 'context must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    recipient_types = [name for name in ('lead', 'contact') if f'{name}_ids' in request.data]
+    if len(recipient_types) != 1:
+        return Response({'error': 'Either lead_ids or contact_ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+    recipient_type = recipient_types[0]
+    ids = request.data[f'{recipient_type}_ids']
+    
+    if not isinstance(ids, list):
+        return Response({'error': f'{recipient_type}_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > BULK_EMAIL_MAX_RECIPIENTS:
+        return Response({'error': f'At most {BULK_EMAIL_MAX_RECIPIENTS} recipients per request'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        ids = [int(pk) for pk in ids]
+    except (TypeError, ValueError):
+        return Response({'error': f'{recipient_type}_ids must contain integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # Shared variables are checked once, before anything is streamed
+    missing = missing_shared_variables(email_type, context)
+    if missing:
+        return Response({
+            'error': f'Missing required context variables: {", ".join(missing)}',
+            'missing_variables': missing,
+            'required_variables': list(template.required_variables)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    emails = generate_emails_bulk(email_type, recipient_rows(recipient_type, ids), context)
+    lines = (json.dumps(email) + '\n' for email in emails)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def analyze_sentiment_view(request):
@@ -110,6 +194,134 @@ def analyze_sentiment_view(request):
     return Response(result)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def analyze_sentiment_batch_view(request):
+    """
+    Analyze the sentiment of many texts in one request.
+    
+    Large batches are spread over a pool of worker processes (see
+    sentiment_pool). Results come back in the order of the texts, each
+    shaped like the analyze-sentiment response; empty texts are neutral.
+    
+    Endpoint: POST /api/ai/analyze-sentiment/batch/
+    Payload: { "texts": ["I love this product", "Too expensive"], "detailed": false }
+    
+    Returns: { "count": 2, "results": [{"sentiment": "positive", "score": 0.5}, ...] }
+    """
+    texts = request.data.get('texts')
+    detailed = request.data.get('detailed', False)
+    max_texts = settings.AI_SENTIMENT_BATCH_MAX_TEXTS
+    
+    if not isinstance(texts, list) or not texts:
+        return Response({'error': 'texts must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(texts) > max_texts:
+        return Response({'error': f'At most {max_texts} texts per request'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(text, str) for text in texts):
+        return Response({'error': 'texts must contain strings'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = analyze_sentiment_batch(texts, detailed=bool(detailed))
+    
+    return Response({
+        'count': len(results),
+        'results': results
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sentiment_cache_stats_view(request):
+    """
+    Hit/miss counters of the sentiment cache, for sizing AI_SENTIMENT_CACHE_SIZE.
+    
+    Counters belong to the worker process that answers the request.
+    
+    Endpoint: GET /api/ai/sentiment-cache/
+    Returns: { "memory_hits": 120, "db_hits": 8, "misses": 30, "hit_rate": 0.81,
+               "memory_entries": 38, "memory_capacity": 10000, "db_entries": 950 }
+    """
+    from .models import SentimentCacheEntry
+    
+    stats = sentiment_cache.stats()
+    stats['db_entries'] = SentimentCacheEntry.objects.count()
+    return Response(stats)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def ai_metrics_view(request):
+    """
+    Calls, errors, latency and query counts of every AI function, added
+    up across all workers (see ai_features/instrumentation.py).
+    
+    Endpoint: GET /api/ai/metrics/
+    """
+    from .instrumentation import collect_metrics
+    
+    return Response(collect_metrics())
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def similar_view(request):
+    """
+    Leads similar to a lead (by company and description), or notes similar
+    to a note (by content), from the TF-IDF indexes built by
+    `manage.py build_similarity_index` (see ai_features/similarity.py).
+    
+    Endpoint: GET /api/ai/similar/?lead_id=123  (or ?note_id=456)
+              optional &limit=10 (at most AI_SIMILARITY_MAX_RESULTS)
+    """
+    from leads.models import Lead
+    from notes.models import Note
+    from .similarity import TEXT_FIELDS, IndexUnavailable, find_similar, row_text
+    
+    sources = [key for key in ('lead_id', 'note_id') if key in request.query_params]
+    if len(sources) != 1:
+        return Response({'error': 'Either lead_id or note_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        pk = int(request.query_params[sources[0]])
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        return Response({'error': f'{sources[0]} and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= limit <= settings.AI_SIMILARITY_MAX_RESULTS:
+        return Response({'error': f'limit must be between 1 and {settings.AI_SIMILARITY_MAX_RESULTS}'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    if sources[0] == 'lead_id':
+        kind, model, fields = 'lead', Lead, ('id', 'name', 'company', 'description', 'status', 'category')
+    else:
+        kind, model, fields = 'note', Note, ('id', 'content', 'lead_id', 'contact_id', 'sentiment', 'created_at')
+    try:
+        item = model.objects.values(*fields).get(pk=pk)
+    except model.DoesNotExist:
+        return Response({'error': f'{kind.capitalize()} not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    text = row_text(kind, [item[field] for field in TEXT_FIELDS[kind]])
+    try:
+        # A few more than asked, in case some were deleted since the build
+        index_meta, neighbours = find_similar(kind, pk, text, limit + 10)
+    except IndexUnavailable as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    neighbour_ids = [neighbour_id for neighbour_id, _ in neighbours]
+    rows = {row['id']: row for row in model.objects.filter(id__in=neighbour_ids).values(*fields)}
+    results = [
+        {**rows[neighbour_id], 'similarity': round(similarity, 4)}
+        for neighbour_id, similarity in neighbours if neighbour_id in rows
+    ][:limit]
+    return Response({
+        sources[0]: pk,
+        'count': len(results),
+        'results': results,
+        'index': {
+            'version': index_meta['version'],
+            'rows': index_meta['rows'],
+            'built_at': index_meta['built_at'],
+        },
+    })
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def categorize_lead_view(request):
@@ -120,6 +332,8 @@ def categorize_lead_view(request):
     Payload: { "lead_id": 123 }
     """
     from leads.models import Lead
+    from notes.rollups import get_lead_sentiment
+    from .categorization import categorize_lead, get_category_details
     
     lead_id = request.data.get('lead_id')
     if not lead_id:
@@ -131,12 +345,12 @@ def categorize_lead_view(request):
         return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
     
     # Calculate category
-    category = categorize_lead(lead)
+    category = categorize_lead(lead, sentiment=get_lead_sentiment(lead))
     category_details = get_category_details(category)
     
     # Update lead
     lead.category = category
-    lead.save()
+    lead.save(update_fields=['category', 'updated_at'])
     
     return Response({
         'lead_id': lead.id,
@@ -147,6 +361,53 @@ def categorize_lead_view(request):
     })
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def simulate_categorization_view(request):
+    """
+    Show how every lead would be categorized with other weights/thresholds.
+    
+    Nothing is saved. Lead features are loaded once per worker and reused
+    for AI_SIMULATION_CACHE_TIMEOUT seconds (see ai_features/simulation.py);
+    "refresh": true loads them again first.
+    
+    Endpoint: POST /api/ai/categorize-lead/simulate/
+    Payload: {
+        "parameters": {"score_weight": 0.6, "urgency_weight": 0.2,
+                       "engagement_weight": 0.2, "hot_threshold": 75,
+                       "warm_threshold": 40},   (any subset)
+        "moved_limit": 100,
+        "refresh": false
+    }
+    """
+    from .simulation import DEFAULT_PARAMETERS, get_features, simulate
+    
+    parameters = request.data.get('parameters', {})
+    if not isinstance(parameters, dict):
+        return Response({'error': 'parameters must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+    unknown = set(parameters) - set(DEFAULT_PARAMETERS)
+    if unknown:
+        return Response({
+            'error': f'Unknown parameters: {", ".join(sorted(unknown))}',
+            'allowed_parameters': DEFAULT_PARAMETERS
+        }, status=status.HTTP_400_BAD_REQUEST)
+    for name, value in parameters.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            return Response({'error': f'{name} must be a non-negative number'}, status=status.HTTP_400_BAD_REQUEST)
+    values = {**DEFAULT_PARAMETERS, **parameters}
+    if values['hot_threshold'] < values['warm_threshold']:
+        return Response({'error': 'hot_threshold must not be below warm_threshold'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    moved_limit = request.data.get('moved_limit', 100)
+    if isinstance(moved_limit, bool) or not isinstance(moved_limit, int) or not 0 <= moved_limit <= 1000:
+        return Response({'error': 'moved_limit must be an integer between 0 and 1000'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    features = get_features(refresh=bool(request.data.get('refresh')))
+    result = simulate(features, parameters, moved_limit)
+    result['features_loaded_at'] = features.loaded_at
+    return Response(result)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_all_ai_fields(request):
@@ -158,6 +419,10 @@ def update_all_ai_fields(request):
     Payload: { "lead_id": 123 }
     """
     from leads.models import Lead
+    from notes.rollups import get_lead_sentiment
+    from .categorization import categorize_lead, get_category_details
+    from .features import get_lead_features
+    from .lead_scoring import score_lead
     
     lead_id = request.data.get('lead_id')
     if not lead_id:
@@ -168,14 +433,12 @@ def update_all_ai_fields(request):
     except Lead.DoesNotExist:
         return Response({'error': 'Lead not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Calculate both score and category
-    score = calculate_lead_score(lead)
-    category = categorize_lead(lead)
-    
-    # Update lead
-    lead.score = score
-    lead.category = category
-    lead.save()
+    # Calculate both score and category from one feature snapshot.
+    # The new score feeds into the category, so set it first.
+    features = get_lead_features(lead)
+    lead.score = score = score_lead(lead, features)
+    lead.category = category = categorize_lead(lead, features, get_lead_sentiment(lead))
+    lead.save(update_fields=['score', 'category', 'updated_at'])
     
     return Response({
         'lead_id': lead.id,
@@ -185,3 +448,97 @@ def update_all_ai_fields(request):
         'category_details': get_category_details(category),
         'message': 'All AI fields updated successfully'
     })
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_update_ai_fields(request):
+    """
+    Update score and category for many leads in one request.
+    
+    Replaces one score-lead/categorize-lead/update-all round trip per lead.
+    Leads are scored and categorized with NumPy one chunk at a time, from
+    their precomputed features (one SELECT per chunk, plus one for the
+    chunk's sentiment rollups), and all results are saved in a single
+    transaction.
+    
+    Rough local numbers (SQLite, 2,000 leads): update-all handles about
+    100 leads/sec (one HTTP request, four COUNTs and one save per lead),
+    this view about 15,000 leads/sec.
+    
+    Endpoint: POST /api/ai/batch-update/
+    Payload: { "lead_ids": [1, 2, 3] }
+         or: { "filters": { "status": "new", "source": "website" } }
+    
+    Returns: { "count": 3, "features_filled": 0, "results": { "1": [80, "hot"], ... } }
+    features_filled counts the leads that had no stored features yet
+    (e.g. created with bulk_create), stored before scoring.
+    """
+    from leads.models import Lead
+    from leads.stats import invalidate_lead_statistics
+    from notes.rollups import get_lead_sentiments
+    from .categorization import categorize_feature_matrix, sentiment_adjustment
+    from .feature_store import fill_missing_features
+    from .lead_scoring import iter_lead_score_chunks
+    
+    lead_ids = request.data.get('lead_ids')
+    filters = request.data.get('filters')
+    
+    if lead_ids is None and filters is None:
+        return Response({'error': 'lead_ids or filters is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queryset = Lead.objects.all()
+    
+    if lead_ids is not None:
+        if not isinstance(lead_ids, list):
+            return Response({'error': 'lead_ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            lead_ids = [int(lead_id) for lead_id in lead_ids]
+        except (TypeError, ValueError):
+            return Response({'error': 'lead_ids must contain integers'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = queryset.filter(id__in=lead_ids)
+    
+    if filters is not None:
+        if not isinstance(filters, dict):
+            return Response({'error': 'filters must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = set(filters) - set(BATCH_FILTER_FIELDS)
+        if unknown:
+            return Response({
+                'error': f'Unsupported filter fields: {", ".join(sorted(unknown))}',
+                'allowed_filters': BATCH_FILTER_FIELDS
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = queryset.filter(**filters)
+        except (FieldError, ValidationError, TypeError, ValueError) as e:
+            return Response({'error': f'Invalid filters: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    results = {}
+    now = timezone.now()
+    
+    with transaction.atomic():
+        filled = fill_missing_features(queryset)
+        for chunk in iter_lead_score_chunks(queryset, BATCH_CHUNK_SIZE):
+            sentiments = get_lead_sentiments(chunk['ids'].tolist())
+            categories = categorize_feature_matrix(
+                chunk['scores'], chunk['features'].matrix,
+                [sentiment_adjustment(sentiments.get(pk), now) for pk in chunk['ids'].tolist()]
+            )
+            # Scores and categories take few distinct values, so one UPDATE per
+            # (score, category) pair is far cheaper than a per-row CASE expression
+            groups = defaultdict(list)
+            for pk, score, category in zip(chunk['ids'].tolist(), chunk['scores'].tolist(), categories.tolist()):
+                groups[(score, category)].append(pk)
+                results[str(pk)] = [score, category]
+            
+            for (score, category), pks in groups.items():
+                Lead.objects.filter(pk__in=pks).update(score=score, category=category)
+        
+        # queryset.update() sends no signals
+        invalidate_lead_statistics()
+    
+    return Response({
+        'count': len(results),
+        'features_filled': filled,
+        'results': results,
+        'message': 'AI fields updated successfully'
+    })
@@ -0,0 +1,72 @@
+"""
+Warm-up hook for the AI libraries.
+
+The AI modules load NumPy, scikit-learn and TextBlob on first use, so
+workers that never serve an AI request never pay for them. A server that
+would rather pay once at startup than on the first AI request calls
+warm_up() instead.
+
+With a pre-fork server, call it in the master before the workers are
+forked, so they share the loaded modules (copy-on-write) instead of each
+loading them. With gunicorn, set AI_WARM_UP=1 and start it with
+--preload: crm_project/wsgi.py then calls warm_up() in the master.
+
+With AI_INFERENCE_SOCKET set and the inference server running, the
+sentiment engine and the model are left to the server (see inference.py).
+
+warm_up() never touches the database, so no connection is opened in the
+master and inherited by the workers.
+"""
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def warm_up():
+    """
+    Import the AI libraries and load their data.
+    
+    Returns:
+        dict: seconds spent per step
+    """
+    from django.conf import settings
+    
+    timings = {}
+    
+    started = time.perf_counter()
+    from . import categorization, features, lead_scoring  # noqa: F401 (NumPy)
+    timings['numpy'] = time.perf_counter() - started
+    
+    # With a running inference server, the models stay there
+    server_up = False
+    if settings.AI_INFERENCE_SOCKET:
+        from .inference import InferenceUnavailable, server_status
+        started = time.perf_counter()
+        try:
+            server_status()
+            server_up = True
+        except InferenceUnavailable:
+            pass  # Already logged, the models are loaded here
+        timings['inference_server'] = time.perf_counter() - started
+    
+    from .sentiment_engines import get_engine
+    engine = get_engine()
+    if not (server_up and engine.heavy):
+        started = time.perf_counter()
+        # The sentiment lexicon is only read on the first analysis
+        engine.load()
+        timings['sentiment'] = time.perf_counter() - started
+    
+    if settings.AI_LEAD_SCORING_BACKEND == 'ml' and not server_up:
+        from .ml_scoring import ModelUnavailable, model_cache
+        started = time.perf_counter()
+        try:
+            model_cache.get()
+        except ModelUnavailable:
+            pass  # Already logged, scoring falls back to rules
+        timings['model'] = time.perf_counter() - started
+    
+    logger.info('AI warm-up done: %s', ', '.join(f'{name} {seconds:.2f}s' for name, seconds in timings.items()))
+    return timings
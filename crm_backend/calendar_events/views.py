@@ -18,7 +18,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
     CRUD operations for Calendar Events.
     Includes filtering by date range and special actions for 'today', 'upcoming', and 'my_events'.
     """
-    queryset = CalendarEvent.objects.all()
+    queryset = CalendarEvent.objects.select_related('organizer').prefetch_related('attendees', 'reminders')
     serializer_class = CalendarEventSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -51,7 +51,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
     def today(self, request):
         """Get today's events for the dashboard"""
         today = timezone.now().date()
-        events = CalendarEvent.objects.filter(
+        events = self.queryset.filter(
             start_time__date=today
         ).order_by('start_time')
         serializer = self.get_serializer(events, many=True)
@@ -62,7 +62,7 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
         """Get upcoming events (next 7 days) for the dashboard"""
         now = timezone.now()
         week_later = now + timedelta(days=7)
-        events = CalendarEvent.objects.filter(
+        events = self.queryset.filter(
             start_time__gte=now,
             start_time__lte=week_later
         ).order_by('start_time')
@@ -74,9 +74,9 @@ class CalendarEventViewSet(viewsets.ModelViewSet):
         """
         Get events where current user is organizer OR attendee.
         """
-        events = CalendarEvent.objects.filter(
+        events = self.queryset.filter(
             organizer=request.user
-        ) | CalendarEvent.objects.filter(
+        ) | self.queryset.filter(
             attendees=request.user
         )
         events = events.distinct().order_by('start_time')
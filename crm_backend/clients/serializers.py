@@ -43,7 +43,7 @@ class ClientSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at', 'created_by']
     
     def get_project_count(self, obj):
-        return obj.projects.count()
+        return len(obj.projects.all())
     
     def get_total_project_value(self, obj):
         total = sum(project.budget or 0 for project in obj.projects.all())
@@ -66,4 +66,7 @@ class ClientListSerializer(serializers.ModelSerializer):
         ]
     
     def get_project_count(self, obj):
+        # Annotated by ClientViewSet.get_queryset
+        if hasattr(obj, 'num_projects'):
+            return obj.num_projects
         return obj.projects.count()
@@ -3,7 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, Sum, Q, Prefetch
 from datetime import datetime, timedelta
 from .models import Client, ClientProject, ClientInteraction
 from .serializers import (
@@ -16,7 +16,10 @@ class ClientViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Client CRUD operations
     """
-    queryset = Client.objects.all()
+    queryset = Client.objects.select_related('account_manager', 'created_by').prefetch_related(
+        Prefetch('projects', queryset=ClientProject.objects.select_related('project_manager')),
+        Prefetch('interactions', queryset=ClientInteraction.objects.select_related('user')),
+    )
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'industry_type', 'account_manager']
@@ -29,6 +32,14 @@ class ClientViewSet(viewsets.ModelViewSet):
             return ClientListSerializer
         return ClientSerializer
     
+    def get_queryset(self):
+        if self.action == 'list':
+            # ClientListSerializer only needs the account manager and a project count
+            return Client.objects.select_related('account_manager').annotate(
+                num_projects=Count('projects')
+            )
+        return super().get_queryset()
+    
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
     
@@ -95,7 +106,7 @@ class ClientViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def high_value(self, request):
         """Get high-value clients (top 20% by contract value)"""
-        clients = Client.objects.filter(
+        clients = self.get_queryset().filter(
             contract_value__isnull=False,
             status='active'
         ).order_by('-contract_value')[:10]
@@ -106,7 +117,7 @@ class ClientViewSet(viewsets.ModelViewSet):
     def long_term(self, request):
         """Get long-term clients (contract duration > 1 year)"""
         one_year_ago = datetime.now().date() - timedelta(days=365)
-        clients = Client.objects.filter(
+        clients = self.get_queryset().filter(
             contract_start_date__lte=one_year_ago,
             status='active'
         )
@@ -118,7 +129,7 @@ class ClientProjectViewSet(viewsets.ModelViewSet):
     """
     ViewSet for ClientProject CRUD operations
     """
-    queryset = ClientProject.objects.all()
+    queryset = ClientProject.objects.select_related('project_manager')
     serializer_class = ClientProjectSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -132,7 +143,7 @@ class ClientInteractionViewSet(viewsets.ModelViewSet):
     """
     ViewSet for ClientInteraction CRUD operations
     """
-    queryset = ClientInteraction.objects.all()
+    queryset = ClientInteraction.objects.select_related('user')
     serializer_class = ClientInteractionSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
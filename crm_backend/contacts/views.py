@@ -22,7 +22,7 @@ class ContactViewSet(viewsets.ModelViewSet):
     Filtering:
     - GET /api/contacts/?lead_id=123 - Get contacts for specific lead
     """
-    queryset = Contact.objects.all()
+    queryset = Contact.objects.select_related('lead')
     serializer_class = ContactSerializer
     permission_classes = [IsAuthenticated]
     
@@ -31,7 +31,7 @@ class ContactViewSet(viewsets.ModelViewSet):
         Custom queryset to allow filtering by lead_id.
         Useful for showing "Contacts" tab on a Lead detail page.
         """
-        queryset = Contact.objects.all()
+        queryset = super().get_queryset()
         
         # Check for 'lead_id' query parameter
         lead_id = self.request.query_params.get('lead_id', None)
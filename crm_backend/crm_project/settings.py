@@ -157,3 +157,111 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+
+# AI lead scoring
+# 'rules' = weighted rule-based scoring, 'ml' = trained scikit-learn model
+# (falls back to rules when the model artifact is missing or unusable)
+AI_LEAD_SCORING_BACKEND = os.getenv('AI_LEAD_SCORING_BACKEND', 'rules')
+AI_LEAD_MODEL_PATH = os.getenv('AI_LEAD_MODEL_PATH', str(BASE_DIR / 'ml_models' / 'lead_score_model.pkl'))
+# Seconds between checks of the model file for a new version
+AI_LEAD_MODEL_RELOAD_INTERVAL = 5
+
+# Note sentiment in the lead categorization (see
+# ai_features/categorization.py sentiment_adjustment): points added to the
+# final score per unit of mean note polarity (-1 to 1), and taken off when a
+# negative note was written in the last two weeks. These are hand-picked
+# starting values, not fitted on conversion data; 10 moves a lead by a third
+# of the warm band (40-70). 0 (the default) leaves the categorization as it
+# was without sentiment. When set, leads are recategorized as their notes
+# are analyzed (see notes/rollups.py).
+AI_CATEGORY_SENTIMENT_POINTS = float(os.getenv('AI_CATEGORY_SENTIMENT_POINTS', 0))
+AI_CATEGORY_RECENT_NEGATIVE_PENALTY = float(os.getenv('AI_CATEGORY_RECENT_NEGATIVE_PENALTY', 0))
+
+# Seconds the dashboard lead statistics may be served from the cache.
+# Writes invalidate them earlier (see leads/stats.py).
+LEAD_STATISTICS_CACHE_TIMEOUT = 300
+
+# Batch sentiment analysis (see ai_features/sentiment_pool.py)
+# Processes analyzing large batches in parallel, per web worker; 1 disables the pool
+AI_SENTIMENT_WORKERS = int(os.getenv('AI_SENTIMENT_WORKERS', os.cpu_count() or 1))
+# Smaller batches are analyzed in the web worker itself
+AI_SENTIMENT_POOL_MIN_TEXTS = 50
+# Largest batch accepted by /api/ai/analyze-sentiment/batch/
+AI_SENTIMENT_BATCH_MAX_TEXTS = 5000
+# Sentiment scores kept in each worker's memory, in front of the
+# ai_sentiment_cache table (see ai_features/sentiment_cache.py)
+AI_SENTIMENT_CACHE_SIZE = 10000
+# Shorter single texts are only cached in memory
+AI_SENTIMENT_CACHE_DB_MIN_LENGTH = 300
+
+# Note sentiment is analyzed by `manage.py process_note_sentiment` workers
+# (see notes/sentiment_queue.py); False analyzes it during the request
+NOTE_SENTIMENT_ASYNC = True
+# Seconds before a note claimed by a worker that died can be claimed again
+NOTE_SENTIMENT_CLAIM_TIMEOUT = 300
+
+# Load NumPy/TextBlob/the scoring model when the WSGI app starts instead of
+# on first use (see ai_features/warmup.py)
+AI_WARM_UP = os.getenv('AI_WARM_UP', '') == '1'
+
+# Compiled email templates kept per process (see emails/rendering.py)
+EMAIL_TEMPLATE_CACHE_SIZE = 500
+# Largest number of recipients of one template preview
+EMAIL_TEMPLATE_PREVIEW_MAX_RECIPIENTS = 1000
+
+# Seconds the lead features of the categorization simulator are reused
+# before they are read again (see ai_features/simulation.py)
+AI_SIMULATION_CACHE_TIMEOUT = 300
+
+# Call counts, latency histograms and query counts of the AI functions
+# (see ai_features/instrumentation.py). Every worker writes its totals to
+# its own file in AI_METRICS_DIR; /api/ai/metrics/ adds them up.
+AI_METRICS_ENABLED = os.getenv('AI_METRICS_ENABLED', '1') == '1'
+AI_METRICS_DIR = os.getenv('AI_METRICS_DIR', str(BASE_DIR / 'ai_metrics'))
+# Seconds between two writes of a worker's metrics file
+AI_METRICS_FLUSH_INTERVAL = 10
+
+# Sentiment engine (see ai_features/sentiment_engines.py): 'textblob' or
+# 'lexicon', a faster rule-based scorer using the same lexicon. Run
+# `manage.py reanalyze_notes` after switching to rescore existing notes.
+AI_SENTIMENT_ENGINE = os.getenv('AI_SENTIMENT_ENGINE', 'textblob')
+
+# Optional AI inference server (`manage.py run_inference_server`, see
+# ai_features/inference.py) holding TextBlob and the lead scoring model for
+# all workers. Empty: every worker loads them itself.
+AI_INFERENCE_SOCKET = os.getenv('AI_INFERENCE_SOCKET', '')
+# Seconds to wait for an answer before working in process
+AI_INFERENCE_TIMEOUT = 30
+# Seconds before a server that did not answer is tried again
+AI_INFERENCE_RETRY_INTERVAL = 10
+
+# Similar leads/notes (see ai_features/similarity.py), built and updated
+# by `manage.py build_similarity_index`
+AI_SIMILARITY_INDEX_DIR = os.getenv('AI_SIMILARITY_INDEX_DIR', str(BASE_DIR / 'ai_index'))
+# Largest vocabulary of the TF-IDF vectorizers
+AI_SIMILARITY_MAX_FEATURES = 50000
+# An update builds the index in full when it is older than this many
+# seconds, or when appends grew it by more than this fraction
+AI_SIMILARITY_REBUILD_INTERVAL = 24 * 60 * 60
+AI_SIMILARITY_REBUILD_FRACTION = 0.2
+# Largest limit of /api/ai/similar/
+AI_SIMILARITY_MAX_RESULTS = 50
+
+# Email backend; e.g. django.core.mail.backends.locmem.EmailBackend or
+# django.core.mail.backends.filebased.EmailBackend (with EMAIL_FILE_PATH) to
+# try campaigns without sending anything
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
+
+# Email campaigns are delivered by `manage.py send_campaigns` workers (see
+# emails/delivery.py); False delivers them during the send_campaign request
+EMAIL_CAMPAIGN_ASYNC = True
+# Recipients rendered, sent and recorded at a time
+EMAIL_CAMPAIGN_CHUNK_SIZE = 500
+# Messages per second per delivering worker, 0 for no limit
+EMAIL_CAMPAIGN_RATE = float(os.getenv('EMAIL_CAMPAIGN_RATE', '50'))
+# Seconds without progress before another worker takes a campaign over;
+# keep it above the time of one chunk (EMAIL_CAMPAIGN_CHUNK_SIZE / EMAIL_CAMPAIGN_RATE)
+EMAIL_CAMPAIGN_CLAIM_TIMEOUT = 300
+# Failed deliveries in a row (the worker raised) before a campaign is paused
+EMAIL_CAMPAIGN_MAX_ATTEMPTS = 3
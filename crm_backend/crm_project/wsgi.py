@@ -5,8 +5,15 @@ It exposes the WSGI callable as a module-level variable named ``application``.
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crm_project.settings')
 
 application = get_wsgi_application()
+
+# Load the AI libraries now rather than on the first AI request.
+# Under gunicorn --preload this runs once in the master, before forking.
+if settings.AI_WARM_UP:
+    from ai_features.warmup import warm_up
+    warm_up()
@@ -19,7 +19,7 @@ class DealViewSet(viewsets.ModelViewSet):
     - PUT /api/deals/{id}/ - Update deal
     - DELETE /api/deals/{id}/ - Delete deal
     """
-    queryset = Deal.objects.all()
+    queryset = Deal.objects.select_related('lead', 'created_by')
     serializer_class = DealSerializer
     permission_classes = [IsAuthenticated]
     
@@ -31,6 +31,34 @@ class DocumentSerializer(serializers.ModelSerializer):
                            'download_count', 'view_count']
 
 
+class FolderListSerializer(serializers.ListSerializer):
+    """
+    Loads the parents of all folders one level at a time, so full_path
+    costs one query per nesting level instead of one per folder.
+    """
+    
+    def to_representation(self, data):
+        folders = list(data.all() if hasattr(data, 'all') else data)
+        parent_field = Folder._meta.get_field('parent')
+        
+        level = folders
+        while level:
+            missing = {f.parent_id for f in level if f.parent_id and not parent_field.is_cached(f)}
+            parents = Folder.objects.in_bulk(missing) if missing else {}
+            next_level = []
+            for folder in level:
+                if folder.parent_id is None:
+                    continue
+                if not parent_field.is_cached(folder):
+                    if folder.parent_id not in parents:
+                        continue  # Deleted meanwhile
+                    folder.parent = parents[folder.parent_id]
+                next_level.append(folder.parent)
+            level = next_level
+        
+        return super().to_representation(folders)
+
+
 class FolderSerializer(serializers.ModelSerializer):
     owner_name = serializers.CharField(source='owner.get_full_name', read_only=True)
     full_path = serializers.CharField(read_only=True)
@@ -40,6 +68,7 @@ class FolderSerializer(serializers.ModelSerializer):
         model = Folder
         fields = '__all__'
         read_only_fields = ['created_at', 'updated_at']
+        list_serializer_class = FolderListSerializer
     
     def get_subfolder_count(self, obj):
         return obj.subfolders.count()
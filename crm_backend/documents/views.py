@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Prefetch
 from django.http import FileResponse
 from .models import Document, DocumentCategory, DocumentAccess, DocumentComment, Folder
 from .serializers import (
@@ -20,7 +21,10 @@ class DocumentCategoryViewSet(viewsets.ModelViewSet):
 
 class DocumentViewSet(viewsets.ModelViewSet):
     """ViewSet for Documents"""
-    queryset = Document.objects.all()
+    queryset = Document.objects.select_related('uploaded_by', 'category').prefetch_related(
+        'shared_with',
+        Prefetch('comments', queryset=DocumentComment.objects.select_related('user')),
+    )
     serializer_class = DocumentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -95,21 +99,22 @@ class DocumentViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_documents(self, request):
         """Get current user's documents"""
-        documents = Document.objects.filter(uploaded_by=request.user)
+        documents = self.get_queryset().filter(uploaded_by=request.user)
         serializer = self.get_serializer(documents, many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def shared_with_me(self, request):
         """Get documents shared with current user"""
-        documents = Document.objects.filter(shared_with=request.user)
+        documents = self.get_queryset().filter(shared_with=request.user)
         serializer = self.get_serializer(documents, many=True)
         return Response(serializer.data)
 
 
 class FolderViewSet(viewsets.ModelViewSet):
     """ViewSet for Folders"""
-    queryset = Folder.objects.all()
+    # Parents beyond the first level are loaded by FolderListSerializer
+    queryset = Folder.objects.select_related('owner', 'parent').prefetch_related('shared_with', 'subfolders')
     serializer_class = FolderSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -122,6 +127,6 @@ class FolderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def my_folders(self, request):
         """Get current user's folders"""
-        folders = Folder.objects.filter(owner=request.user, parent=None)
+        folders = self.get_queryset().filter(owner=request.user, parent=None)
         serializer = self.get_serializer(folders, many=True)
         return Response(serializer.data)
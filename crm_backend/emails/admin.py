@@ -26,8 +26,10 @@ class EmailAttachmentAdmin(admin.ModelAdmin):
 
 @admin.register(EmailCampaign)
 class EmailCampaignAdmin(admin.ModelAdmin):
-    list_display = ['name', 'status', 'recipient_count', 'sent_count', 'opened_count', 'created_at']
+    list_display = ['name', 'status', 'recipient_count', 'sent_count', 'failed_count', 'opened_count', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['name', 'subject']
     readonly_fields = ['created_at', 'updated_at', 'sent_count', 'delivered_count', 
-                      'opened_count', 'clicked_count', 'bounced_count']
+                      'opened_count', 'clicked_count', 'bounced_count', 'failed_count',
+                      'skipped_count', 'last_recipient_id', 'claimed_by', 'claimed_at',
+                      'delivery_attempts', 'last_error']
@@ -0,0 +1,263 @@
+"""
+Delivery of email campaigns.
+
+The send_campaign action (emails/views.py) selects the recipients and
+queues the campaign (status 'sending'); `manage.py send_campaigns`
+workers then deliver it. With EMAIL_CAMPAIGN_ASYNC = False the request
+delivers it itself.
+
+A delivery walks the recipients in id order, EMAIL_CAMPAIGN_CHUNK_SIZE at
+a time (keyset pagination from last_recipient_id, one query per chunk):
+    1. render the chunk's messages (rendering.render_many); recipients
+       lacking a placeholder value are skipped and counted
+    2. send them through one backend connection, opened once for the
+       whole delivery, at most EMAIL_CAMPAIGN_RATE messages per second
+    3. record the chunk in one transaction: one bulk_create of the Email
+       rows ('sent' or 'failed') and one UPDATE of the campaign counters
+       and last_recipient_id
+
+Messages are handed to the backend one send_messages() call each, so a
+refused recipient fails alone and is recorded as such.
+
+Between chunks the campaign is read again: pausing or cancelling it
+stops the delivery, and a paused campaign resumes after
+last_recipient_id. A campaign is claimed by one worker at a time (the
+same conditional UPDATE as the note sentiment queue). A worker that
+dies keeps its claim for EMAIL_CAMPAIGN_CLAIM_TIMEOUT seconds, then
+another worker resumes the campaign; only the chunk in progress can be
+sent twice.
+
+A delivery that raises (broken filter data, the mail server refusing
+connections, a failed write) releases the campaign for another attempt
+(release_failed_delivery). After EMAIL_CAMPAIGN_MAX_ATTEMPTS failures in
+a row, with no chunk recorded in between, the campaign is paused with the
+error in last_error, rather than retried (and its current chunk re-sent)
+forever. Resuming it starts a new series of attempts.
+"""
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Email, EmailCampaign
+from .rendering import CompiledEmailTemplate, recipient_source, render_many
+
+
+logger = logging.getLogger(__name__)
+
+# Lookups allowed in EmailCampaign.recipient_filters, per recipient type
+RECIPIENT_FILTER_FIELDS = {
+    'lead': ['status', 'source', 'category', 'assigned_to'],
+    'contact': ['lead', 'is_primary', 'lead__status', 'lead__source', 'lead__category'],
+}
+
+# Field values of a campaign nobody is delivering
+UNCLAIMED_FIELDS = {
+    'claimed_by': '',
+    'claimed_at': None,
+}
+
+
+def new_worker_id():
+    """Unique name of a delivery worker, stored in EmailCampaign.claimed_by"""
+    return f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def recipient_queryset(campaign):
+    """
+    Leads or contacts the campaign is sent to.
+    
+    Raises:
+        ValueError: unknown recipient type
+        FieldError, ValidationError, ValueError: invalid filter value
+            (raised when the queryset is evaluated)
+    """
+    model, _ = recipient_source(campaign.recipient_type)
+    return model.objects.filter(**campaign.recipient_filters).exclude(email='')
+
+
+def _claimable():
+    expired = timezone.now() - timedelta(seconds=settings.EMAIL_CAMPAIGN_CLAIM_TIMEOUT)
+    return Q(status='sending') & (Q(claimed_by='') | Q(claimed_at__lt=expired))
+
+
+def claim_campaign(worker_id, campaign_id=None):
+    """
+    Claim a campaign waiting to be delivered.
+    
+    Args:
+        campaign_id: Only this campaign (default: the oldest waiting one)
+    
+    Returns:
+        EmailCampaign claimed by worker_id, or None
+    """
+    candidates = EmailCampaign.objects.filter(_claimable())
+    if campaign_id is not None:
+        candidates = candidates.filter(pk=campaign_id)
+    candidate = candidates.order_by('id').values_list('id', flat=True).first()
+    if candidate is None:
+        return None
+    
+    claimed = EmailCampaign.objects.filter(_claimable(), pk=candidate).update(
+        claimed_by=worker_id, claimed_at=timezone.now()
+    )
+    if not claimed:
+        return None  # Another worker was faster
+    return EmailCampaign.objects.get(pk=candidate)
+
+
+class Throttle:
+    """Spaces calls to wait() 1/rate seconds apart (no limit for rate 0)"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_at = time.monotonic()
+    
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if self.next_at > now:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        # A sender that fell behind does not burst to catch up
+        self.next_at = now + self.interval
+
+
+def release_failed_delivery(campaign_id, worker_id, error):
+    """
+    Count a failed delivery and release the campaign, or pause it after
+    EMAIL_CAMPAIGN_MAX_ATTEMPTS failures in a row.
+    
+    Returns:
+        str: the campaign status ('sending' or 'paused'), or None when
+        worker_id no longer held the claim
+    """
+    claim = EmailCampaign.objects.filter(pk=campaign_id, claimed_by=worker_id)
+    with transaction.atomic():
+        if not claim.update(delivery_attempts=F('delivery_attempts') + 1, last_error=str(error) or repr(error)):
+            return None
+        claim.filter(status='sending', delivery_attempts__gte=settings.EMAIL_CAMPAIGN_MAX_ATTEMPTS).update(status='paused')
+        status = claim.values_list('status', flat=True).first()
+        claim.update(**UNCLAIMED_FIELDS)
+    return status
+
+
+def _send(connection, message):
+    """
+    Hand one message to the backend.
+    
+    A failure may have broken the connection (e.g. the SMTP server hung
+    up), so the message is tried once more on a new one.
+    
+    Returns:
+        bool: True when the backend accepted the message
+    """
+    try:
+        return connection.send_messages([message]) == 1
+    except Exception as e:
+        logger.warning('Sending to %s failed (%s), retrying on a new connection', message.to, e)
+    
+    connection.close()
+    try:
+        connection.open()
+        return connection.send_messages([message]) == 1
+    except Exception as e:
+        logger.error('Sending to %s failed: %s', message.to, e)
+        return False
+
+
+def deliver_campaign(campaign, worker_id, connection=None, chunk_size=None, rate=None, should_stop=None):
+    """
+    Send a claimed campaign to its remaining recipients.
+    
+    Args:
+        campaign: EmailCampaign claimed by worker_id (see claim_campaign)
+        connection: Email backend connection (default: get_connection())
+        chunk_size: Recipients per chunk (default: EMAIL_CAMPAIGN_CHUNK_SIZE)
+        rate: Messages per second, 0 for no limit (default: EMAIL_CAMPAIGN_RATE)
+        should_stop: Optional callable checked between chunks; when it
+            returns True the claim is released and the campaign is left
+            'sending' for another worker
+    
+    Returns:
+        dict: 'sent', 'failed' and 'skipped' by this call, and 'status',
+        the campaign status when the delivery stopped
+    """
+    chunk_size = chunk_size or settings.EMAIL_CAMPAIGN_CHUNK_SIZE
+    rate = settings.EMAIL_CAMPAIGN_RATE if rate is None else rate
+    connection = connection or get_connection()
+    
+    model, mapping = recipient_source(campaign.recipient_type)
+    content_type = ContentType.objects.get_for_model(model)
+    names = list(mapping)
+    recipients = recipient_queryset(campaign).order_by('id').values_list('id', *mapping.values())
+    compiled = CompiledEmailTemplate(campaign.subject, campaign.body)
+    from_email = settings.DEFAULT_FROM_EMAIL
+    claim = EmailCampaign.objects.filter(pk=campaign.pk, claimed_by=worker_id)
+    throttle = Throttle(rate)
+    totals = {'sent': 0, 'failed': 0, 'skipped': 0}
+    last_id = campaign.last_recipient_id
+    
+    with connection:
+        while True:
+            rows = list(recipients.filter(id__gt=last_id)[:chunk_size])
+            if not rows:
+                claim.filter(status='sending').update(status='sent', sent_at=timezone.now(), **UNCLAIMED_FIELDS)
+                status = 'sent'
+                break
+            
+            contexts = [(row[0], dict(zip(names, row[1:]))) for row in rows]
+            addresses = {key: variables['email'] for key, variables in contexts}
+            rendered = render_many(compiled, contexts)
+            
+            emails = []
+            for key, subject, body in rendered.messages:
+                throttle.wait()
+                message = EmailMessage(subject, body, from_email, [addresses[key]], connection=connection)
+                sent = _send(connection, message)
+                emails.append(Email(
+                    subject=subject, body=body, from_email=from_email, to_email=addresses[key],
+                    status='sent' if sent else 'failed', sent_at=timezone.now() if sent else None,
+                    content_type=content_type, object_id=key, template_id=campaign.template_id,
+                    sent_by_id=campaign.created_by_id, campaign=campaign,
+                ))
+            
+            sent = sum(email.status == 'sent' for email in emails)
+            counts = {'sent': sent, 'failed': len(emails) - sent, 'skipped': len(rendered.skipped)}
+            last_id = rows[-1][0]
+            with transaction.atomic():
+                Email.objects.bulk_create(emails)
+                claim.update(
+                    sent_count=F('sent_count') + counts['sent'],
+                    failed_count=F('failed_count') + counts['failed'],
+                    skipped_count=F('skipped_count') + counts['skipped'],
+                    last_recipient_id=last_id,
+                    claimed_at=timezone.now(),
+                    delivery_attempts=0,
+                    last_error='',
+                )
+            for name, count in counts.items():
+                totals[name] += count
+            
+            status = claim.values_list('status', flat=True).first()
+            if status is None:
+                logger.warning('Campaign %s was taken over by another worker after recipient %s',
+                               campaign.pk, last_id)
+                status = 'sending'
+                break
+            if status != 'sending' or (should_stop is not None and should_stop()):
+                # Paused or cancelled meanwhile, or this worker is stopping
+                claim.update(**UNCLAIMED_FIELDS)
+                break
+    
+    return {**totals, 'status': status}
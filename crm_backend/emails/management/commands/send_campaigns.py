@@ -0,0 +1,100 @@
+"""
+Management command running an email campaign delivery worker.
+
+Usage:
+    python manage.py send_campaigns
+    python manage.py send_campaigns --once --rate 0
+    python manage.py send_campaigns --campaign 12 --chunk-size 1000
+
+Claims campaigns queued by the send_campaign action (status 'sending')
+and sends them to their recipients, chunk by chunk (see
+emails/delivery.py). Without --once it keeps polling for campaigns until
+it is stopped; SIGTERM and Ctrl+C finish the current chunk first and
+leave the rest of the campaign to another worker. Several workers can
+run at the same time, each on its own campaign. A campaign whose delivery
+keeps failing is paused after EMAIL_CAMPAIGN_MAX_ATTEMPTS attempts.
+"""
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from emails.delivery import claim_campaign, deliver_campaign, new_worker_id, release_failed_delivery
+
+
+class Command(BaseCommand):
+    help = 'Send queued email campaigns in the background'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--campaign', type=int, default=None,
+            help='Only deliver this campaign'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Recipients sent and recorded at a time (default: EMAIL_CAMPAIGN_CHUNK_SIZE)'
+        )
+        parser.add_argument(
+            '--rate', type=float, default=None,
+            help='Messages per second, 0 for no limit (default: EMAIL_CAMPAIGN_RATE)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds to wait when no campaign is queued (default: 5)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit as soon as no campaign is queued'
+        )
+    
+    def handle(self, *args, **options):
+        if options['chunk_size'] is not None and options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+        if options['rate'] is not None and options['rate'] < 0:
+            raise CommandError('--rate must be 0 or more')
+        
+        worker_id = new_worker_id()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        
+        self.stdout.write(f'Worker {worker_id} started')
+        while not self.stopping:
+            campaign = claim_campaign(worker_id, options['campaign'])
+            if campaign is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            
+            self.stdout.write(f'Sending campaign {campaign.pk} "{campaign.name}" '
+                              f'from recipient {campaign.last_recipient_id}')
+            started = time.perf_counter()
+            try:
+                result = deliver_campaign(
+                    campaign, worker_id,
+                    chunk_size=options['chunk_size'], rate=options['rate'],
+                    should_stop=lambda: self.stopping,
+                )
+            except Exception as e:
+                # e.g. the mail server is down: let any worker retry later
+                status = release_failed_delivery(campaign.pk, worker_id, e)
+                self.stderr.write(f'Campaign {campaign.pk} failed: {e}')
+                if status == 'paused':
+                    self.stderr.write(f'Campaign {campaign.pk} paused after {settings.EMAIL_CAMPAIGN_MAX_ATTEMPTS} '
+                                      f'failed attempts, resume it with send_campaign')
+                time.sleep(options['poll_interval'])
+                continue
+            
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"Campaign {campaign.pk} {result['status']}: {result['sent']} sent, "
+                f"{result['failed']} failed, {result['skipped']} skipped in {elapsed:.1f}s "
+                f"({result['sent'] / elapsed if elapsed else 0:.0f} messages/s)"
+            )
+        
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} stopped'))
+    
+    def _stop(self, signum, frame):
+        self.stopping = True
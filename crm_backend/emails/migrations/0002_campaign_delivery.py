@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-17 18:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emails", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="email",
+            name="campaign",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="emails",
+                to="emails.emailcampaign",
+            ),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="recipient_type",
+            field=models.CharField(
+                choices=[("lead", "Leads"), ("contact", "Contacts")],
+                default="lead",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="recipient_filters",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                help_text='Lookups selecting the recipients, e.g. {"status": "new"}; empty for all',
+            ),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="failed_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="skipped_count",
+            field=models.IntegerField(
+                default=0, help_text="Recipients lacking a placeholder value"
+            ),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="last_recipient_id",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="claimed_by",
+            field=models.CharField(blank=True, default="", max_length=100),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
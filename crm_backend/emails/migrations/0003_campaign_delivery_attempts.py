@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("emails", "0002_campaign_delivery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="delivery_attempts",
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="emailcampaign",
+            name="last_error",
+            field=models.TextField(blank=True, default=""),
+        ),
+    ]
@@ -89,6 +89,15 @@ class Email(models.Model):
         related_name='sent_emails'
     )
     
+    # Campaign the email was sent for (see emails/delivery.py)
+    campaign = models.ForeignKey(
+        'EmailCampaign',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='emails'
+    )
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -124,7 +133,16 @@ class EmailCampaign(models.Model):
     """
     Email marketing campaigns.
     Allows sending bulk emails to a list of recipients.
+    
+    Recipients are the leads or contacts matching recipient_filters. The
+    subject and body may use the {{placeholders}} of emails/rendering.py;
+    sending is done by emails/delivery.py.
     """
+    RECIPIENT_TYPE_CHOICES = [
+        ('lead', 'Leads'),
+        ('contact', 'Contacts'),
+    ]
+    
     STATUS_CHOICES = [
         ('draft', 'Draft'),
         ('scheduled', 'Scheduled'),
@@ -144,6 +162,12 @@ class EmailCampaign(models.Model):
     sent_at = models.DateTimeField(null=True, blank=True)
     
     # Recipients (can be filtered by tags, segments, etc.)
+    recipient_type = models.CharField(max_length=10, choices=RECIPIENT_TYPE_CHOICES, default='lead')
+    recipient_filters = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Lookups selecting the recipients, e.g. {"status": "new"}; empty for all'
+    )
     recipient_count = models.IntegerField(default=0)
     
     # Campaign Statistics
@@ -152,6 +176,18 @@ class EmailCampaign(models.Model):
     opened_count = models.IntegerField(default=0)
     clicked_count = models.IntegerField(default=0)
     bounced_count = models.IntegerField(default=0)
+    failed_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0, help_text='Recipients lacking a placeholder value')
+    
+    # Delivery progress: recipients are sent in id order, up to this id so far.
+    # claimed_by/claimed_at name the delivery worker and when it last reported.
+    last_recipient_id = models.PositiveIntegerField(default=0)
+    claimed_by = models.CharField(max_length=100, blank=True, default='')
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    # Deliveries that raised since the last recorded chunk; the campaign is
+    # paused at EMAIL_CAMPAIGN_MAX_ATTEMPTS
+    delivery_attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
     
     # Template used
     template = models.ForeignKey(EmailTemplate, on_delete=models.SET_NULL, null=True, blank=True)
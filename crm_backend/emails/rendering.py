@@ -0,0 +1,248 @@
+"""
+Placeholder rendering for EmailTemplate subjects and bodies.
+
+Templates use {{name}}-style placeholders (spaces inside the braces are
+allowed: {{ name }}). Names are identifiers; anything else between
+double braces, such as {{1}}, is plain text. Django's template engine
+would work too, but it is far more than campaigns need and costs a full
+parse and render per message.
+
+Each template is compiled once into two str.format strings, so rendering
+a message is a single format_map() call per field. Compiled templates are
+cached per process by (template.id, updated_at): saving a template
+changes updated_at and the next render compiles it again.
+
+Variables a recipient lacks (missing or None) don't raise: render_many
+renders the recipients that have everything and reports the others per
+variable, so a whole campaign can be checked in one pass.
+"""
+import re
+import threading
+
+from django.conf import settings
+
+
+# Names must not start with a digit: str.format reads {1} as a positional field
+PLACEHOLDER = re.compile(r'\{\{\s*([A-Za-z_]\w*)\s*\}\}')
+
+# Template variables filled from a lead or a contact (variable -> field)
+LEAD_VARIABLES = {
+    'name': 'name',
+    'email': 'email',
+    'company': 'company',
+    'phone': 'phone',
+    'website': 'website',
+}
+CONTACT_VARIABLES = {
+    'name': 'name',
+    'email': 'email',
+    'company': 'lead__company',
+    'phone': 'phone',
+    'position': 'position',
+}
+
+
+class CompiledEmailTemplate:
+    """
+    Subject and body of an EmailTemplate, ready to render.
+    
+    Attributes:
+        variables: names of all placeholders, in order of appearance
+    """
+    __slots__ = ('variables', '_subject', '_body')
+    
+    def __init__(self, subject, body):
+        self._subject, subject_variables = _compile(subject)
+        self._body, body_variables = _compile(body)
+        self.variables = tuple(dict.fromkeys(subject_variables + body_variables))
+    
+    def missing_variables(self, context):
+        """Variables absent from context (or None there)"""
+        return [name for name in self.variables if context.get(name) is None]
+    
+    def render(self, context):
+        """
+        Render subject and body.
+        
+        Args:
+            context: dict with a value for every variable
+        
+        Returns:
+            tuple: (subject, body)
+        
+        Raises:
+            KeyError: when a variable is missing (see missing_variables)
+        """
+        return self._subject.format_map(context), self._body.format_map(context)
+
+
+def _compile(text):
+    """
+    Turn {{name}} placeholders into a str.format string.
+    
+    Returns:
+        tuple: (format string, variable names in order)
+    """
+    parts = PLACEHOLDER.split(text)
+    # split() alternates literal text and captured variable names
+    literals = [literal.replace('{', '{{').replace('}', '}}') for literal in parts[0::2]]
+    variables = parts[1::2]
+    
+    pieces = [literals[0]]
+    for name, literal in zip(variables, literals[1:]):
+        pieces.append('{' + name + '}')
+        pieces.append(literal)
+    return ''.join(pieces), variables
+
+
+class CompiledTemplateCache:
+    """
+    Compiled templates by template id, valid while updated_at is unchanged.
+    
+    One entry per template, so edits replace entries instead of piling
+    up; the oldest entry is dropped above EMAIL_TEMPLATE_CACHE_SIZE.
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, template):
+        """
+        The compiled form of an EmailTemplate (compiled now if needed).
+        
+        Unsaved templates are compiled every time.
+        """
+        if template.pk is None:
+            return CompiledEmailTemplate(template.subject, template.body)
+        
+        entry = self._entries.get(template.pk)
+        if entry is not None and entry[0] == template.updated_at:
+            self.hits += 1
+            return entry[1]
+        
+        self.misses += 1
+        compiled = CompiledEmailTemplate(template.subject, template.body)
+        with self._lock:
+            self._entries.pop(template.pk, None)
+            self._entries[template.pk] = (template.updated_at, compiled)
+            while len(self._entries) > settings.EMAIL_TEMPLATE_CACHE_SIZE:
+                # Dicts keep insertion order: the first entry is the oldest
+                del self._entries[next(iter(self._entries))]
+        return compiled
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.misses = 0
+
+
+compiled_templates = CompiledTemplateCache()
+
+
+def compile_template(template):
+    """Cached CompiledEmailTemplate of an EmailTemplate"""
+    return compiled_templates.get(template)
+
+
+class RenderResult:
+    """
+    Outcome of render_many.
+    
+    Attributes:
+        messages: list of (key, subject, body), in input order
+        missing: dict variable -> keys of the recipients lacking it
+    """
+    __slots__ = ('messages', 'missing')
+    
+    def __init__(self):
+        self.messages = []
+        self.missing = {}
+    
+    @property
+    def skipped(self):
+        """Keys of the recipients that were not rendered"""
+        return sorted({key for keys in self.missing.values() for key in keys}, key=str)
+    
+    def as_dict(self):
+        return {
+            'rendered': len(self.messages),
+            'skipped': len(self.skipped),
+            'missing_variables': self.missing,
+        }
+
+
+def render_many(template, recipients, context=None):
+    """
+    Render a template for many recipients.
+    
+    Args:
+        template: EmailTemplate or CompiledEmailTemplate
+        recipients: iterable of (key, variables dict), e.g. from
+            recipient_contexts(); key identifies the recipient in the result
+        context: variables shared by every message; the recipient's own
+            variables take precedence
+    
+    Returns:
+        RenderResult: recipients missing a variable are reported in
+        result.missing instead of being rendered
+    """
+    if not isinstance(template, CompiledEmailTemplate):
+        template = compile_template(template)
+    shared = context or {}
+    result = RenderResult()
+    
+    for key, variables in recipients:
+        values = {**shared, **variables} if shared else variables
+        missing = template.missing_variables(values)
+        if missing:
+            for name in missing:
+                result.missing.setdefault(name, []).append(key)
+            continue
+        subject, body = template.render(values)
+        result.messages.append((key, subject, body))
+    return result
+
+
+def recipient_source(recipient_type):
+    """
+    Model and template variables of a recipient type.
+    
+    Returns:
+        tuple: (Lead or Contact, variable -> field mapping)
+    
+    Raises:
+        ValueError: recipient_type is not 'lead' or 'contact'
+    """
+    if recipient_type == 'lead':
+        from leads.models import Lead
+        return Lead, LEAD_VARIABLES
+    if recipient_type == 'contact':
+        from contacts.models import Contact
+        return Contact, CONTACT_VARIABLES
+    raise ValueError(f'Unknown recipient type: {recipient_type}')
+
+
+def recipient_contexts(recipient_type, ids, chunk_size=2000):
+    """
+    Stream the template variables of leads or contacts, with one query.
+    
+    Args:
+        recipient_type: 'lead' or 'contact'
+        ids: primary keys of the recipients
+    
+    Yields:
+        tuple: (id, variables dict), by id
+    """
+    model, mapping = recipient_source(recipient_type)
+    names = list(mapping)
+    rows = (
+        model.objects.filter(id__in=ids)
+        .order_by('id')
+        .values_list('id', *mapping.values())
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield row[0], dict(zip(names, row[1:]))
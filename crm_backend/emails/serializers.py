@@ -52,5 +52,29 @@ class EmailCampaignSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmailCampaign
         fields = '__all__'
+        # Status, recipients and delivery progress only change through the
+        # send_campaign and pause_campaign actions and the delivery workers
         read_only_fields = ['created_at', 'updated_at', 'sent_count', 'delivered_count', 
-                           'opened_count', 'clicked_count', 'bounced_count', 'created_by']
+                           'opened_count', 'clicked_count', 'bounced_count', 'created_by',
+                           'status', 'sent_at', 'recipient_type', 'recipient_filters',
+                           'recipient_count', 'failed_count', 'skipped_count', 'last_recipient_id',
+                           'claimed_by', 'claimed_at', 'delivery_attempts', 'last_error']
+    
+    def validate(self, attrs):
+        """Campaigns being sent cannot be edited (pause them first)"""
+        if self.instance is not None and self.instance.status == 'sending':
+            raise serializers.ValidationError('A campaign cannot be edited while it is being sent; pause it first')
+        return attrs
+    
+    def update(self, instance, validated_data):
+        """
+        Save only the fields being edited.
+        
+        A delivery worker may start or record a chunk between loading the
+        campaign and saving it; a full save would write its stale status and
+        progress back.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
@@ -7,10 +7,12 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.exceptions import FieldError, ValidationError
 from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 from .models import EmailTemplate, Email, EmailAttachment, EmailCampaign
+from .rendering import compile_template, recipient_contexts, render_many
 from .serializers import (
     EmailTemplateSerializer, EmailSerializer,
     EmailAttachmentSerializer, EmailCampaignSerializer
@@ -22,7 +24,7 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
     CRUD operations for Email Templates.
     Templates allow users to save and reuse email content.
     """
-    queryset = EmailTemplate.objects.all()
+    queryset = EmailTemplate.objects.select_related('created_by')
     serializer_class = EmailTemplateSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -32,6 +34,58 @@ class EmailTemplateViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         """Assign creator automatically"""
         serializer.save(created_by=self.request.user)
+    
+    @action(detail=True, methods=['post'])
+    def preview(self, request, pk=None):
+        """
+        Render the template's {{placeholders}} for a list of recipients.
+        
+        Recipients missing a variable are not rendered; they are listed
+        per variable in missing_variables.
+        
+        Endpoint: POST /api/emails/templates/{id}/preview/
+        Payload: { "lead_ids": [1, 2] }  (or "contact_ids", or
+                 "recipients": [{"name": "John", "company": "Acme"}, ...])
+                 plus an optional "context" shared by every message
+        """
+        template = self.get_object()
+        compiled = compile_template(template)
+        context = request.data.get('context') or {}
+        if not isinstance(context, dict):
+            return Response({'error': 'context must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        sources = [key for key in ('lead_ids', 'contact_ids', 'recipients') if key in request.data]
+        if len(sources) != 1:
+            return Response({'error': 'One of lead_ids, contact_ids or recipients is required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        values = request.data[sources[0]]
+        if not isinstance(values, list):
+            return Response({'error': f'{sources[0]} must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(values) > settings.EMAIL_TEMPLATE_PREVIEW_MAX_RECIPIENTS:
+            return Response({'error': f'At most {settings.EMAIL_TEMPLATE_PREVIEW_MAX_RECIPIENTS} recipients per preview'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        if sources[0] == 'recipients':
+            if not all(isinstance(value, dict) for value in values):
+                return Response({'error': 'recipients must contain objects'}, status=status.HTTP_400_BAD_REQUEST)
+            recipients = enumerate(values)
+        else:
+            try:
+                ids = [int(value) for value in values]
+            except (TypeError, ValueError):
+                return Response({'error': f'{sources[0]} must contain integers'}, status=status.HTTP_400_BAD_REQUEST)
+            recipients = recipient_contexts(sources[0][:-len('_ids')], ids)
+        
+        result = render_many(compiled, recipients, context)
+        return Response({
+            'template_id': template.id,
+            'variables': list(compiled.variables),
+            **result.as_dict(),
+            'messages': [
+                {'recipient': key, 'subject': subject, 'body': body}
+                for key, subject, body in result.messages
+            ],
+        })
 
 
 class EmailViewSet(viewsets.ModelViewSet):
@@ -39,7 +93,7 @@ class EmailViewSet(viewsets.ModelViewSet):
     CRUD operations for Emails.
     Includes actions for sending and tracking emails.
     """
-    queryset = Email.objects.all()
+    queryset = Email.objects.select_related('sent_by', 'template').prefetch_related('attachments')
     serializer_class = EmailSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -139,7 +193,7 @@ class EmailCampaignViewSet(viewsets.ModelViewSet):
     """
     CRUD operations for Email Campaigns.
     """
-    queryset = EmailCampaign.objects.all()
+    queryset = EmailCampaign.objects.select_related('created_by')
     serializer_class = EmailCampaignSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
@@ -152,16 +206,111 @@ class EmailCampaignViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def send_campaign(self, request, pk=None):
         """
-        Trigger sending of an email campaign.
+        Start sending an email campaign, or resume a paused one.
+        
+        Recipients are the leads or contacts matching the campaign's
+        recipient_filters; the payload may set them first. The campaign is
+        queued ('sending') for the `manage.py send_campaigns` workers, or
+        delivered during the request when EMAIL_CAMPAIGN_ASYNC is False
+        (see emails/delivery.py).
+        
+        Endpoint: POST /api/emails/campaigns/{id}/send_campaign/
+        Payload (optional): { "recipient_type": "lead", "filters": { "status": "new" } }
         """
+        from .delivery import (
+            RECIPIENT_FILTER_FIELDS, claim_campaign, deliver_campaign, new_worker_id, recipient_queryset,
+            release_failed_delivery,
+        )
+        
         campaign = self.get_object()
+        if campaign.status not in ('draft', 'scheduled', 'paused'):
+            return Response({'error': f'Campaign is already {campaign.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        resuming = campaign.status == 'paused'
+        if resuming and ('recipient_type' in request.data or 'filters' in request.data):
+            return Response({'error': 'The recipients of a paused campaign cannot change'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        # This would typically be handled by a background task (Celery)
-        # For now, just update status to indicate it's processing
-        campaign.status = 'sending'
-        campaign.save()
+        campaign.recipient_type = request.data.get('recipient_type', campaign.recipient_type)
+        campaign.recipient_filters = request.data.get('filters', campaign.recipient_filters)
+        allowed = RECIPIENT_FILTER_FIELDS.get(campaign.recipient_type)
+        if allowed is None:
+            return Response({'error': 'recipient_type must be lead or contact'}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(campaign.recipient_filters, dict):
+            return Response({'error': 'filters must be an object'}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = set(campaign.recipient_filters) - set(allowed)
+        if unknown:
+            return Response({
+                'error': f'Unsupported filter fields: {", ".join(sorted(unknown))}',
+                'allowed_filters': allowed
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Conditional updates, so a concurrent request cannot start the
+        # campaign twice
+        if resuming:
+            # The claim is left alone: a worker still sending the chunk it
+            # had when the campaign was paused carries on after it, or has
+            # already released the claim for any worker to take
+            started = EmailCampaign.objects.filter(pk=campaign.pk, status='paused').update(
+                status='sending', delivery_attempts=0, updated_at=timezone.now()
+            )
+        else:
+            try:
+                campaign.recipient_count = recipient_queryset(campaign).count()
+            except (FieldError, ValidationError, TypeError, ValueError) as e:
+                return Response({'error': f'Invalid filters: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+            if not campaign.recipient_count:
+                return Response({'error': 'No recipients match the filters'}, status=status.HTTP_400_BAD_REQUEST)
+            started = EmailCampaign.objects.filter(pk=campaign.pk, status__in=('draft', 'scheduled')).update(
+                status='sending',
+                recipient_type=campaign.recipient_type,
+                recipient_filters=campaign.recipient_filters,
+                recipient_count=campaign.recipient_count,
+                updated_at=timezone.now(),
+            )
         
+        campaign.refresh_from_db()
+        if not started:
+            return Response({'error': f'Campaign is already {campaign.status}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not settings.EMAIL_CAMPAIGN_ASYNC:
+            worker_id = new_worker_id()
+            claimed = claim_campaign(worker_id, campaign.pk)
+            if claimed is not None:
+                try:
+                    deliver_campaign(claimed, worker_id)
+                except Exception as e:
+                    # Counted like a worker's failure, see release_failed_delivery
+                    release_failed_delivery(campaign.pk, worker_id, e)
+                campaign.refresh_from_db()
+        
+        if campaign.status == 'sent':
+            message = 'Campaign sent'
+        elif campaign.delivery_attempts:
+            message = f'Delivery failed: {campaign.last_error}'
+        else:
+            message = 'Campaign is being sent'
+        return Response({
+            'status': 'success',
+            'message': message,
+            'campaign': self.get_serializer(campaign).data,
+        })
+    
+    @action(detail=True, methods=['post'])
+    def pause_campaign(self, request, pk=None):
+        """
+        Stop sending a campaign after the current chunk of recipients.
+        send_campaign resumes it where it stopped.
+        
+        Endpoint: POST /api/emails/campaigns/{id}/pause_campaign/
+        """
+        campaign = self.get_object()
+        if not EmailCampaign.objects.filter(pk=campaign.pk, status='sending').update(status='paused'):
+            return Response({'error': f'Campaign is {campaign.status}, not sending'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        campaign.refresh_from_db()
         return Response({
             'status': 'success',
-            'message': 'Campaign is being sent'
+            'message': 'Campaign paused',
+            'campaign': self.get_serializer(campaign).data,
         })
@@ -14,7 +14,7 @@ class LeadAdmin(admin.ModelAdmin):
     list_filter = ['status', 'category', 'source', 'created_at']
     search_fields = ['name', 'email', 'company']
     ordering = ['-created_at']
-    readonly_fields = ['score', 'category', 'created_at', 'updated_at']
+    readonly_fields = ['score', 'category', 'contact_count', 'deal_count', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Basic Information', {
@@ -24,7 +24,7 @@ class LeadAdmin(admin.ModelAdmin):
             'fields': ('status', 'source', 'description', 'assigned_to')
         }),
         ('AI Generated Fields', {
-            'fields': ('score', 'category'),
+            'fields': ('score', 'category', 'contact_count', 'deal_count'),
             'description': 'These fields are automatically generated by AI'
         }),
         ('Timestamps', {
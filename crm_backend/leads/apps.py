@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LeadsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'leads'
+    
+    def ready(self):
+        # Register signal handlers that maintain the engagement counters
+        from . import signals  # noqa: F401
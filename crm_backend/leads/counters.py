@@ -0,0 +1,61 @@
+"""
+Helpers to compare Lead.contact_count / Lead.deal_count with the real
+number of related rows. Used by the backfill_lead_counters and
+check_lead_counters management commands.
+"""
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def annotate_actual_counts(queryset):
+    """
+    Annotate actual_contact_count and actual_deal_count onto a Lead queryset.
+    
+    Uses correlated subqueries rather than two JOIN + COUNT(DISTINCT),
+    so rows are never multiplied by contacts x deals.
+    """
+    from contacts.models import Contact
+    from deals.models import Deal
+    
+    def _count(model):
+        related = (
+            model.objects.filter(lead=OuterRef('pk'))
+            .order_by()
+            .values('lead')
+            .annotate(n=Count('pk'))
+            .values('n')
+        )
+        return Coalesce(Subquery(related, output_field=IntegerField()), 0)
+    
+    return queryset.annotate(
+        actual_contact_count=_count(Contact),
+        actual_deal_count=_count(Deal),
+    )
+
+
+def iter_counter_drift(queryset, chunk_size=2000):
+    """
+    Find leads whose stored counters disagree with the related tables.
+    
+    Walks the queryset in primary key order, one query per chunk.
+    
+    Yields:
+        dict: id, contact_count, actual_contact_count, deal_count,
+              actual_deal_count for every drifted lead
+    """
+    fields = ('id', 'contact_count', 'actual_contact_count', 'deal_count', 'actual_deal_count')
+    queryset = annotate_actual_counts(queryset.order_by('pk'))
+    last_id = 0
+    
+    while True:
+        rows = list(queryset.filter(pk__gt=last_id).values_list(*fields)[:chunk_size])
+        if not rows:
+            return
+        
+        for row in rows:
+            drift = dict(zip(fields, row))
+            if (drift['contact_count'] != drift['actual_contact_count']
+                    or drift['deal_count'] != drift['actual_deal_count']):
+                yield drift
+        
+        last_id = rows[-1][0]
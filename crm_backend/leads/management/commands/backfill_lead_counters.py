@@ -0,0 +1,52 @@
+"""
+Management command to recompute Lead.contact_count / Lead.deal_count.
+
+Usage:
+    python manage.py backfill_lead_counters
+    python manage.py backfill_lead_counters --dry-run
+
+Only leads whose counters drifted are written, and their AI score and
+category are refreshed from the corrected counts.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from leads.counters import iter_counter_drift
+from leads.models import Lead
+from leads.signals import refresh_lead_ai_fields
+
+
+class Command(BaseCommand):
+    help = 'Recompute lead contact/deal counters from the related tables'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of leads checked per query (default: 2000)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many leads would change without saving'
+        )
+    
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed = []
+        
+        for drift in iter_counter_drift(Lead.objects.all(), chunk_size):
+            fixed.append(Lead(
+                pk=drift['id'],
+                contact_count=drift['actual_contact_count'],
+                deal_count=drift['actual_deal_count'],
+            ))
+        
+        if options['dry_run']:
+            self.stdout.write(f'{len(fixed)} leads would be updated')
+            return
+        
+        with transaction.atomic():
+            Lead.objects.bulk_update(fixed, ['contact_count', 'deal_count'], batch_size=chunk_size)
+            for lead in fixed:
+                refresh_lead_ai_fields(lead.pk)
+        
+        self.stdout.write(self.style.SUCCESS(f'Updated counters for {len(fixed)} leads'))
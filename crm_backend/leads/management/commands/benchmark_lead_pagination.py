@@ -0,0 +1,83 @@
+"""
+Management command comparing page number and cursor pagination of leads.
+
+Usage:
+    python manage.py benchmark_lead_pagination
+    python manage.py benchmark_lead_pagination --depths 1 100 2000 --page-size 50
+
+For every depth, the same page of the leads list is fetched through both
+paginators (the ones LeadViewSet uses) and the average latency is printed.
+Page number pagination gets slower with depth (COUNT(*) + OFFSET), cursor
+pagination should stay flat.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from leads.models import Lead
+from leads.pagination import LeadCursorPagination
+
+
+class Command(BaseCommand):
+    help = 'Measure leads list latency at increasing page depths'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--depths', type=int, nargs='+', default=[1, 10, 100, 1000, 2000],
+            help='Page numbers to fetch (default: 1 10 100 1000 2000)'
+        )
+        parser.add_argument(
+            '--page-size', type=int, default=10,
+            help='Leads per page (default: 10)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Fetches per measurement (default: 5)'
+        )
+    
+    def handle(self, *args, **options):
+        page_size = options['page_size']
+        total = Lead.objects.count()
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        
+        self.stdout.write(f'{total} leads, {page_size} per page')
+        self.stdout.write(f'{"page":>8} {"page number":>14} {"cursor":>10}')
+        
+        for depth in options['depths']:
+            offset = (depth - 1) * page_size
+            if offset >= total:
+                raise CommandError(f'Page {depth} is past the last lead')
+            
+            numbered = self._time(
+                PageNumberPagination,
+                factory.get('/api/leads/', {'page': depth, 'page_size': page_size}),
+                options['repeat'],
+            )
+            
+            params = {'pagination': 'cursor', 'page_size': page_size}
+            if depth > 1:
+                # Cursor of the previous page's last row, as a client would
+                # have received it (looked up once, outside the timing)
+                last = Lead.objects.order_by('-created_at', '-id')[offset - 1]
+                params['cursor'] = LeadCursorPagination().cursor_for(last)
+            cursor = self._time(
+                LeadCursorPagination,
+                factory.get('/api/leads/', params),
+                options['repeat'],
+            )
+            
+            self.stdout.write(f'{depth:>8} {numbered:>11.2f} ms {cursor:>7.2f} ms')
+    
+    def _time(self, paginator_class, request, repeat):
+        """Average milliseconds to fetch one page"""
+        request = Request(request)
+        paginator = paginator_class()
+        paginator.page_size = int(request.query_params['page_size'])
+        
+        started = time.perf_counter()
+        for _ in range(repeat):
+            paginator.paginate_queryset(Lead.objects.all(), request)
+        return (time.perf_counter() - started) / repeat * 1000
@@ -0,0 +1,53 @@
+"""
+Management command comparing FTS5 lead search with LIKE matching.
+
+Usage:
+    python manage.py benchmark_lead_search
+    python manage.py benchmark_lead_search --queries acme "john smith" pricing
+
+The LIKE path is what DRF's SearchFilter generates: every word must
+appear in one of the fields, as %word%, newest leads first.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.search import _search_like, fts_available, parse_terms, search_leads
+
+
+class Command(BaseCommand):
+    help = 'Measure full-text lead search against LIKE matching'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', nargs='+',
+            default=['acme', 'bulk lead 99999', 'pricing demo', 'zzzz'],
+            help='Search queries to time'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Results per search (default: 20)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Runs per measurement (default: 3)'
+        )
+    
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError('The FTS5 index is not available on this database')
+        
+        limit = options['limit']
+        self.stdout.write(f'{"query":<20} {"LIKE":>12} {"FTS5":>12} {"hits":>6}')
+        
+        for query in options['queries']:
+            like, _ = self._time(lambda: _search_like(parse_terms(query), limit), options['repeat'])
+            fts, hits = self._time(lambda: search_leads(query, limit), options['repeat'])
+            self.stdout.write(f'{query:<20} {like:>9.2f} ms {fts:>9.2f} ms {hits:>6}')
+    
+    def _time(self, search, repeat):
+        """Average milliseconds per search, and the number of hits"""
+        started = time.perf_counter()
+        for _ in range(repeat):
+            results = search()
+        return (time.perf_counter() - started) / repeat * 1000, len(results)
@@ -0,0 +1,48 @@
+"""
+Management command to report drift in Lead.contact_count / Lead.deal_count.
+
+Usage:
+    python manage.py check_lead_counters
+    python manage.py check_lead_counters --limit 50
+
+Exits with an error when any lead is out of sync, so it can run from cron
+or CI. Repair with `python manage.py backfill_lead_counters`.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.counters import iter_counter_drift
+from leads.models import Lead
+
+
+class Command(BaseCommand):
+    help = 'Report leads whose contact/deal counters disagree with the related tables'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of leads checked per query (default: 2000)'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Maximum number of drifted leads to print (default: 20)'
+        )
+    
+    def handle(self, *args, **options):
+        drifted = 0
+        
+        for drift in iter_counter_drift(Lead.objects.all(), options['chunk_size']):
+            drifted += 1
+            if drifted <= options['limit']:
+                self.stdout.write(
+                    f"Lead {drift['id']}: "
+                    f"contacts {drift['contact_count']} (actual {drift['actual_contact_count']}), "
+                    f"deals {drift['deal_count']} (actual {drift['actual_deal_count']})"
+                )
+        
+        if drifted:
+            raise CommandError(
+                f'{drifted} leads have drifted counters. '
+                f'Run "manage.py backfill_lead_counters" to repair them.'
+            )
+        
+        self.stdout.write(self.style.SUCCESS('All lead counters are consistent'))
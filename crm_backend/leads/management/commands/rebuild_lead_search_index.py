@@ -0,0 +1,46 @@
+"""
+Management command to rebuild the full-text lead search index.
+
+Usage:
+    python manage.py rebuild_lead_search_index
+    python manage.py rebuild_lead_search_index --check
+
+Triggers keep the index in sync with the leads table, so this is only
+needed after restoring a database dump without the index, or when
+--check reports corruption.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from leads.search import FTS_TABLE, fts_available, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (or verify) the FTS5 index used by /api/leads/search/'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only verify that the index matches the leads table'
+        )
+    
+    def handle(self, *args, **options):
+        if not fts_available():
+            raise CommandError(f'No {FTS_TABLE} table: full-text search needs SQLite and migration leads 0005')
+        
+        if options['check']:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('integrity-check', 1)")
+            except DatabaseError as e:
+                raise CommandError(f'Search index is out of sync: {e}. Run without --check to rebuild it.')
+            self.stdout.write(self.style.SUCCESS('Search index is in sync'))
+            return
+        
+        started = time.monotonic()
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Search index rebuilt in {time.monotonic() - started:.2f}s'
+        ))
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-17 09:12
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    """Fill the new counters for existing leads with one UPDATE"""
+    Lead = apps.get_model("leads", "Lead")
+    Contact = apps.get_model("contacts", "Contact")
+    Deal = apps.get_model("deals", "Deal")
+
+    def _count(model):
+        related = (
+            model.objects.filter(lead=OuterRef("pk"))
+            .order_by()
+            .values("lead")
+            .annotate(n=Count("pk"))
+            .values("n")
+        )
+        return Coalesce(Subquery(related, output_field=IntegerField()), 0)
+
+    Lead.objects.update(contact_count=_count(Contact), deal_count=_count(Deal))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0001_initial"),
+        ("deals", "0001_initial"),
+        ("leads", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lead",
+            name="contact_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Number of contacts linked to this lead"
+            ),
+        ),
+        migrations.AddField(
+            model_name="lead",
+            name="deal_count",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Number of deals linked to this lead"
+            ),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
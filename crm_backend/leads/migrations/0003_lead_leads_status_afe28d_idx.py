@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0002_lead_contact_count_lead_deal_count"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["status", "category"], name="leads_status_afe28d_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0003_lead_leads_status_afe28d_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="lead",
+            index=models.Index(
+                fields=["created_at", "id"], name="leads_created_daeac4_idx"
+            ),
+        ),
+    ]
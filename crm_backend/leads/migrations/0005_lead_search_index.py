@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 11:20
+
+from django.db import migrations
+
+
+# External content FTS5 index over leads, kept in sync by triggers so that
+# queryset.update() and bulk_create() are covered too. SQLite only.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE leads_fts USING fts5(
+        name, company, email, description,
+        content='leads', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER leads_fts_insert AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts(rowid, name, company, email, description)
+        VALUES (new.id, new.name, new.company, new.email, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER leads_fts_delete AFTER DELETE ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, name, company, email, description)
+        VALUES ('delete', old.id, old.name, old.company, old.email, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER leads_fts_update AFTER UPDATE OF name, company, email, description ON leads BEGIN
+        INSERT INTO leads_fts(leads_fts, rowid, name, company, email, description)
+        VALUES ('delete', old.id, old.name, old.company, old.email, old.description);
+        INSERT INTO leads_fts(rowid, name, company, email, description)
+        VALUES (new.id, new.name, new.company, new.email, new.description);
+    END
+    """,
+    "INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS leads_fts_update",
+    "DROP TRIGGER IF EXISTS leads_fts_delete",
+    "DROP TRIGGER IF EXISTS leads_fts_insert",
+    "DROP TABLE IF EXISTS leads_fts",
+]
+
+
+def run_on_sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("leads", "0004_lead_leads_created_daeac4_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
@@ -72,6 +72,19 @@ class Lead(models.Model):
         help_text='AI-generated category based on score and engagement'
     )
     
+    # Engagement counters - kept in sync by leads.signals when contacts
+    # and deals are created or deleted, so AI scoring never has to COUNT.
+    # Ordinary saves leave them alone (see save()).
+    COUNTER_FIELDS = ('contact_count', 'deal_count')
+    contact_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of contacts linked to this lead'
+    )
+    deal_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Number of deals linked to this lead'
+    )
+    
     # Assignment - Who is responsible for this lead?
     assigned_to = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
@@ -98,8 +111,30 @@ class Lead(models.Model):
             models.Index(fields=['email']),
             models.Index(fields=['status']),
             models.Index(fields=['category']),
+            # Covers the GROUP BY of the dashboard statistics (leads/stats.py)
+            models.Index(fields=['status', 'category']),
+            # Keyset pagination of the leads list (leads/pagination.py)
+            models.Index(fields=['created_at', 'id']),
         ]
     
     def __str__(self):
         """String representation of the lead"""
         return f"{self.name} - {self.company} ({self.status})"
+    
+    def save(self, *args, **kwargs):
+        """
+        Save the lead, except its engagement counters.
+        
+        The counters are only written with F() updates (leads.signals) and
+        by backfill_lead_counters. A full save would write back the values
+        loaded with the instance over the contacts and deals added since,
+        so they are left out of the UPDATE and reloaded first, for the
+        post_save receivers (stored features) to see the current counts.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            self.refresh_from_db(fields=list(self.COUNTER_FIELDS))
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination for the leads list.
+
+Page number pagination runs COUNT(*) on every request and skips rows with
+OFFSET, so deep pages get slower and slower. Keyset pagination remembers
+the (created_at, id) of the last row shown and asks for the rows after it:
+
+    WHERE created_at <= :created_at AND NOT (created_at = :created_at AND id >= :id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :page_size + 1
+
+With the (created_at, id) index this is an index seek, so every page
+costs the same whatever its depth. id breaks ties between leads created
+in the same instant, which keeps cursors stable.
+
+Opt-in on /api/leads/:
+    GET /api/leads/?pagination=cursor               -> first page
+    GET /api/leads/?pagination=cursor&cursor=<next> -> following pages
+
+Response: { "next": url, "previous": url, "results": [...] }
+(no "count" - counting is exactly what this mode avoids)
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class LeadCursorPagination(BasePagination):
+    """
+    Newest-first keyset pagination on (created_at, id).
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        
+        if cursor is None:
+            # First page
+            reverse = False
+            rows = list(queryset.order_by('-created_at', '-id')[:size + 1])
+        else:
+            created_at, pk, reverse = cursor
+            if reverse:
+                # Rows newer than the cursor, read oldest first
+                position = Q(created_at__gte=created_at) & ~Q(created_at=created_at, id__lte=pk)
+                ordering = ('created_at', 'id')
+            else:
+                position = Q(created_at__lte=created_at) & ~Q(created_at=created_at, id__gte=pk)
+                ordering = ('-created_at', '-id')
+            rows = list(queryset.filter(position).order_by(*ordering)[:size + 1])
+        
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        
+        self.page = rows
+        return rows
+    
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+    
+    def decode_cursor(self, request):
+        """
+        Returns:
+            tuple: (created_at, id, reverse), or None for the first page
+        
+        Raises:
+            NotFound: if the cursor was not produced by this paginator
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        
+        try:
+            padding = '=' * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode((encoded + padding).encode('ascii')))
+            created_at = parse_datetime(data['c'])
+            pk = int(data['i'])
+            reverse = bool(data.get('r'))
+        except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk, reverse
+    
+    def cursor_for(self, lead, reverse=False):
+        """Opaque cursor pointing just after (or, reversed, before) a lead"""
+        data = {'c': lead.created_at.isoformat(), 'i': lead.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode('ascii'))
+        return encoded.decode('ascii').rstrip('=')
+    
+    def encode_cursor(self, lead, reverse):
+        return replace_query_param(self.base_url, self.cursor_query_param, self.cursor_for(lead, reverse))
+    
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+    
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+    
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
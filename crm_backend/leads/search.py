@@ -0,0 +1,158 @@
+"""
+Full-text lead search.
+
+On SQLite, leads are indexed in the FTS5 table leads_fts (name, company,
+email, description), created by migration 0005 and kept in sync by
+triggers on the leads table. Queries are ranked with BM25, every word is
+matched as a prefix ("acm" finds "Acme") and each hit comes with a
+snippet of the best matching column. Queries matching more than
+RANK_CANDIDATES leads only rank the most recently created ones.
+
+Other databases fall back to case-insensitive LIKE matching, without
+ranking or snippets.
+
+Rebuild the index with `manage.py rebuild_lead_search_index`.
+"""
+import html
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Lead
+
+
+FTS_TABLE = 'leads_fts'
+SEARCH_FIELDS = ('name', 'company', 'email', 'description')
+
+# BM25 weight of each column, in SEARCH_FIELDS order
+COLUMN_WEIGHTS = (10.0, 5.0, 3.0, 1.0)
+
+MAX_TERMS = 10
+SNIPPET_TOKENS = 12
+
+# Matches ranked at most per query, newest first (see search_leads)
+RANK_CANDIDATES = 5000
+
+# Highlight markers used inside SQLite. Control characters never appear in
+# lead text, so the snippet can be HTML-escaped before they become <mark>.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+
+def parse_terms(query):
+    """
+    Split a user query into search words.
+    
+    Returns:
+        list: lowercase words, at most MAX_TERMS
+    """
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def build_match_expression(terms):
+    """
+    FTS5 MATCH expression requiring every term, each as a prefix.
+    Terms are quoted, so user input can never inject FTS5 syntax.
+    """
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+_fts_table_exists = None
+
+
+def fts_available():
+    """True when the FTS5 index exists on the current database"""
+    global _fts_table_exists
+    if connection.vendor != 'sqlite':
+        return False
+    if _fts_table_exists is None:
+        # Looked up once per process
+        _fts_table_exists = FTS_TABLE in connection.introspection.table_names()
+    return _fts_table_exists
+
+
+def search_leads(query, limit=20):
+    """
+    Search leads by name, company, email and description.
+    
+    Args:
+        query: Free text typed by the user
+        limit: Maximum number of results
+    
+    Returns:
+        list: (lead, rank, snippet) tuples, best match first. rank is the
+              BM25 score (lower is better) and snippet contains the
+              matching words wrapped in <mark></mark>, HTML-escaped.
+              Both are None on databases without FTS5.
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return []
+    
+    if not fts_available():
+        return _search_like(terms, limit)
+    
+    expression = build_match_expression(terms)
+    weights = ', '.join(str(weight) for weight in COLUMN_WEIGHTS)
+    sql = (
+        f'SELECT rowid, bm25({FTS_TABLE}, {weights}) AS rank, '
+        f"snippet({FTS_TABLE}, -1, %s, %s, '...', {SNIPPET_TOKENS}) "
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid >= %s '
+        f'ORDER BY rank LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        # Scoring every match of a very common word costs seconds on large
+        # tables, so only the newest RANK_CANDIDATES matches are ranked.
+        # Walking the matches by rowid is cheap, no scoring involved.
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY rowid DESC LIMIT 1 OFFSET %s',
+            [expression, RANK_CANDIDATES - 1],
+        )
+        row = cursor.fetchone()
+        oldest = row[0] if row else 0
+        
+        cursor.execute(sql, [_MARK_START, _MARK_END, expression, oldest, limit])
+        hits = cursor.fetchall()
+    
+    leads = Lead.objects.select_related('assigned_to').in_bulk([lead_id for lead_id, _, _ in hits])
+    return [
+        (leads[lead_id], rank, _format_snippet(snippet))
+        for lead_id, rank, snippet in hits
+        if lead_id in leads
+    ]
+
+
+def _format_snippet(snippet):
+    return (
+        html.escape(snippet or '')
+        .replace(_MARK_START, '<mark>')
+        .replace(_MARK_END, '</mark>')
+    )
+
+
+def _search_like(terms, limit):
+    """Every term must appear in one of the fields (no ranking)"""
+    queryset = Lead.objects.select_related('assigned_to')
+    for term in terms:
+        matches = Q()
+        for field in SEARCH_FIELDS:
+            matches |= Q(**{f'{field}__icontains': term})
+        queryset = queryset.filter(matches)
+    return [(lead, None, None) for lead in queryset[:limit]]
+
+
+def rebuild_search_index():
+    """
+    Re-index every lead from the leads table.
+    
+    Returns:
+        bool: False when the database has no FTS5 index
+    """
+    if not fts_available():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return True
@@ -5,6 +5,7 @@ Handles validation and JSON conversion for lead data.
 from rest_framework import serializers
 from .models import Lead
 from accounts.serializers import UserProfileSerializer
+from notes.serializers import SentimentRollupSerializer
 
 
 class LeadSerializer(serializers.ModelSerializer):
@@ -14,16 +15,20 @@ class LeadSerializer(serializers.ModelSerializer):
     """
     # Nested serializer to show full user details instead of just ID
     assigned_to_detail = UserProfileSerializer(source='assigned_to', read_only=True)
+    # Sentiment of the lead's notes, null until one of them is analyzed
+    sentiment = SentimentRollupSerializer(source='sentiment_rollup', read_only=True, allow_null=True)
     
     class Meta:
         model = Lead
         fields = [
             'id', 'name', 'email', 'phone', 'company', 'status', 'source',
-            'score', 'category', 'assigned_to', 'assigned_to_detail',
+            'score', 'category', 'contact_count', 'deal_count', 'sentiment',
+            'assigned_to', 'assigned_to_detail',
             'description', 'website', 'created_at', 'updated_at'
         ]
         # Prevent manual editing of system-managed fields
-        read_only_fields = ['id', 'created_at', 'updated_at', 'score', 'category']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'score', 'category',
+                            'contact_count', 'deal_count']
 
 
 class LeadListSerializer(serializers.ModelSerializer):
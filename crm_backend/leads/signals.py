@@ -0,0 +1,175 @@
+"""
+Signal handlers that keep derived lead data in sync.
+
+Counters: Lead.contact_count and Lead.deal_count.
+
+Every time a Contact or Deal is created, deleted or moved to another lead,
+the affected lead's counter is adjusted atomically in the database with an
+F() expression, then only that lead's AI score and category are refreshed.
+
+Bulk operations that bypass signals (bulk_create, queryset.update) are not
+tracked - run `manage.py check_lead_counters` to detect drift and
+`manage.py backfill_lead_counters` to repair it.
+
+Features: the lead's row in the precomputed feature store
+(ai_features.feature_store) is rewritten when the lead is saved with any
+of the fields it is computed from, and when a counter moves.
+
+Statistics: the cached dashboard counts (leads.stats) are invalidated
+whenever a Lead is saved or deleted.
+"""
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Lead
+from .stats import invalidate_lead_statistics
+
+
+# Related model -> counter field on Lead
+COUNTER_FIELDS = {
+    'contacts.Contact': 'contact_count',
+    'deals.Deal': 'deal_count',
+}
+
+
+def refresh_lead_ai_fields(lead_id):
+    """
+    Recalculate score and category for a single lead from its counters,
+    and store its features. Writes score and category only when they
+    changed.
+    """
+    from ai_features.feature_store import save_lead_features
+    from ai_features.features import get_lead_features
+    from ai_features.lead_scoring import score_lead
+    from ai_features.categorization import categorize_lead
+    from notes.rollups import get_lead_sentiment
+    
+    lead = Lead.objects.filter(pk=lead_id).select_related('sentiment_rollup').first()
+    if lead is None:
+        return
+    
+    save_lead_features([lead])
+    features = get_lead_features(lead)
+    old_score, old_category = lead.score, lead.category
+    lead.score = score_lead(lead, features)
+    lead.category = categorize_lead(lead, features, get_lead_sentiment(lead))
+    
+    if (lead.score, lead.category) != (old_score, old_category):
+        Lead.objects.filter(pk=lead_id).update(score=lead.score, category=lead.category)
+        if lead.category != old_category:
+            invalidate_lead_statistics()
+
+
+def refresh_lead_categories(lead_ids=None, chunk_size=1000):
+    """
+    Recalculate the category of leads whose sentiment rollup changed
+    (all leads when lead_ids is None). The score does not depend on the
+    notes and is left alone. Writes one UPDATE per category for the leads
+    whose category changed.
+    
+    Returns:
+        int: number of leads recategorized
+    """
+    from ai_features.categorization import categorize_lead
+    from ai_features.features import get_lead_features
+    from notes.rollups import get_lead_sentiment
+    
+    leads = Lead.objects.select_related('sentiment_rollup').only(
+        'score', 'category', 'status', 'source', 'company', 'phone', 'website',
+        'contact_count', 'deal_count', 'sentiment_rollup',
+    ).order_by('pk')
+    if lead_ids is None:
+        lead_ids = leads.values_list('pk', flat=True)
+    lead_ids = sorted(set(lead_ids))
+    
+    changed = 0
+    for start in range(0, len(lead_ids), chunk_size):
+        moved = {}
+        for lead in leads.filter(pk__in=lead_ids[start:start + chunk_size]):
+            category = categorize_lead(lead, get_lead_features(lead), get_lead_sentiment(lead))
+            if category != lead.category:
+                moved.setdefault(category, []).append(lead.pk)
+        for category, ids in moved.items():
+            Lead.objects.filter(pk__in=ids).update(category=category)
+            changed += len(ids)
+    
+    if changed:
+        invalidate_lead_statistics()
+    return changed
+
+
+def _adjust_counter(lead_id, field, delta):
+    """
+    Atomically add delta to a lead counter and refresh its AI fields.
+    
+    The counter never goes below 0: a counter that has drifted (e.g. a
+    contact added with bulk_create) would otherwise fail the column's
+    CHECK constraint and abort the delete that triggered the signal.
+    """
+    with transaction.atomic():
+        Lead.objects.filter(pk=lead_id).update(**{field: Greatest(F(field) + delta, 0)})
+        refresh_lead_ai_fields(lead_id)
+
+
+def _is_lead_deletion(origin):
+    """True when a delete was started from a Lead (cascade to its contacts/deals)"""
+    if isinstance(origin, Lead):
+        return True
+    return isinstance(origin, QuerySet) and origin.model is Lead
+
+
+@receiver(post_init, sender='contacts.Contact')
+@receiver(post_init, sender='deals.Deal')
+def remember_lead(sender, instance, **kwargs):
+    """Keep the lead the row was loaded with, to detect moves on save"""
+    instance._counted_lead_id = instance.lead_id
+
+
+@receiver(post_save, sender='contacts.Contact')
+@receiver(post_save, sender='deals.Deal')
+def count_saved(sender, instance, created, raw=False, **kwargs):
+    """Count a new contact/deal, or move it between leads"""
+    if raw:
+        return  # Fixture loading
+    
+    field = COUNTER_FIELDS[sender._meta.label]
+    previous_lead_id = getattr(instance, '_counted_lead_id', None)
+    
+    if created:
+        _adjust_counter(instance.lead_id, field, 1)
+    elif previous_lead_id is not None and previous_lead_id != instance.lead_id:
+        # Moved to another lead
+        _adjust_counter(previous_lead_id, field, -1)
+        _adjust_counter(instance.lead_id, field, 1)
+    
+    instance._counted_lead_id = instance.lead_id
+
+
+@receiver(post_delete, sender='contacts.Contact')
+@receiver(post_delete, sender='deals.Deal')
+def count_deleted(sender, instance, origin=None, **kwargs):
+    """Uncount a deleted contact/deal"""
+    if _is_lead_deletion(origin):
+        return  # The lead itself is going away
+    
+    _adjust_counter(instance.lead_id, COUNTER_FIELDS[sender._meta.label], -1)
+
+
+@receiver(post_save, sender=Lead)
+@receiver(post_delete, sender=Lead)
+def lead_changed(sender, **kwargs):
+    """Drop the cached dashboard statistics"""
+    invalidate_lead_statistics()
+
+
+@receiver(post_save, sender=Lead)
+def store_lead_features(sender, instance, update_fields=None, **kwargs):
+    """Rewrite the lead's stored features when a field they use was saved"""
+    from ai_features.feature_store import SOURCE_FIELDS, save_lead_features
+    
+    if update_fields is not None and not set(update_fields) & set(SOURCE_FIELDS):
+        return  # e.g. only score and category
+    save_lead_features([instance])
@@ -0,0 +1,99 @@
+"""
+Cached lead statistics for the dashboard.
+
+All status and category counts come from one grouped query:
+    SELECT status, category, COUNT(*) FROM leads GROUP BY status, category
+which reads only the (status, category) index and returns at most
+15 rows; totals per status and per category are summed in Python.
+
+The result is kept in the Django cache until a Lead is saved or deleted
+(see leads.signals) or LEAD_STATISTICS_CACHE_TIMEOUT expires. Cache entries
+are keyed by a generation token: invalidating only replaces the token, so
+a request that was still counting with old data can never publish its
+result as current.
+
+Note: the default LocMemCache is per process. With several workers,
+configure a shared cache (Redis, Memcached) in CACHES so an invalidation
+reaches all of them; otherwise other workers serve the old counts until
+the timeout.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Lead
+
+
+GENERATION_CACHE_KEY = 'leads:statistics:generation'
+STATISTICS_CACHE_KEY = 'leads:statistics:{generation}'
+
+
+def compute_lead_statistics():
+    """
+    Count leads per status and per category with a single query.
+    
+    Returns:
+        dict: {'total': int, 'new': int, ..., 'hot': int, 'warm': int, 'cold': int}
+    """
+    stats = {'total': 0}
+    stats.update((value, 0) for value, _ in Lead.STATUS_CHOICES)
+    stats.update((value, 0) for value, _ in Lead.CATEGORY_CHOICES)
+    
+    groups = (
+        Lead.objects.order_by()
+        .values_list('status', 'category')
+        .annotate(count=Count('*'))
+    )
+    for lead_status, category, count in groups:
+        stats['total'] += count
+        if lead_status in stats:
+            stats[lead_status] += count
+        if category in stats:
+            stats[category] += count
+    
+    return stats
+
+
+def _current_generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        # add() so that concurrent first requests agree on one token
+        if not cache.add(GENERATION_CACHE_KEY, generation, timeout=None):
+            generation = cache.get(GENERATION_CACHE_KEY, generation)
+    return generation
+
+
+def get_lead_statistics():
+    """
+    Lead statistics from the cache, computed on a miss.
+    
+    Returns:
+        dict: the counts of compute_lead_statistics plus 'computed_at'
+              (ISO 8601 time the counts were taken)
+    """
+    key = STATISTICS_CACHE_KEY.format(generation=_current_generation())
+    stats = cache.get(key)
+    
+    if stats is None:
+        stats = compute_lead_statistics()
+        stats['computed_at'] = timezone.now().isoformat()
+        cache.set(key, stats, timeout=settings.LEAD_STATISTICS_CACHE_TIMEOUT)
+    
+    return stats
+
+
+def invalidate_lead_statistics():
+    """
+    Drop the cached statistics once the current transaction commits.
+    
+    Call this after writes that bypass Lead signals (queryset.update,
+    bulk_update) and touch status or category.
+    """
+    transaction.on_commit(
+        lambda: cache.set(GENERATION_CACHE_KEY, uuid.uuid4().hex, timeout=None)
+    )
@@ -7,7 +7,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Lead
+from .pagination import LeadCursorPagination
 from .serializers import LeadSerializer, LeadListSerializer
+from .search import search_leads
+from .stats import get_lead_statistics
+
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
 
 
 class LeadViewSet(viewsets.ModelViewSet):
@@ -24,11 +31,41 @@ class LeadViewSet(viewsets.ModelViewSet):
     Custom Actions:
     - update_ai: POST /api/leads/{id}/update_ai/ (Recalculate score)
     - statistics: GET /api/leads/statistics/ (Dashboard stats)
+    - search: GET /api/leads/search/?q=acme (Full-text search)
+    
+    Pagination:
+    - default: page numbers (?page=2)
+    - ?pagination=cursor: keyset pagination, constant cost on deep pages
+      (see leads/pagination.py)
     """
-    queryset = Lead.objects.all()
+    queryset = Lead.objects.select_related('assigned_to')
     # Require authentication for all lead operations
     permission_classes = [IsAuthenticated]
     
+    @property
+    def paginator(self):
+        """
+        Use cursor pagination when the client asks for it, either with
+        ?pagination=cursor or by following a cursor link.
+        """
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = LeadCursorPagination()
+            else:
+                self._paginator = super().paginator
+        return self._paginator
+    
+    def get_queryset(self):
+        """
+        Detail responses include the lead's note sentiment rollup, loaded
+        with the lead in the same query.
+        """
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            queryset = queryset.select_related('sentiment_rollup')
+        return queryset
+    
     def get_serializer_class(self):
         """
         Dynamic serializer selection.
@@ -41,20 +78,25 @@ class LeadViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """
-        Override create to trigger AI processing immediately after saving.
-        """
-        # Save the initial lead data
-        lead = serializer.save()
+        Override create to run AI processing before the lead is saved.
         
+        A new lead has no contacts or deals yet, so its score and category
+        only depend on the submitted data and the lead is written with a
+        single INSERT.
+        """
         # Import AI functions here to avoid circular imports
         # (AI module might import Lead model)
-        from ai_features.lead_scoring import calculate_lead_score
+        from ai_features.features import get_lead_features
+        from ai_features.lead_scoring import score_lead
         from ai_features.categorization import categorize_lead
         
-        # Calculate and update AI fields
-        lead.score = calculate_lead_score(lead)
-        lead.category = categorize_lead(lead)
-        lead.save()
+        # Unsaved instance with model defaults applied (status, source...)
+        lead = Lead(**serializer.validated_data)
+        features = get_lead_features(lead)
+        lead.score = score_lead(lead, features)
+        lead.category = categorize_lead(lead, features)
+        
+        serializer.save(score=lead.score, category=lead.category)
     
     @action(detail=True, methods=['post'])
     def update_ai(self, request, pk=None):
@@ -67,13 +109,16 @@ class LeadViewSet(viewsets.ModelViewSet):
         lead = self.get_object()
         
         # Import AI functions
-        from ai_features.lead_scoring import calculate_lead_score
+        from ai_features.features import get_lead_features
+        from ai_features.lead_scoring import score_lead
         from ai_features.categorization import categorize_lead
+        from notes.rollups import get_lead_sentiment
         
-        # Recalculate AI fields
-        lead.score = calculate_lead_score(lead)
-        lead.category = categorize_lead(lead)
-        lead.save()
+        # Recalculate AI fields from one feature snapshot
+        features = get_lead_features(lead)
+        lead.score = score_lead(lead, features)
+        lead.category = categorize_lead(lead, features, get_lead_sentiment(lead))
+        lead.save(update_fields=['score', 'category', 'updated_at'])
         
         serializer = self.get_serializer(lead)
         return Response({
@@ -85,31 +130,44 @@ class LeadViewSet(viewsets.ModelViewSet):
     def statistics(self, request):
         """
         Get aggregated lead statistics for the dashboard.
-        Optimized to use database counting instead of loading objects.
+        All counts come from one query and are cached until a lead changes
+        (see leads/stats.py).
         
         Endpoint: GET /api/leads/statistics/
+        
+        Returns:
+            Counts per status and category, plus 'computed_at' (when the
+            counts were taken)
+        """
+        stats = get_lead_statistics()
+        return Response(stats)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
         """
-        # Status counts
-        total_leads = Lead.objects.count()
-        new_leads = Lead.objects.filter(status='new').count()
-        contacted_leads = Lead.objects.filter(status='contacted').count()
-        qualified_leads = Lead.objects.filter(status='qualified').count()
-        lost_leads = Lead.objects.filter(status='lost').count()
-        converted_leads = Lead.objects.filter(status='converted').count()
+        Full-text search over name, company, email and description.
+        Every word must match (as a prefix); best matches come first.
         
-        # Category breakdown (AI segments)
-        hot_leads = Lead.objects.filter(category='hot').count()
-        warm_leads = Lead.objects.filter(category='warm').count()
-        cold_leads = Lead.objects.filter(category='cold').count()
+        Endpoint: GET /api/leads/search/?q=acme%20john&limit=20
         
-        return Response({
-            'total': total_leads,
-            'new': new_leads,
-            'contacted': contacted_leads,
-            'qualified': qualified_leads,
-            'lost': lost_leads,
-            'converted': converted_leads,
-            'hot': hot_leads,
-            'warm': warm_leads,
-            'cold': cold_leads,
-        })
+        Returns:
+            { "query": "acme john", "results": [{...lead, "rank": -4.2,
+              "snippet": "<mark>John</mark> Smith"}] }
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Query parameter q is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            limit = min(max(int(request.query_params.get('limit', SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results = []
+        for lead, rank, snippet in search_leads(query, limit):
+            data = LeadListSerializer(lead).data
+            data['rank'] = rank
+            data['snippet'] = snippet
+            results.append(data)
+        
+        return Response({'query': query, 'results': results})
@@ -4,7 +4,8 @@ from .models import Note
 
 @admin.register(Note)
 class NoteAdmin(admin.ModelAdmin):
-    list_display = ['id', 'created_by', 'sentiment', 'sentiment_score', 'created_at']
-    list_filter = ['sentiment', 'created_at']
+    list_display = ['id', 'created_by', 'sentiment', 'sentiment_score', 'sentiment_status', 'created_at']
+    list_filter = ['sentiment', 'sentiment_status', 'created_at']
     search_fields = ['content', 'created_by__email']
-    readonly_fields = ['sentiment', 'sentiment_score']
+    readonly_fields = ['sentiment', 'sentiment_score', 'sentiment_status', 'sentiment_claimed_by',
+                       'sentiment_claimed_at']
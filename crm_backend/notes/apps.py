@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NotesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'notes'
+    
+    def ready(self):
+        # Register signal handlers that maintain the sentiment rollups
+        from . import signals  # noqa: F401
@@ -0,0 +1,74 @@
+"""
+Management command running a note sentiment worker.
+
+Usage:
+    python manage.py process_note_sentiment
+    python manage.py process_note_sentiment --once --batch-size 500
+    python manage.py process_note_sentiment --retry-failed
+
+Claims pending notes in batches, analyzes them and saves the results
+(see notes.sentiment_queue). Without --once it keeps polling for new
+notes until it is stopped; SIGTERM and Ctrl+C finish the current batch
+first. Several workers can run at the same time.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from notes.sentiment_queue import new_worker_id, process_pending_notes, reset_failed_notes
+
+
+class Command(BaseCommand):
+    help = 'Analyze the sentiment of pending notes in the background'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=200,
+            help='Notes claimed and saved at a time (default: 200)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait when no note is pending (default: 2)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit as soon as no note is pending'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Queue notes whose analysis failed again before starting'
+        )
+    
+    def handle(self, *args, **options):
+        worker_id = new_worker_id()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        
+        if options['retry_failed']:
+            self.stdout.write(f'{reset_failed_notes()} failed notes queued again')
+        
+        self.stdout.write(f'Worker {worker_id} started')
+        total = 0
+        started = time.perf_counter()
+        
+        while not self.stopping:
+            batch_started = time.perf_counter()
+            claimed, saved = process_pending_notes(worker_id, options['batch_size'])
+            
+            if not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            
+            total += saved
+            elapsed = time.perf_counter() - batch_started
+            self.stdout.write(f'Analyzed {saved}/{claimed} notes in {elapsed * 1000:.0f} ms')
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker_id} stopped: {total} notes in {elapsed:.1f}s'))
+    
+    def _stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,242 @@
+"""
+Management command to recompute the sentiment of existing notes.
+
+Usage:
+    python manage.py reanalyze_notes
+    python manage.py reanalyze_notes --relabel-only
+    python manage.py reanalyze_notes --chunk-size 5000 --resume
+    AI_SENTIMENT_WORKERS=8 python manage.py reanalyze_notes
+
+Notes are streamed in id order with .iterator(), one chunk at a time.
+Every chunk is analyzed on the sentiment process pool
+(ai_features.sentiment_pool, AI_SENTIMENT_WORKERS processes) and only the
+notes whose sentiment changed are written back, with one bulk_update
+per status they were read with, and their lead and contact sentiment
+rollups are adjusted in the same transaction.
+
+--relabel-only skips TextBlob and only recomputes the positive/neutral/
+negative label from the stored polarity: enough when only the thresholds
+of classify_polarity changed. Notes not analyzed yet are left to the
+process_note_sentiment worker, as are notes a worker is processing.
+
+A note is only written if it still has the status it was read with and
+has not been edited since the run started: an edited note is analyzed
+again by the edit itself (or queued for the worker), and a note the
+worker picked up meanwhile is the worker's to save.
+
+After every chunk, the last note id is saved to a checkpoint file, so an
+interrupted run can continue with --resume. The file is removed when the
+run completes.
+"""
+import json
+import time
+from collections import defaultdict
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from ai_features.sentiment_analysis import classify_polarity
+from ai_features.sentiment_pool import score_texts_parallel
+from notes.models import Note
+from notes.rollups import apply_changes, contribution, rebuild_rollups
+
+
+SENTIMENT_FIELDS = ['sentiment', 'sentiment_score', 'polarity', 'subjectivity']
+# Needed to adjust the sentiment rollups of the changed notes
+ROLLUP_FIELDS = ['lead', 'contact', 'created_at', 'sentiment_status']
+DEFAULT_CHECKPOINT = Path(settings.BASE_DIR) / '.reanalyze_notes.checkpoint.json'
+
+
+class Command(BaseCommand):
+    help = 'Recompute the sentiment of existing notes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Notes read, analyzed and saved at a time (default: 1000)'
+        )
+        parser.add_argument(
+            '--relabel-only', action='store_true',
+            help='Only recompute labels from the stored polarity (no NLP)'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue after the last note of the checkpoint file'
+        )
+        parser.add_argument(
+            '--checkpoint', default=str(DEFAULT_CHECKPOINT),
+            help=f'Checkpoint file (default: {DEFAULT_CHECKPOINT.name} in the project directory)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report how many notes would change without saving them'
+        )
+    
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size must be a positive integer')
+        
+        mode = 'relabel' if options['relabel_only'] else 'reanalyze'
+        checkpoint_path = Path(options['checkpoint'])
+        dry_run = options['dry_run']
+        
+        state = {'mode': mode, 'last_id': 0, 'processed': 0, 'changed': 0}
+        if options['resume']:
+            state = self._load_checkpoint(checkpoint_path, mode)
+            self.stdout.write(f'Resuming after note {state["last_id"]} '
+                              f'({state["processed"]} notes done, {state["changed"]} changed)')
+        
+        if mode == 'relabel':
+            queryset = Note.objects.filter(sentiment_status='done').only('id', 'sentiment', 'polarity', *ROLLUP_FIELDS)
+        else:
+            queryset = Note.objects.exclude(sentiment_status='processing').only('id', 'content', *SENTIMENT_FIELDS, *ROLLUP_FIELDS)
+        queryset = queryset.filter(id__gt=state['last_id']).order_by('id')
+        
+        total = state['processed'] + queryset.count()
+        started = time.monotonic()
+        done_at_start = state['processed']
+        # Taken before the query runs: notes edited later are never written
+        read_at = timezone.now()
+        
+        notes = queryset.iterator(chunk_size=chunk_size)
+        try:
+            while True:
+                chunk = list(islice(notes, chunk_size))
+                if not chunk:
+                    break
+                
+                read_status = {note.id: note.sentiment_status for note in chunk}
+                if mode == 'relabel':
+                    (changed, rollup_changes), fields = self._relabel(chunk), ['sentiment']
+                else:
+                    (changed, rollup_changes), fields = self._reanalyze(chunk), SENTIMENT_FIELDS + ['sentiment_status']
+                
+                if changed and not dry_run:
+                    saved = self._save(changed, rollup_changes, fields, read_status, read_at)
+                else:
+                    saved = len(changed)
+                
+                state['last_id'] = chunk[-1].id
+                state['processed'] += len(chunk)
+                state['changed'] += saved
+                if not dry_run:
+                    self._save_checkpoint(checkpoint_path, state)
+                self._report_progress(state, total, done_at_start, started)
+        except KeyboardInterrupt:
+            if dry_run:
+                raise CommandError('Interrupted')
+            raise CommandError(f'Interrupted after note {state["last_id"]}, continue with --resume')
+        finally:
+            # Release the database cursor before the connection closes
+            notes.close()
+        
+        if not dry_run and checkpoint_path.exists():
+            checkpoint_path.unlink()
+        
+        elapsed = time.monotonic() - started
+        verb = 'would change' if dry_run else 'updated'
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {state["processed"]} notes checked, {state["changed"]} {verb} in {elapsed:.2f}s'
+        ))
+    
+    def _save(self, changed, rollup_changes, fields, read_status, read_at):
+        """
+        Write the changed notes and adjust their rollups in one transaction.
+        
+        Returns:
+            int: number of notes saved
+        """
+        by_status = defaultdict(list)
+        for note in changed:
+            by_status[read_status[note.id]].append(note)
+        
+        with transaction.atomic():
+            # bulk_update keeps the queryset's filters, so notes edited or
+            # picked up by a worker since they were read are skipped by the
+            # UPDATE itself, as in notes/sentiment_queue.py
+            saved = sum(
+                Note.objects.filter(sentiment_status=status, updated_at__lte=read_at)
+                .bulk_update(notes, fields, batch_size=len(changed))
+                for status, notes in by_status.items()
+            )
+            
+            if saved == len(changed):
+                apply_changes(rollup_changes)
+            else:
+                # Some notes were skipped and we can't tell which ones
+                rebuild_rollups(
+                    lead_ids={note.lead_id for note in changed if note.lead_id},
+                    contact_ids={note.contact_id for note in changed if note.contact_id},
+                )
+        return saved
+    
+    def _relabel(self, chunk):
+        """
+        Notes whose label changes under the current thresholds, and their
+        (old, new) rollup contributions
+        """
+        changed, rollup_changes = [], []
+        for note in chunk:
+            sentiment = classify_polarity(note.polarity)
+            if sentiment != note.sentiment:
+                old = contribution(note)
+                note.sentiment = sentiment
+                changed.append(note)
+                rollup_changes.append((old, contribution(note)))
+        return changed, rollup_changes
+    
+    def _reanalyze(self, chunk):
+        """
+        Notes whose sentiment changes when analyzed again, and their
+        (old, new) rollup contributions
+        """
+        scores = score_texts_parallel([note.content for note in chunk])
+        
+        changed, rollup_changes = [], []
+        for note, (polarity, subjectivity) in zip(chunk, scores):
+            old_contribution = contribution(note)
+            old = (note.sentiment, note.sentiment_score, note.polarity, note.subjectivity, note.sentiment_status)
+            note.sentiment = classify_polarity(polarity)
+            note.sentiment_score = note.polarity = round(polarity, 3)
+            note.subjectivity = round(subjectivity, 3)
+            note.sentiment_status = 'done'
+            if old != (note.sentiment, note.sentiment_score, note.polarity, note.subjectivity, 'done'):
+                changed.append(note)
+                rollup_changes.append((old_contribution, contribution(note)))
+        return changed, rollup_changes
+    
+    def _report_progress(self, state, total, done_at_start, started):
+        elapsed = time.monotonic() - started
+        rate = (state['processed'] - done_at_start) / elapsed if elapsed else 0
+        remaining = (total - state['processed']) / rate if rate else 0
+        percent = state['processed'] * 100 / total if total else 100
+        self.stdout.write(
+            f'{state["processed"]}/{total} notes ({percent:.0f}%), {state["changed"]} changed, '
+            f'{rate:.0f} notes/sec, {remaining:.0f}s left'
+        )
+    
+    def _load_checkpoint(self, path, mode):
+        try:
+            state = json.loads(path.read_text())
+        except FileNotFoundError:
+            raise CommandError(f'No checkpoint at {path}, run without --resume')
+        except ValueError as e:
+            raise CommandError(f'Invalid checkpoint {path}: {e}')
+        
+        if state.get('mode') != mode:
+            raise CommandError(
+                f'Checkpoint {path} belongs to a {state.get("mode")} run, '
+                f'resume it with the same options or delete it'
+            )
+        return state
+    
+    def _save_checkpoint(self, path, state):
+        # Write then rename, so an interruption never leaves a partial file
+        temporary = path.with_name(path.name + '.tmp')
+        temporary.write_text(json.dumps(state))
+        temporary.replace(path)
@@ -0,0 +1,49 @@
+"""
+Management command to check or rebuild the note sentiment rollups.
+
+Usage:
+    python manage.py rebuild_sentiment_rollups
+    python manage.py rebuild_sentiment_rollups --check --limit 50
+
+The rollups (notes/rollups.py) are kept in sync note by note. Writes that
+bypass them (queryset.update, bulk_create, raw SQL) leave them behind;
+this command recomputes every rollup from the notes. With --check it only
+reports the rollups that differ and exits with an error if there are any,
+so it can run from cron or CI.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.rollups import find_drift, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the lead and contact sentiment rollups from the notes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report rollups that disagree with the notes'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Maximum number of drifted rollups to print with --check (default: 20)'
+        )
+    
+    def handle(self, *args, **options):
+        if not options['check']:
+            written = rebuild_rollups()
+            for name, count in written.items():
+                self.stdout.write(f'{name}: {count} rows')
+            self.stdout.write(self.style.SUCCESS('Sentiment rollups rebuilt'))
+            return
+        
+        drift = find_drift()
+        for name, key, actual, expected in drift[:options['limit']]:
+            self.stdout.write(f'{name} {key}: stored {actual}, expected {expected}')
+        
+        if drift:
+            raise CommandError(
+                f'{len(drift)} sentiment rollups have drifted. '
+                f'Run "manage.py rebuild_sentiment_rollups" to repair them.'
+            )
+        self.stdout.write(self.style.SUCCESS('All sentiment rollups are consistent'))
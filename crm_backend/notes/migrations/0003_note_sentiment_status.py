@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0002_note_contact_note_lead_note_polarity_and_more"),
+    ]
+
+    operations = [
+        # Existing notes were analyzed when they were created
+        migrations.AddField(
+            model_name="note",
+            name="sentiment_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "Processing"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="done",
+                help_text="Whether the sentiment fields have been computed yet",
+                max_length=10,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="note",
+            name="sentiment_status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("processing", "Processing"),
+                    ("done", "Done"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                help_text="Whether the sentiment fields have been computed yet",
+                max_length=10,
+            ),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="sentiment_claimed_by",
+            field=models.CharField(
+                blank=True,
+                default="",
+                help_text="Worker that claimed the note for analysis",
+                max_length=64,
+            ),
+        ),
+        migrations.AddField(
+            model_name="note",
+            name="sentiment_claimed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="note",
+            index=models.Index(
+                fields=["sentiment_status", "id"], name="notes_sentime_816336_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 4.2.7 on 2026-10-17 14:20
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    """Roll up the notes analyzed so far"""
+    Note = apps.get_model("notes", "Note")
+    negative = Q(sentiment="negative")
+
+    for model_name, field in (
+        ("LeadSentimentRollup", "lead_id"),
+        ("ContactSentimentRollup", "contact_id"),
+    ):
+        model = apps.get_model("notes", model_name)
+        rows = (
+            Note.objects.filter(sentiment_status="done", **{f"{field}__isnull": False})
+            .order_by()
+            .values(field)
+            .annotate(
+                note_count=Count("id"),
+                polarity_sum=Sum("polarity"),
+                negative_count=Count("id", filter=negative),
+                last_negative_at=Max("created_at", filter=negative),
+            )
+        )
+        model.objects.bulk_create(
+            [
+                model(
+                    pk=row[field],
+                    note_count=row["note_count"],
+                    polarity_sum=row["polarity_sum"],
+                    negative_count=row["negative_count"],
+                    last_negative_at=row["last_negative_at"],
+                )
+                for row in rows.iterator()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contacts", "0001_initial"),
+        ("leads", "0005_lead_search_index"),
+        ("notes", "0003_note_sentiment_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ContactSentimentRollup",
+            fields=[
+                (
+                    "note_count",
+                    models.IntegerField(default=0, help_text="Analyzed notes"),
+                ),
+                (
+                    "polarity_sum",
+                    models.FloatField(
+                        default=0.0,
+                        help_text="Sum of the polarity of the analyzed notes",
+                    ),
+                ),
+                (
+                    "negative_count",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Analyzed notes with a negative sentiment",
+                    ),
+                ),
+                (
+                    "last_negative_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Creation time of the newest negative note",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "contact",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="sentiment_rollup",
+                        serialize=False,
+                        to="contacts.contact",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "notes_contact_sentiment",
+            },
+        ),
+        migrations.CreateModel(
+            name="LeadSentimentRollup",
+            fields=[
+                (
+                    "note_count",
+                    models.IntegerField(default=0, help_text="Analyzed notes"),
+                ),
+                (
+                    "polarity_sum",
+                    models.FloatField(
+                        default=0.0,
+                        help_text="Sum of the polarity of the analyzed notes",
+                    ),
+                ),
+                (
+                    "negative_count",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Analyzed notes with a negative sentiment",
+                    ),
+                ),
+                (
+                    "last_negative_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Creation time of the newest negative note",
+                        null=True,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "lead",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="sentiment_rollup",
+                        serialize=False,
+                        to="leads.lead",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "notes_lead_sentiment",
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -16,6 +16,8 @@ class Note(models.Model):
     - AI Sentiment Analysis: Automatically detects if note is positive/negative.
     - Polymorphic: Can be attached to any object (Lead, Contact, Deal).
     - Direct Foreign Keys: Also has direct links to Lead/Contact for easier querying.
+    - Background analysis: New notes are 'pending' until the
+      process_note_sentiment worker fills in the sentiment fields.
     """
     SENTIMENT_CHOICES = [
         ('positive', 'Positive'),
@@ -23,6 +25,13 @@ class Note(models.Model):
         ('negative', 'Negative'),
     ]
     
+    SENTIMENT_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    
     content = models.TextField(help_text="The content of the note")
     
     # Direct foreign keys for leads and contacts (for easier filtering)
@@ -61,6 +70,21 @@ class Note(models.Model):
         help_text='Sentiment subjectivity (0.0 = Objective, 1.0 = Subjective)'
     )
     
+    # Background sentiment job (see notes/sentiment_queue.py)
+    sentiment_status = models.CharField(
+        max_length=10,
+        choices=SENTIMENT_STATUS_CHOICES,
+        default='pending',
+        help_text='Whether the sentiment fields have been computed yet'
+    )
+    sentiment_claimed_by = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text='Worker that claimed the note for analysis'
+    )
+    sentiment_claimed_at = models.DateTimeField(null=True, blank=True)
+    
     # Generic relation - can relate to any model (fallback if not Lead/Contact)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, blank=True, null=True)
     object_id = models.PositiveIntegerField(blank=True, null=True)
@@ -74,6 +98,65 @@ class Note(models.Model):
     class Meta:
         db_table = 'notes'
         ordering = ['-created_at'] # Newest notes first
+        indexes = [
+            # Workers look for the oldest unprocessed notes
+            models.Index(fields=['sentiment_status', 'id']),
+        ]
     
     def __str__(self):
         return f"Note by {self.created_by.get_full_name()} - {self.sentiment}"
+
+
+class SentimentRollup(models.Model):
+    """
+    Sentiment of all analyzed notes of one lead or contact, kept up to
+    date note by note (see notes/rollups.py) so that reading it never
+    scans the notes.
+    """
+    note_count = models.IntegerField(default=0, help_text='Analyzed notes')
+    polarity_sum = models.FloatField(default=0.0, help_text='Sum of the polarity of the analyzed notes')
+    negative_count = models.IntegerField(default=0, help_text='Analyzed notes with a negative sentiment')
+    last_negative_at = models.DateTimeField(null=True, blank=True, help_text='Creation time of the newest negative note')
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def mean_polarity(self):
+        """Average polarity of the analyzed notes, None without notes"""
+        if not self.note_count:
+            return None
+        return round(self.polarity_sum / self.note_count, 3)
+
+
+class LeadSentimentRollup(SentimentRollup):
+    """Sentiment rollup of the notes attached to a lead"""
+    lead = models.OneToOneField(
+        'leads.Lead',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sentiment_rollup'
+    )
+    
+    class Meta:
+        db_table = 'notes_lead_sentiment'
+    
+    def __str__(self):
+        return f"Lead {self.lead_id}: {self.note_count} notes, mean {self.mean_polarity}"
+
+
+class ContactSentimentRollup(SentimentRollup):
+    """Sentiment rollup of the notes attached to a contact"""
+    contact = models.OneToOneField(
+        'contacts.Contact',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='sentiment_rollup'
+    )
+    
+    class Meta:
+        db_table = 'notes_contact_sentiment'
+    
+    def __str__(self):
+        return f"Contact {self.contact_id}: {self.note_count} notes, mean {self.mean_polarity}"
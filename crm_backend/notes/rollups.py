@@ -0,0 +1,282 @@
+"""
+Per-lead and per-contact sentiment rollups of notes.
+
+LeadSentimentRollup and ContactSentimentRollup hold, for the analyzed
+notes (sentiment_status='done') of one lead or contact: the number of
+notes, the sum of their polarity (mean = sum / count), the number of
+negative notes and when the newest negative note was written.
+
+The rollups are never recomputed from the notes on the way in. Every
+change to a note is turned into a delta - what the note contributed
+before minus what it contributes now - and applied with one F() UPDATE
+per affected lead or contact:
+    - notes saved or deleted through the ORM: notes/signals.py
+    - sentiment written by the background worker: sentiment_queue.analyze_notes
+    - sentiment rewritten in bulk: the reanalyze_notes command
+
+Only removing the newest negative note of a lead needs the notes again, to
+find the previous one (one MAX() over that lead's notes).
+
+Other bulk writes (queryset.update, bulk_create) are not tracked - run
+`manage.py rebuild_sentiment_rollups --check` to detect drift and
+`manage.py rebuild_sentiment_rollups` to repair it.
+
+When note sentiment is weighted in the lead categorization
+(settings.AI_CATEGORY_SENTIMENT_POINTS), the leads whose rollup changed are
+recategorized once the transaction commits.
+"""
+from collections import defaultdict, namedtuple
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import ContactSentimentRollup, LeadSentimentRollup, Note
+
+
+# What one analyzed note adds to the rollups of its lead and contact
+Contribution = namedtuple('Contribution', 'lead_id contact_id polarity negative created_at')
+
+# Note fields a contribution is read from
+CONTRIBUTION_FIELDS = ('lead_id', 'contact_id', 'polarity', 'sentiment', 'sentiment_status', 'created_at')
+
+# Rollup model -> the Contribution/Note field pointing at its owner
+ROLLUP_KEYS = (
+    (LeadSentimentRollup, 'lead_id'),
+    (ContactSentimentRollup, 'contact_id'),
+)
+
+NEGATIVE_NOTES = Q(sentiment='negative')
+
+
+def contribution(note):
+    """
+    What a note currently adds to the rollups.
+    
+    Returns:
+        Contribution, or None when the note is not analyzed yet or is
+        attached to neither a lead nor a contact
+    """
+    if note.sentiment_status != 'done' or (note.lead_id is None and note.contact_id is None):
+        return None
+    return Contribution(
+        note.lead_id, note.contact_id, note.polarity,
+        note.sentiment == 'negative', note.created_at,
+    )
+
+
+class _Delta:
+    __slots__ = ('note_count', 'polarity_sum', 'negative_count', 'newest_negative', 'negative_removed')
+    
+    def __init__(self):
+        self.note_count = 0
+        self.polarity_sum = 0.0
+        self.negative_count = 0
+        self.newest_negative = None
+        self.negative_removed = False
+    
+    def add(self, item, sign):
+        self.note_count += sign
+        self.polarity_sum += sign * item.polarity
+        if item.negative:
+            self.negative_count += sign
+            if sign < 0:
+                self.negative_removed = True
+            elif self.newest_negative is None or item.created_at > self.newest_negative:
+                self.newest_negative = item.created_at
+    
+    def is_empty(self):
+        return not (self.note_count or self.polarity_sum or self.negative_count or self.negative_removed
+                    or self.newest_negative)
+
+
+def apply_changes(changes):
+    """
+    Apply note changes to the rollups.
+    
+    Must run after the notes themselves were written: removing the newest
+    negative note looks up the previous one in the notes table.
+    
+    Args:
+        changes: iterable of (old, new) Contribution pairs (None for "no
+            contribution", e.g. a new note or a deleted one)
+    """
+    deltas = {field: defaultdict(_Delta) for _, field in ROLLUP_KEYS}
+    for old, new in changes:
+        if old == new:
+            continue
+        for item, sign in ((old, -1), (new, 1)):
+            if item is None:
+                continue
+            for _, field in ROLLUP_KEYS:
+                key = getattr(item, field)
+                if key is not None:
+                    deltas[field][key].add(item, sign)
+    
+    if not any(deltas.values()):
+        return
+    
+    now = timezone.now()
+    with transaction.atomic():
+        for model, field in ROLLUP_KEYS:
+            changed = {key: delta for key, delta in deltas[field].items() if not delta.is_empty()}
+            if not changed:
+                continue
+            
+            # Leads and contacts getting their first analyzed note need a row
+            created = [key for key, delta in changed.items() if delta.note_count > 0]
+            if created:
+                model.objects.bulk_create(
+                    [model(pk=key) for key in created], ignore_conflicts=True
+                )
+            
+            for key, delta in changed.items():
+                model.objects.filter(pk=key).update(
+                    note_count=F('note_count') + delta.note_count,
+                    polarity_sum=F('polarity_sum') + delta.polarity_sum,
+                    negative_count=F('negative_count') + delta.negative_count,
+                    last_negative_at=_last_negative_expression(field, key, delta),
+                    updated_at=now,
+                )
+            
+            if field == 'lead_id':
+                _recategorize_leads(changed)
+
+
+def _last_negative_expression(field, key, delta):
+    if delta.negative_removed:
+        # The removed note may have been the newest negative one
+        return Subquery(
+            Note.objects.filter(NEGATIVE_NOTES, sentiment_status='done', **{field: key})
+            .values(field)
+            .annotate(newest=Max('created_at'))
+            .values('newest')
+        )
+    if delta.newest_negative is not None:
+        newest = Value(delta.newest_negative)
+        return Greatest(Coalesce(F('last_negative_at'), newest), newest)
+    return F('last_negative_at')
+
+
+def _aggregate(field, keys=None):
+    """Rollup values computed from the notes, grouped by lead or contact"""
+    notes = Note.objects.filter(sentiment_status='done', **{f'{field}__isnull': False})
+    if keys is not None:
+        notes = notes.filter(**{f'{field}__in': keys})
+    return (
+        notes.order_by()
+        .values(field)
+        .annotate(
+            note_count=Count('id'),
+            polarity_sum=Sum('polarity'),
+            negative_count=Count('id', filter=NEGATIVE_NOTES),
+            last_negative_at=Max('created_at', filter=NEGATIVE_NOTES),
+        )
+    )
+
+
+def rebuild_rollups(lead_ids=None, contact_ids=None):
+    """
+    Recompute rollups from the notes (all of them, or only the given
+    leads and contacts).
+    
+    Returns:
+        dict: rollup rows written per model name
+    """
+    written = {}
+    now = timezone.now()
+    with transaction.atomic():
+        for (model, field), keys in zip(ROLLUP_KEYS, (lead_ids, contact_ids)):
+            if keys is not None and not keys:
+                continue
+            
+            rows = [
+                model(pk=row[field], updated_at=now, **{name: row[name] for name in (
+                    'note_count', 'polarity_sum', 'negative_count', 'last_negative_at'
+                )})
+                for row in _aggregate(field, keys)
+            ]
+            stale = model.objects.all() if keys is None else model.objects.filter(pk__in=keys)
+            stale.delete()
+            model.objects.bulk_create(rows, batch_size=1000)
+            written[model.__name__] = len(rows)
+            
+            if field == 'lead_id':
+                _recategorize_leads(keys)
+    return written
+
+
+def _recategorize_leads(lead_ids):
+    """
+    Recategorize the leads (all of them for None) after the current
+    transaction commits, when their sentiment counts in their category.
+    """
+    from ai_features.categorization import sentiment_affects_category
+    from leads.signals import refresh_lead_categories
+    
+    if not sentiment_affects_category():
+        return
+    lead_ids = None if lead_ids is None else list(lead_ids)
+    transaction.on_commit(lambda: refresh_lead_categories(lead_ids))
+
+
+def find_drift(tolerance=1e-6):
+    """
+    Compare every rollup with the notes.
+    
+    Returns:
+        list: (model name, key, stored values, expected values) of the
+        rollups that differ; values are (note_count, polarity_sum,
+        negative_count, last_negative_at), None for a missing row
+    """
+    drift = []
+    for model, field in ROLLUP_KEYS:
+        stored = {
+            row[0]: row[1:]
+            for row in model.objects.values_list(
+                'pk', 'note_count', 'polarity_sum', 'negative_count', 'last_negative_at'
+            ).iterator()
+        }
+        for row in _aggregate(field).iterator():
+            expected = (row['note_count'], row['polarity_sum'], row['negative_count'], row['last_negative_at'])
+            actual = stored.pop(row[field], None)
+            if actual is None or (
+                actual[0] != expected[0] or abs(actual[1] - expected[1]) > tolerance
+                or actual[2] != expected[2] or actual[3] != expected[3]
+            ):
+                drift.append((model.__name__, row[field], actual, expected))
+        
+        # Rollups of leads/contacts without analyzed notes should be empty
+        for key, actual in stored.items():
+            if actual[0] or actual[2]:
+                drift.append((model.__name__, key, actual, (0, 0.0, 0, None)))
+    return drift
+
+
+def get_lead_sentiment(lead):
+    """
+    The sentiment rollup of a lead.
+    
+    Uses the rollup loaded with select_related('sentiment_rollup') when
+    there is one, otherwise reads it (one query by primary key).
+    
+    Returns:
+        LeadSentimentRollup, or None when no note of the lead was analyzed
+    """
+    if lead.pk is None:
+        return None
+    try:
+        return lead.sentiment_rollup
+    except LeadSentimentRollup.DoesNotExist:
+        return None
+
+
+def get_lead_sentiments(lead_ids):
+    """
+    Sentiment rollups of many leads with one query.
+    
+    Returns:
+        dict: lead id -> LeadSentimentRollup (leads without one are missing)
+    """
+    return LeadSentimentRollup.objects.in_bulk(list(lead_ids))
@@ -0,0 +1,171 @@
+"""
+Background sentiment analysis of notes, using the notes table as job queue.
+
+New notes are saved with sentiment_status='pending' and the API answers
+right away. The process_note_sentiment command (any number of copies, on
+any host sharing the database) then claims pending notes in batches,
+analyzes them and writes the results with one bulk_update per batch. No
+broker is needed.
+
+The lead and contact sentiment rollups (notes/rollups.py) are updated in
+the same transaction as the results.
+
+Claiming a batch:
+    1. SELECT the ids of the oldest claimable notes
+    2. UPDATE notes SET sentiment_status='processing', sentiment_claimed_by=<worker>
+       WHERE id IN (...) AND <still claimable>
+    3. SELECT the notes now claimed by <worker>
+
+The UPDATE re-checks the condition row by row, so when two workers pick
+the same candidates only the first one to update a row gets it. A note
+stays claimed for NOTE_SENTIMENT_CLAIM_TIMEOUT seconds; after that (the
+worker crashed or hung) another worker may take it over. Results are only
+written for notes still claimed by the worker, so a note edited in the
+meantime (back to 'pending') keeps waiting for its new analysis.
+"""
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Note
+from .rollups import apply_changes, contribution, rebuild_rollups
+
+
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = [
+    'sentiment', 'sentiment_score', 'polarity', 'subjectivity',
+    'sentiment_status', 'sentiment_claimed_by', 'sentiment_claimed_at',
+]
+
+# Field values that put a note back in the queue
+PENDING_FIELDS = {
+    'sentiment_status': 'pending',
+    'sentiment_claimed_by': '',
+    'sentiment_claimed_at': None,
+}
+
+
+def new_worker_id():
+    """Unique name of a worker process, stored in sentiment_claimed_by"""
+    return f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def _claimable():
+    expired = timezone.now() - timedelta(seconds=settings.NOTE_SENTIMENT_CLAIM_TIMEOUT)
+    return (
+        Q(sentiment_status='pending')
+        | Q(sentiment_status='processing', sentiment_claimed_at__lt=expired)
+    )
+
+
+def claim_notes(worker_id, batch_size):
+    """
+    Claim up to batch_size notes waiting for sentiment analysis.
+    
+    Returns:
+        list: Note instances (content, lead, contact and created_at
+        loaded), oldest first
+    """
+    candidates = list(
+        Note.objects.filter(_claimable())
+        .order_by('id')
+        .values_list('id', flat=True)[:batch_size]
+    )
+    if not candidates:
+        return []
+    
+    Note.objects.filter(_claimable(), id__in=candidates).update(
+        sentiment_status='processing',
+        sentiment_claimed_by=worker_id,
+        sentiment_claimed_at=timezone.now(),
+    )
+    return list(
+        Note.objects.filter(id__in=candidates, sentiment_status='processing', sentiment_claimed_by=worker_id)
+        .order_by('id')
+        .only('id', 'content', 'lead', 'contact', 'created_at')
+    )
+
+
+def analyze_notes(worker_id, notes):
+    """
+    Analyze claimed notes and save their sentiment with one bulk_update.
+    
+    Texts seen before come from the sentiment cache; the others are
+    analyzed on the sentiment process pool when there are enough of them.
+    If the analysis fails, the notes are marked 'failed'.
+    
+    Returns:
+        int: number of notes saved
+    """
+    from ai_features.sentiment_analysis import classify_polarity
+    from ai_features.sentiment_cache import sentiment_cache
+    from ai_features.sentiment_pool import score_texts_parallel
+    
+    if not notes:
+        return 0
+    
+    ids = [note.id for note in notes]
+    try:
+        scores = sentiment_cache.get_many([note.content for note in notes], score_texts_parallel)
+    except Exception:
+        logger.exception('Sentiment analysis of notes %s failed', ids)
+        Note.objects.filter(id__in=ids, sentiment_claimed_by=worker_id).update(
+            sentiment_status='failed', sentiment_claimed_by='', sentiment_claimed_at=None
+        )
+        return 0
+    
+    for note, (polarity, subjectivity) in zip(notes, scores):
+        note.sentiment = classify_polarity(polarity)
+        note.sentiment_score = note.polarity = round(polarity, 3)
+        note.subjectivity = round(subjectivity, 3)
+        note.sentiment_status = 'done'
+        note.sentiment_claimed_by = ''
+        note.sentiment_claimed_at = None
+    
+    with transaction.atomic():
+        # bulk_update keeps the queryset's filters, so notes that are no longer
+        # claimed by this worker are skipped by the UPDATE itself (no SELECT
+        # first, which on SQLite could deadlock with other workers' writes)
+        saved = Note.objects.filter(
+            sentiment_status='processing', sentiment_claimed_by=worker_id
+        ).bulk_update(notes, RESULT_FIELDS)
+        
+        if saved == len(notes):
+            # Claimed notes were not counted in the rollups yet
+            apply_changes((None, contribution(note)) for note in notes)
+        else:
+            # Some notes were skipped and we can't tell which ones
+            rebuild_rollups(
+                lead_ids={note.lead_id for note in notes if note.lead_id},
+                contact_ids={note.contact_id for note in notes if note.contact_id},
+            )
+    return saved
+
+
+def process_pending_notes(worker_id, batch_size):
+    """
+    Claim and analyze one batch of pending notes.
+    
+    Returns:
+        tuple: (notes claimed, notes saved)
+    """
+    notes = claim_notes(worker_id, batch_size)
+    return len(notes), analyze_notes(worker_id, notes)
+
+
+def reset_failed_notes():
+    """
+    Put failed notes back in the queue.
+    
+    Returns:
+        int: number of notes reset
+    """
+    return Note.objects.filter(sentiment_status='failed').update(**PENDING_FIELDS)
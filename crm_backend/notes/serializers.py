@@ -5,6 +5,16 @@ from rest_framework import serializers
 from .models import Note
 
 
+class SentimentRollupSerializer(serializers.Serializer):
+    """
+    Read-only sentiment rollup of the notes of a lead or contact.
+    """
+    note_count = serializers.IntegerField(read_only=True)
+    mean_polarity = serializers.FloatField(read_only=True)
+    negative_count = serializers.IntegerField(read_only=True)
+    last_negative_at = serializers.DateTimeField(read_only=True)
+
+
 class NoteSerializer(serializers.ModelSerializer):
     """
     Serializer for Note CRUD operations.
@@ -18,12 +28,12 @@ class NoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Note
         fields = ['id', 'content', 'lead', 'contact', 'lead_name', 'contact_name',
-                  'sentiment', 'sentiment_score', 'polarity', 'subjectivity',
+                  'sentiment', 'sentiment_score', 'polarity', 'subjectivity', 'sentiment_status',
                   'content_type', 'object_id', 'created_by', 'created_by_name',
                   'created_at', 'updated_at']
         # AI fields and timestamps are system-managed
         read_only_fields = ['id', 'sentiment', 'sentiment_score', 'polarity', 
-                           'subjectivity', 'created_by', 'created_at', 'updated_at']
+                           'subjectivity', 'sentiment_status', 'created_by', 'created_at', 'updated_at']
     
     def validate_lead(self, value):
         """
@@ -42,3 +52,17 @@ class NoteSerializer(serializers.ModelSerializer):
         if value == '' or value == 'null':
             return None
         return value
+    
+    def update(self, instance, validated_data):
+        """
+        Save only the fields being edited (and those passed to save()).
+        
+        The sentiment fields of the instance may be stale: a worker can
+        analyze the note between loading it and saving it, and a full save
+        would put it back to 'pending' after its result was counted in the
+        rollups.
+        """
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
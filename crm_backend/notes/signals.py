@@ -0,0 +1,67 @@
+"""
+Signal handlers that keep the note sentiment rollups in sync.
+
+Every note remembers what it contributed to the rollups of its lead and
+contact when it was loaded; on save and delete the difference is applied
+to the rollups (see notes/rollups.py). Saving a note without changing its
+sentiment, lead or contact costs no query.
+"""
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Note
+from .rollups import CONTRIBUTION_FIELDS, apply_changes, contribution, rebuild_rollups
+
+
+def _loaded(instance):
+    """True when every field a contribution needs was loaded (no deferred fields)"""
+    return all(field in instance.__dict__ for field in CONTRIBUTION_FIELDS)
+
+
+def _is_deletion_of(origin, label):
+    """True when a delete was started from a model (a cascade to its notes)"""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model._meta.label == label
+
+
+@receiver(post_init, sender=Note)
+def remember_contribution(sender, instance, **kwargs):
+    """Keep what the note contributed when it was loaded, to compute deltas on save"""
+    if instance.pk is not None and _loaded(instance):
+        instance._rollup_contribution = contribution(instance)
+
+
+@receiver(post_save, sender=Note)
+def note_saved(sender, instance, created, raw=False, **kwargs):
+    """Apply the change of a created or updated note to the rollups"""
+    if raw:
+        return  # Fixture loading
+    
+    new = contribution(instance)
+    if created:
+        apply_changes([(None, new)])
+    elif hasattr(instance, '_rollup_contribution'):
+        apply_changes([(instance._rollup_contribution, new)])
+    elif new is not None:
+        # Loaded with deferred fields: what it contributed before is unknown
+        rebuild_rollups(
+            lead_ids=[new.lead_id] if new.lead_id else [],
+            contact_ids=[new.contact_id] if new.contact_id else [],
+        )
+    instance._rollup_contribution = new
+
+
+@receiver(post_delete, sender=Note)
+def note_deleted(sender, instance, origin=None, **kwargs):
+    """Remove a deleted note from the rollups"""
+    old = getattr(instance, '_rollup_contribution', None)
+    if old is None:
+        return
+    
+    # When a lead or contact is deleted, its rollup goes with it
+    if _is_deletion_of(origin, 'leads.Lead'):
+        return  # Its contacts are deleted too
+    if _is_deletion_of(origin, 'contacts.Contact'):
+        old = old._replace(contact_id=None)
+    apply_changes([(old, None)])
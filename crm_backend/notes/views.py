@@ -2,10 +2,12 @@
 Views for Note management.
 Handles CRUD operations and triggers AI sentiment analysis.
 """
+from django.conf import settings
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from .models import Note
 from .serializers import NoteSerializer
+from .sentiment_queue import PENDING_FIELDS
 
 
 class NoteViewSet(viewsets.ModelViewSet):
@@ -14,30 +16,56 @@ class NoteViewSet(viewsets.ModelViewSet):
     
     Endpoints:
     - GET /api/notes/ - List all notes
-    - POST /api/notes/ - Create new note (triggers AI analysis)
+    - POST /api/notes/ - Create new note (queues AI analysis)
     - GET /api/notes/{id}/ - Get note details
-    - PUT /api/notes/{id}/ - Update note
+    - PUT /api/notes/{id}/ - Update note (queues AI analysis if the content changed)
     - DELETE /api/notes/{id}/ - Delete note
     """
-    queryset = Note.objects.all()
+    queryset = Note.objects.select_related('created_by', 'lead', 'contact')
     serializer_class = NoteSerializer
     permission_classes = [IsAuthenticated]
     
     def perform_create(self, serializer):
         """
-        Save note and analyze sentiment using AI.
+        Save note with current user as creator, queued for sentiment analysis.
         """
-        # Save note with current user as creator
-        note = serializer.save(created_by=self.request.user)
+        content = serializer.validated_data.get('content', '')
+        serializer.save(created_by=self.request.user, **self._sentiment_fields(content))
+    
+    def perform_update(self, serializer):
+        """
+        Save note; its sentiment is analyzed again if the content changed.
         
-        # Analyze sentiment using AI with detailed analysis
-        # This runs synchronously - for high volume, consider moving to Celery task
-        from ai_features.sentiment_analysis import analyze_sentiment_detailed
-        result = analyze_sentiment_detailed(note.content)
+        Only the edited fields are written (NoteSerializer.update), so an
+        edit that keeps the content leaves the sentiment a worker stored
+        meanwhile alone.
+        """
+        content = serializer.validated_data.get('content')
+        if content is None or content == serializer.instance.content:
+            serializer.save()
+        else:
+            serializer.save(**self._sentiment_fields(content))
+    
+    def _sentiment_fields(self, content):
+        """
+        Sentiment fields to save with a new or edited note.
+        
+        With NOTE_SENTIMENT_ASYNC (the default) the note is left 'pending'
+        and the process_note_sentiment worker analyzes it, so the request
+        does not wait for TextBlob. Otherwise it is analyzed right away.
+        """
+        if settings.NOTE_SENTIMENT_ASYNC:
+            return dict(PENDING_FIELDS)
         
-        # Update note with AI results
-        note.sentiment = result['sentiment']
-        note.sentiment_score = result['polarity']
-        note.polarity = result['polarity']
-        note.subjectivity = result['subjectivity']
-        note.save()
+        # Repeated texts are answered from the sentiment cache
+        from ai_features.sentiment_analysis import analyze_sentiment_detailed
+        result = analyze_sentiment_detailed(content)
+        return {
+            'sentiment': result['sentiment'],
+            'sentiment_score': result['polarity'],
+            'polarity': result['polarity'],
+            'subjectivity': result['subjectivity'],
+            'sentiment_status': 'done',
+            'sentiment_claimed_by': '',
+            'sentiment_claimed_at': None,
+        }
@@ -22,7 +22,7 @@ class TaskViewSet(viewsets.ModelViewSet):
     Filtering:
     - GET /api/tasks/?user_id=123 - Get tasks assigned to specific user
     """
-    queryset = Task.objects.all()
+    queryset = Task.objects.select_related('assigned_to')
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
     
@@ -31,7 +31,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         Optionally filter tasks by assigned user.
         Useful for "My Tasks" view.
         """
-        queryset = Task.objects.all()
+        queryset = super().get_queryset()
         
         # Check for 'user_id' query parameter
         user_id = self.request.query_params.get('user_id', None)